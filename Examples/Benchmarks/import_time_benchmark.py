@@ -0,0 +1,71 @@
+"""
+Automated Measurement Framework - import time benchmark
+
+Measures how long importing the measurement entry points and the instrument drivers takes, with python -X importtime,
+each in a fresh interpreter. For every module the best total of a few runs is printed, with the packages that took the
+most time (self time, summed per top level package).
+
+Optional dependencies must only be imported by the feature that needs them (plotly for the bathtub plot, RsInstrument
+for R&S analyzers, etc.). If any of LAZY_MODULES is imported by an entry point, it is listed and the script exits with
+an error, so it can be used as a check before committing. The RAILTest driver and the common package must not import
+numpy or pandas either (LIGHT_ENTRY_POINTS), they are used by scripts that only talk to the DUT.
+
+"""
+
+#################################################################################################################################################
+
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+#################################################################################################################################################
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+ENTRY_POINTS = ['rxtests', 'txcwsweep', 'pywstk.pyRAIL', 'pysiggen.pySigGen', 'pyspecan.pySpecAn', 'pypsu.pyPSU', 'common']
+LAZY_MODULES = ['matplotlib', 'plotly', 'RsInstrument', 'excel_plotter', 'multiprocessing', 'pydoc']
+LIGHT_ENTRY_POINTS = {'pywstk.pyRAIL': ['numpy', 'pandas'], 'common': ['numpy', 'pandas']}  # not even the measurement dependencies
+RUNS = 5
+TOP_PACKAGES = 8
+
+def import_time(module:str)->tuple[float, dict]:
+    """
+    Import module in a new interpreter
+
+    :return: the total import time in seconds, and the self time of every imported top level package in seconds
+    :raises ImportError: if the import failed
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import '+module], cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise ImportError(result.stderr.strip().splitlines()[-1])
+    packages = defaultdict(float)
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        packages[name.strip().split('.')[0]] += int(self_us)/1e6
+        if name.strip() == module:
+            total_us = int(cumulative_us)
+    return total_us/1e6, packages
+
+violations = {}
+failed = []
+for module in ENTRY_POINTS:
+    try:
+        runs = [import_time(module) for _ in range(RUNS)]
+    except ImportError as error:
+        print(f"{module:20s} import failed: {error}")
+        failed.append(module)
+        continue
+    total_s, packages = min(runs, key=lambda run: run[0])
+    heaviest = sorted(packages.items(), key=lambda item: -item[1])[:TOP_PACKAGES]
+    print(f"{module:20s} {total_s*1e3:8.1f} ms    " + ", ".join(f"{name} {t*1e3:.1f}" for name, t in heaviest))
+    eager = [name for name in LAZY_MODULES + LIGHT_ENTRY_POINTS.get(module, []) if name in packages]
+    if eager:
+        violations[module] = eager
+
+for module, eager in violations.items():
+    print(f"{module} imports {', '.join(eager)} at import time, these should only be imported where they are used")
+if violations or failed:
+    sys.exit(1)
@@ -0,0 +1,95 @@
+"""
+Automated Measurement Framework - logging overhead benchmark
+
+Measures the per-command host side cost of the driver logging, with the logger at INFO and at DEBUG level:
+    - a RAILTest command round trip through WSTK_RAILTest_Driver._command, with a recorded response
+    - a SCPI write through GenericPSU.command (no OPC, no write delay)
+No hardware is needed, the serial port and the VISA session are replaced by stand-ins returning immediately.
+
+The eager message construction used before (the response cleaned up and the SCPI string concatenated before
+calling logger.debug) is measured as a reference. The log records go to an in-memory stream, so file and console
+I/O is not included.
+
+"""
+
+#################################################################################################################################################
+
+try:
+    from pywstk.pywstk_driver import WSTK_RAILTest_Driver
+except ModuleNotFoundError:
+    # This is needed for the current folder structure of the examples. Scripts placed in the main folder won't need this.
+    # This assumes that the script is 2 folders deep compared to the main folder.
+    import sys
+    sys.path.append('../../')
+
+import io
+import logging
+import threading
+import timeit
+from pywstk.pywstk_driver import WSTK_RAILTest_Driver
+from pypsu.pyPSU import GenericPSU
+from common import Logger, Level
+
+#################################################################################################################################################
+
+RESPONSE = ("setPower 100\r\n{{(setPower)}{powerLevel:100}{power:10.0}}\r\n> ").encode('latin-1')
+SCPI_COMMAND = "VOLT 3.3"
+
+class FakePort:  # answers every write with RESPONSE
+    in_waiting = 0
+    def write(self, data:bytes):
+        self.in_waiting = len(RESPONSE)
+    def read(self, n:int)->bytes:
+        self.in_waiting = 0
+        return RESPONSE if n else b''
+    def close(self):
+        pass
+
+class FakeInstr:  # accepts every write, *OPC? is always complete
+    def write(self, command_str:str):
+        pass
+    def query_ascii_values(self, command_str:str)->list:
+        return [1]
+    def close(self):
+        pass
+
+def make_logger(name:str)->logging.Logger:
+    logger = logging.getLogger(name)
+    handler = logging.StreamHandler(io.StringIO())
+    handler.setFormatter(logging.Formatter(fmt=Logger.log_format_string))
+    logger.addHandler(handler)
+    logger.propagate = False
+    return logger
+
+driver = WSTK_RAILTest_Driver.__new__(WSTK_RAILTest_Driver)
+driver.port = FakePort()
+driver._read_buffer = ''
+driver.logger = make_logger("benchmark.driver")
+
+psu = GenericPSU.__new__(GenericPSU)
+psu.instr = FakeInstr()
+psu._visa_lock = threading.RLock()
+psu.logger = make_logger("benchmark.psu")
+
+def eager_railtest_log():  # the message construction _read did unconditionally before
+    response = RESPONSE.decode('latin-1')
+    return_buffer_log = ''.join(response.splitlines())
+    return_buffer_log = return_buffer_log.replace('\0','',-1)
+    driver.logger.debug(return_buffer_log+ "\n")
+
+def eager_scpi_log():  # the message construction command() did before
+    psu.logger.debug("SCPI Write: " + str(SCPI_COMMAND))
+
+N = 20000
+for level in (Level.INFO, Level.DEBUG):
+    driver.logger.setLevel(level)
+    psu.logger.setLevel(level)
+    results = {
+        'RAILTest _command': timeit.timeit(lambda: driver._command('setPower 100'), number=N)/N,
+        'RAILTest response log, eager (before)': timeit.timeit(eager_railtest_log, number=N)/N,
+        'SCPI command': timeit.timeit(lambda: psu.command(SCPI_COMMAND, query_opc=False, write_delay_ms=0), number=N)/N,
+        'SCPI write log, eager (before)': timeit.timeit(eager_scpi_log, number=N)/N,
+    }
+    print(f"Logging level: {level.name}")
+    for name, t in results.items():
+        print(f"    {name:40s} {t*1e6:8.2f} us/call")
@@ -0,0 +1,55 @@
+
+"""
+Automated Measurement Framework - RAILTest status benchmark
+
+Measures the per-call cost of turning a RAILTest 'status' response into a RAILTest_status object, as done by
+WSTK_RAILTest.getStatus() in stop() and during PER polling. No hardware is needed, a recorded status response is used.
+
+The eagerly converted dataclass layout that RAILTest_status used before is measured as a reference.
+
+"""
+
+#################################################################################################################################################
+
+try:
+    from pywstk.pyRAIL import RAILTest_status
+except ModuleNotFoundError:
+    # This is needed for the current folder structure of the examples. Scripts placed in the main folder won't need this.
+    # This assumes that the script is 2 folders deep compared to the main folder.
+    import sys
+    sys.path.append('../../')
+
+import timeit
+from dataclasses import make_dataclass, fields
+from pywstk.pyRAIL import RAILTest_status
+from pywstk.pywstk_driver import WSTK_RAILTest_Driver
+
+#################################################################################################################################################
+
+STATUS_RESPONSE = ("status\r\n{{(status)}" + "".join("{"+name+":"+("Idle" if t is str else "0")+"}" for name,(t,_) in RAILTest_status._fields.items()) + "}\r\n>")
+STATUS_RESPONSE = STATUS_RESPONSE.replace("{AppMode:Idle}","{AppMode:None}")
+
+def eager_post_init(self):  # the previous RAILTest_status.__post_init__
+    for field in fields(self):
+        value = getattr(self, field.name)
+        if not isinstance(value, field.type):
+            setattr(self, field.name, field.type(value))
+
+EagerStatus = make_dataclass('EagerStatus', [(name, t, d) for name,(t,d) in RAILTest_status._fields.items()], namespace={'__post_init__': eager_post_init})
+
+def stop_access(status):  # the fields stop() looks at
+    return status.AppMode.upper(), status.RAIL_state_rx, status.RAIL_state_tx
+
+N = 20000
+content = WSTK_RAILTest_Driver.parseResponse(STATUS_RESPONSE)[0].response_content
+
+results = {
+    'parseResponse (status line)': timeit.timeit(lambda: WSTK_RAILTest_Driver.parseResponse(STATUS_RESPONSE), number=N//20)/(N//20),
+    'eager dataclass, construct': timeit.timeit(lambda: EagerStatus(**content), number=N)/N,
+    'eager dataclass, construct + stop() fields': timeit.timeit(lambda: stop_access(EagerStatus(**content)), number=N)/N,
+    'RAILTest_status, construct': timeit.timeit(lambda: RAILTest_status(**content), number=N)/N,
+    'RAILTest_status, construct + stop() fields': timeit.timeit(lambda: stop_access(RAILTest_status(**content)), number=N)/N,
+    'RAILTest_status, construct + all fields': timeit.timeit(lambda: RAILTest_status(**content).asdict(), number=N)/N,
+}
+for name, t in results.items():
+    print(f"{name:45s} {t*1e6:8.2f} us/call")
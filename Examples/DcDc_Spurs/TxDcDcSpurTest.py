@@ -21,13 +21,10 @@ except ModuleNotFoundError:
     sys.path.append('../../')
 
 from pywstk.pyRAIL import WSTK_RAILTest
-from pydoc import visiblename
 from pyspecan.pySpecAn import SpecAn, Anritsu_SignalAnalyzer
 from pyspecan.measurements.generic_measurements import SpectrumSweep, MeasurementSuite
 import numpy as np
 from pypsu import pyPSU
-from matplotlib import pyplot as plt
-import xlsxwriter
 from time import sleep
 from datetime import datetime as dt
 import pandas as pd
@@ -63,6 +60,8 @@ class TxDcDcSpurTest:
 
         :param str psu_address: VISA address of PSU, if serial is used, it is a COM port, check PyVISA documentation
         :param list psu_voltages_v: Custom list of voltages
+        :param bool psu_list_mode: Step the supply through the voltages with its voltage list, each step confirmed by reading back
+                                   the output voltage instead of a fixed delay
 
         :param list power_levels: Custom ist of power values
         
@@ -84,6 +83,7 @@ class TxDcDcSpurTest:
         #Supply settings
         psu_address: str|None = None
         psu_voltage_list_v: list = field(default_factory=lambda: [3.0, ])
+        psu_list_mode: bool = False
         psu_logger_settings: Logger.Settings = Logger.Settings()
         
         #SA settings 
@@ -170,6 +170,8 @@ class TxDcDcSpurTest:
             self.psu = pyPSU.PSU(self.settings.psu_address,logger_settings = self.settings.psu_logger_settings)
             self.psu.selectOutput(1)
             self.psu.setVoltage(self.settings.psu_voltage_list_v[0])
+            if self.settings.psu_list_mode:
+                self.psu.setVoltageList(self.settings.psu_voltage_list_v)
             self.psu.toggleOutput(True)
 
     def initialize_specan(self):
@@ -185,8 +187,11 @@ class TxDcDcSpurTest:
         for env_voltage in psu_voltages_v:
             if env_voltage is not None:
                 self.psu.toggleOutput(True)
-                self.psu.setVoltage(env_voltage)
-                sleep(0.1)
+                if self.settings.psu_list_mode:
+                    self.psu.stepVoltageList()
+                else:
+                    self.psu.setVoltage(env_voltage)
+                    sleep(0.1)
             self.dut._driver.reset()
             self.dut._driver.flushIO()
             for power, freq_hz in itertools.product(self.settings.power_level_list, self.settings.freq_list_hz):
@@ -241,15 +246,13 @@ class TxDcDcSpurTest:
     def stop(self):
         try:
             if hasattr(self, 'psu') and self.psu is not None:
+                self.psu.stopVoltageList()
                 self.psu.toggleOutput(False)
-                self.psu.logger.handlers.clear()
                 del self.psu
         # if someone already closed the visa session
         except visaerrors.InvalidSession:
-            self.psu.logger.handlers.clear() # clear psu logger otherwise it will duplicate log
             self.initialize_psu() #reinitialize psu session, ugly I know, sorry
             self.psu.toggleOutput(False) # turn off output
-            self.psu.logger.handlers.clear()
             del self.psu
 
     def measure(self)->pd.DataFrame:
@@ -29,13 +29,14 @@ from time import sleep
 from pyspecan.measurements.telec_t245_measurements import TelecT245MeasurementSuite
 from dataclasses import dataclass
 from typing import Callable
-from common import Logger, Level
+from common import Logger, Level, tracer
 
 #################################################################################################################################################
 
 WSTK_COM_PORT = "COM4"
 SPEC_AN_PORT = "TCPIP::169.254.88.77::INSTR"
 CTUNE_OVERRIDE = 87
+TRACE_FILENAME = None  # e.g. "telec245_trace.json" to save a timeline of the run, open it in https://ui.perfetto.dev
 
 @dataclass
 class TestConfigItem:
@@ -185,6 +186,8 @@ config_list = [
 
 
 def run_test(configs):
+    if TRACE_FILENAME is not None:
+        tracer.enable()
     dut_logger_settings = Logger.Settings(logging_level=Level.INFO)
     dut = pyRAIL.WSTK_RAILTest(COMport=WSTK_COM_PORT, reset=True, logger_settings=dut_logger_settings)
 
@@ -258,6 +261,9 @@ def run_test(configs):
 
             dut.stop()
 
+    if TRACE_FILENAME is not None:
+        tracer.exportChromeTrace(TRACE_FILENAME)
+
 
 if __name__ == '__main__':
     run_test(config_list[0:2]+config_list[8:])
@@ -1,4 +1,12 @@
 __version__ = "1.0.0"
 
 from .logger import Logger
-from .logger import Level
\ No newline at end of file
+from .logger import Level
+from .profiler import CommandProfiler
+from .profiler import command_profiler
+from .tracer import Tracer
+from .tracer import tracer
+from .visa_registry import InstrumentRegistry
+from .visa_registry import instrument_registry
+from .concurrency import ConcurrentError
+from .concurrency import run_concurrently
@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ConcurrentError(Exception):
+    """
+    Raised by run_concurrently if any of the steps failed
+
+    :param list exceptions: the exceptions raised by the failed steps, in the order of the groups
+    """
+
+    def __init__(self, description:str, exceptions:list[BaseException]):
+        self.exceptions = exceptions
+        details = "; ".join(f"{type(error).__name__}: {error}" for error in exceptions)
+        super().__init__(f"{description} ({len(exceptions)} failed): {details}")
+
+
+def _run_group(group):
+    for step in group:
+        step()
+
+
+def run_concurrently(*groups, description:str="Concurrent steps failed", thread_name_prefix:str="concurrent"):
+    """
+    Run groups of steps concurrently, each group in its own thread
+
+    The steps of a group are called one after another, so a step depending on another one (e.g. an instrument
+    configured with the settings of another, or a DUT powered by the PSU) goes in the same group, after it.
+    A failing step stops the rest of its group only, the other groups are completed, then all the failures
+    are raised together.
+
+    :param groups: sequences of callables without arguments, e.g. bound methods
+    :param str description: message of the raised ConcurrentError
+    :param str thread_name_prefix: name of the worker threads, shown in the logs and traces
+    :raises ConcurrentError: if any of the steps failed, with every exception raised
+    """
+    groups = [group for group in groups if group]
+    if not groups:
+        return
+    with ThreadPoolExecutor(max_workers=len(groups), thread_name_prefix=thread_name_prefix) as executor:
+        futures = [executor.submit(_run_group, group) for group in groups]
+    errors = [future.exception() for future in futures if future.exception() is not None]
+    if errors:
+        raise ConcurrentError(description, errors) from errors[0]
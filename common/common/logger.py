@@ -1,4 +1,9 @@
 import logging
+import logging.handlers
+import atexit
+import os
+import queue
+import threading
 from enum import IntEnum
 from dataclasses import dataclass
 import copy
@@ -17,15 +22,27 @@ class Logger():
     """
     Logger class for the measurement framework
 
+    The loggers don't write anything themselves: their records go to the root logger, which puts them in a queue.
+    A background thread (QueueListener) takes them from there and writes them to the master logfile, the console
+    and the separate logfiles, so no file or console I/O happens in the measurement thread. The console and logfile
+    handlers of a module are only created once, creating an instrument again doesn't duplicate its log lines.
+
     Class variables:
 
     :param str log_format_string: Universal logging format for all the modules using this class
     :param str filename: The file where all the logs are stored from all the modules using this class
+    :param bool asynchronous: Write the logs from a background thread, set before the first Logger is created
     """
 
     log_format_string = '%(asctime)s [%(levelname)s]  %(name)s:    %(message)s'
-    filename = "app.log"    
-    
+    filename = "app.log"
+    asynchronous = True
+
+    _queue = None
+    _listener = None
+    _handlers = {}  # (kind, module name, filename) -> handler, so every output is only created once
+    _lock = threading.RLock()  # instruments can be created from several threads at once
+
     @dataclass
     class Settings():
         """
@@ -39,30 +56,79 @@ class Logger():
                                 with this name, no filename extension is required
         :param bool console_logging: Enable/disable console logging for this instance, default: True
         :param logging_level: The level of the logging messages are displayed, refer to Level class
+        :param int logfile_max_bytes: If not 0, the separate logfile is rotated when it reaches this size,
+                                the previous content is kept in logfile_backup_count numbered files (.log.1 is the newest)
+        :param int logfile_backup_count: Number of rotated logfiles kept
         """
         module_name: str = None
         logfile_name: str = None
         console_logging: bool = True
         logging_level :int = Level.DEBUG
-        
+        logfile_max_bytes: int = 0
+        logfile_backup_count: int = 3
+
         def copy(self): # passing a settings object as a copy is recommended
             return copy.copy(self)
-        
+
 
     def __new__(cls,settings :Settings):
-        
-        #Calling default basic config
-        logging.basicConfig(filename=cls.filename,filemode="w",format=cls.log_format_string)
+
         logger = logging.getLogger(settings.module_name)
-        log_formatter = logging.Formatter(fmt=cls.log_format_string)
-        # optional logging to console
-        if settings.console_logging:
-            log_console = logging.StreamHandler()
-            log_console.setFormatter(log_formatter)
-            logger.addHandler(log_console)
-        if settings.logfile_name is not None:
-            log_file = logging.FileHandler(filename=settings.logfile_name +".log",mode='w')
-            log_file.setFormatter(log_formatter)
-            logger.addHandler(log_file)
-        logger.setLevel(settings.logging_level)
-        return logger
\ No newline at end of file
+        with cls._lock:
+            if not cls._handlers:
+                # master logfile, every record propagated to the root logger goes here
+                master_log = logging.FileHandler(filename=cls.filename, mode="w")
+                master_log.setFormatter(logging.Formatter(fmt=cls.log_format_string))
+                cls._addHandler(('master', None, cls.filename), master_log)
+            name_filter = logging.Filter(settings.module_name or '')
+            # optional logging to console
+            if settings.console_logging and ('console', settings.module_name, None) not in cls._handlers:
+                log_console = logging.StreamHandler()
+                log_console.addFilter(name_filter)
+                cls._addHandler(('console', settings.module_name, None), log_console)
+            if settings.logfile_name is not None and ('file', settings.module_name, settings.logfile_name) not in cls._handlers:
+                filename = settings.logfile_name +".log"
+                if settings.logfile_max_bytes:
+                    log_file = logging.handlers.RotatingFileHandler(filename=filename, maxBytes=settings.logfile_max_bytes, backupCount=settings.logfile_backup_count)
+                    if os.path.isfile(filename) and os.path.getsize(filename) > 0:
+                        log_file.doRollover()  # start a new file for every run, like mode='w', but keep the previous one
+                else:
+                    log_file = logging.FileHandler(filename=filename,mode='w')
+                log_file.addFilter(name_filter)
+                cls._addHandler(('file', settings.module_name, settings.logfile_name), log_file)
+            logger.setLevel(settings.logging_level)
+        return logger
+
+    @classmethod
+    def _addHandler(cls, key:tuple, handler:logging.Handler):
+        if handler.formatter is None:
+            handler.setFormatter(logging.Formatter(fmt=cls.log_format_string))
+        cls._handlers[key] = handler
+        root = logging.getLogger()
+        if not cls.asynchronous:
+            root.addHandler(handler)
+            return
+        if cls._queue is None:
+            cls._queue = queue.SimpleQueue()
+            root.addHandler(logging.handlers.QueueHandler(cls._queue))
+            atexit.register(cls._stopListener)
+        # the handlers of a QueueListener can't be changed, so it is restarted with the new handler list
+        if cls._listener is not None:
+            cls._listener.stop()
+        cls._listener = logging.handlers.QueueListener(cls._queue, *cls._handlers.values(), respect_handler_level=True)
+        cls._listener.start()
+
+    @classmethod
+    def flush(cls):
+        """Wait until every queued record is written. Logging can go on afterwards."""
+        with cls._lock:
+            if cls._listener is not None:
+                cls._listener.stop()
+                cls._listener.start()
+
+    @classmethod
+    def _stopListener(cls):
+        # writes the remaining records at exit
+        if cls._listener is not None:
+            cls._listener.stop()
+            cls._listener = None
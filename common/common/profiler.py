@@ -0,0 +1,195 @@
+import csv
+import json
+import threading
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from time import perf_counter
+from .tracer import tracer
+
+
+class _Metric():
+    """Running statistics of one metric, with a histogram on log spaced bins for durations"""
+
+    HISTOGRAM_EDGES_S = tuple(10**(k/4-6) for k in range(33))  # 1 us .. 100 s, 4 bins per decade, values outside go to the first/last bin
+
+    def __init__(self, histogram:bool):
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+        self.histogram = [0]*(len(_Metric.HISTOGRAM_EDGES_S)-1) if histogram else None
+
+    def add(self, value:float):
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if self.histogram is not None:
+            index = bisect_right(_Metric.HISTOGRAM_EDGES_S, value)-1
+            self.histogram[min(max(index, 0), len(self.histogram)-1)] += 1
+
+    def percentile(self, q:float)->float:
+        # estimated from the histogram, as the upper edge of the bin the percentile falls in
+        if self.histogram is None or self.count == 0:
+            return float('nan')
+        index = bisect_left(list(accumulate(self.histogram)), q/100*self.count)
+        return float(min(_Metric.HISTOGRAM_EDGES_S[index+1], self.max))
+
+
+class _CommandRecord():
+    """Times one command, returned by CommandProfiler.command when the profiler is enabled"""
+
+    __slots__ = ('profiler', 'source', 'command', 'metric', 'start', 'last', 'values')
+
+    def __init__(self, profiler:'CommandProfiler', source:str, command:str, metric:str):
+        self.profiler = profiler
+        self.source = source
+        self.command = command
+        self.metric = metric
+        self.values = {}
+
+    def __enter__(self):
+        self.start = self.last = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.values[self.metric] = perf_counter()-self.start
+        self.profiler._store(self.source, self.command, self.values)
+        if tracer.enabled:
+            tracer.addComplete(self.command, self.source, int(self.start*1e9), int(self.values[self.metric]*1e9), dict(self.values))
+        return False
+
+    def split(self, metric:str):
+        """Record the time since the previous split (or the start) as metric, e.g. 'opc_s'"""
+        now = perf_counter()
+        self.values[metric] = now-self.last
+        self.last = now
+
+    def add(self, metric:str, value:float):
+        """Record any other value of the command, e.g. 'bytes_out'"""
+        self.values[metric] = value
+
+
+class _NullRecord():
+    """Stand-in for _CommandRecord when the profiler is disabled, does nothing"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def split(self, metric:str):
+        pass
+
+    def add(self, metric:str, value:float):
+        pass
+
+
+_NULL_RECORD = _NullRecord()
+
+
+class CommandProfiler():
+    """
+    Per-command latency statistics of the instrument drivers
+
+    Disabled by default. The drivers wrap every command in ``with command_profiler.command(source, command_str) as record:``,
+    which costs a single attribute check while disabled. When enabled, the round trip time of every command is recorded
+    as 'latency_s', together with the parts the drivers split out ('write_s', 'opc_s', 'query_s', 'parse_s') and the
+    transferred bytes ('bytes_out', 'bytes_in'). Commands are aggregated by source and by the first word of the command
+    string (the SCPI header or the RAILTest command name), durations into histograms, so a long run uses constant memory.
+
+    Usage:
+
+        from common import command_profiler
+        command_profiler.enable()
+        ...  # run the measurement
+        command_profiler.exportJson("commands.json")
+        command_profiler.exportCsv("commands.csv")
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._metrics = {}  # (source, command, metric) -> _Metric
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self._metrics = {}
+
+    def command(self, source:str, command_str:str, metric:str='latency_s'):
+        """
+        Context manager timing one command, the whole block is recorded as metric
+
+        :param str source: the driver sending the command, e.g. 'pySpecAn'
+        :param str command_str: the command, only its first word is used as key
+        :param str metric: the metric the duration of the block is recorded as
+        """
+        if not self.enabled:
+            return _NULL_RECORD
+        return _CommandRecord(self, source, command_str, metric)
+
+    def _store(self, source:str, command_str:str, values:dict):
+        command = command_str.split(maxsplit=1)[0] if command_str.strip() else command_str
+        with self._lock:
+            for metric, value in values.items():
+                key = (source, command, metric)
+                if key not in self._metrics:
+                    self._metrics[key] = _Metric(histogram=metric.endswith('_s'))
+                self._metrics[key].add(value)
+
+    def summary(self)->list[dict]:
+        """
+        Statistics of every recorded (source, command, metric), slowest total first
+
+        Percentiles are estimated from the histogram, they are only given for durations.
+        """
+        with self._lock:
+            items = list(self._metrics.items())
+        rows = []
+        for (source, command, metric), m in items:
+            rows.append({
+                'source': source,
+                'command': command,
+                'metric': metric,
+                'count': m.count,
+                'total': m.total,
+                'mean': m.total/m.count,
+                'min': m.min,
+                'max': m.max,
+                'p50': m.percentile(50),
+                'p95': m.percentile(95),
+            })
+        rows.sort(key=lambda row: (row['metric'] != 'latency_s', -row['total']))
+        return rows
+
+    def exportJson(self, filename:str):
+        """Write the summary, including the histograms of the durations, to a JSON file"""
+        with self._lock:
+            histograms = {key: list(m.histogram) for key, m in self._metrics.items() if m.histogram is not None}
+        rows = self.summary()
+        for row in rows:
+            key = (row['source'], row['command'], row['metric'])
+            if key in histograms:
+                row['histogram'] = histograms[key]
+        with open(filename, 'w') as f:
+            json.dump({'histogram_edges_s': list(_Metric.HISTOGRAM_EDGES_S), 'commands': rows}, f, indent=1)
+
+    def exportCsv(self, filename:str):
+        """Write the summary to a CSV file, one row per source, command and metric"""
+        rows = self.summary()
+        with open(filename, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['source', 'command', 'metric', 'count', 'total', 'mean', 'min', 'max', 'p50', 'p95'])
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+command_profiler = CommandProfiler()  # shared by all drivers
@@ -0,0 +1,139 @@
+import functools
+import json
+import os
+import threading
+from time import perf_counter_ns
+
+
+class _Span():
+    """Times one phase, returned by Tracer.span when the tracer is enabled"""
+
+    __slots__ = ('tracer', 'name', 'category', 'args', 'start_ns')
+
+    def __init__(self, tracer:'Tracer', name:str, category:str, args:dict):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start_ns = perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.args['exception'] = exc_type.__name__
+        self.tracer.addComplete(self.name, self.category, self.start_ns, perf_counter_ns()-self.start_ns, self.args)
+        return False
+
+
+class _NullSpan():
+    """Stand-in for _Span when the tracer is disabled, does nothing"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def _json_value(value):
+    # numpy scalars are converted to python ones, anything else json can't write goes as a string
+    if hasattr(value, 'item'):
+        value = value.item()
+    return value if isinstance(value, (int, float, str, bool, type(None))) else str(value)
+
+
+class Tracer():
+    """
+    Phase level tracing of measurement runs, exported in the Chrome trace event format
+
+    Disabled by default. The measurement classes wrap their phases (setup, CTUNE, sweep steps, acquisition, result
+    writing) in ``with tracer.span(name, **args):``, which costs a single attribute check while disabled. The exported
+    file can be opened in https://ui.perfetto.dev or chrome://tracing to inspect a run on a timeline. Spans are nested by
+    time on each thread. If the command profiler is enabled too, the individual driver commands are added as spans.
+
+    Usage:
+
+        from common import tracer
+        tracer.enable()
+        ...  # run the measurement
+        tracer.exportChromeTrace("trace.json")
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._events = []
+        self._start_ns = perf_counter_ns()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self._events = []
+            self._start_ns = perf_counter_ns()
+
+    def span(self, name:str, category:str='measurement', **args):
+        """
+        Context manager recording the enclosed block as one span
+
+        :param str name: name of the phase, e.g. 'acquisition'
+        :param str category: category of the span, shown in the trace viewer and usable to filter
+        :param args: values shown with the span, e.g. frequency_Hz=868e6
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, category, args)
+
+    def traced(self, name:str|None=None, category:str='measurement'):
+        """
+        Decorator recording every call of a function or method as one span
+
+        :param str name: name of the span, defaults to the name of the function
+        :param str category: category of the span
+        """
+        def decorator(function):
+            span_name = name or function.__name__
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with _Span(self, span_name, category, {}):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def instant(self, name:str, category:str='measurement', **args):
+        """Record a single point in time, e.g. a reset or an error"""
+        if self.enabled:
+            self._append({'name': name, 'cat': category, 'ph': 'i', 's': 't', 'ts': (perf_counter_ns()-self._start_ns)/1000, 'args': args})
+
+    def addComplete(self, name:str, category:str, start_ns:int, duration_ns:int, args:dict|None=None):
+        """Record a span measured elsewhere, start_ns is a time.perf_counter_ns() value"""
+        self._append({'name': name, 'cat': category, 'ph': 'X', 'ts': (start_ns-self._start_ns)/1000, 'dur': duration_ns/1000, 'args': args or {}})
+
+    def _append(self, event:dict):
+        event['pid'] = os.getpid()
+        event['tid'] = threading.get_ident()
+        with self._lock:
+            self._events.append(event)
+
+    def exportChromeTrace(self, filename:str):
+        """Write the recorded spans to a Chrome trace event JSON file"""
+        with self._lock:
+            events = [dict(event, args={key: _json_value(value) for key, value in event['args'].items()}) for event in self._events]
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+tracer = Tracer()  # shared by all measurements and drivers
@@ -0,0 +1,120 @@
+import json
+import threading
+
+
+class InstrumentRegistry():
+    """
+    Process-wide VISA resource manager and session registry
+
+    The instrument factories (SpecAn, SigGen, PSU) identify the instrument with identify(), and the driver classes
+    open their session with openSession(). The session opened for the *IDN? query is kept and handed over to the
+    driver, so bring-up needs only one session per instrument, and a single ResourceManager is shared by all.
+    IDN responses are cached per resource string for the life of the process, and across runs as well if
+    idn_cache_filename is set. Drivers close their session with closeSession(), the shared ResourceManager is
+    left open, closing it would close the sessions of every other instrument.
+
+    :param str idn_cache_filename: if set, a .json file where the IDN responses are kept across runs. An instrument
+                                   swapped on the same address is only recognized after forget() or deleting the file
+    """
+
+    def __init__(self):
+        self.idn_cache_filename:str|None = None
+        self._lock = threading.RLock()
+        self._rm = None
+        self._idle_sessions = {}  # resource -> session opened for identification, not claimed by a driver yet
+        self._idn_cache = {}
+        self._idn_cache_loaded_from = None
+
+    def resourceManager(self):
+        """The shared pyvisa ResourceManager, created at the first call"""
+        with self._lock:
+            if self._rm is None:
+                import pyvisa  # only the VISA instrument drivers need pyvisa
+                self._rm = pyvisa.ResourceManager()
+            return self._rm
+
+    def openSession(self, resource:str):
+        """Return the session kept from the identification of resource, or open a new one"""
+        with self._lock:
+            session = self._idle_sessions.pop(resource, None)
+        if session is not None:
+            return session
+        return self.resourceManager().open_resource(resource_name=resource)
+
+    def closeSession(self, session):
+        """Close a driver's session, the shared ResourceManager is kept open"""
+        with self._lock:
+            for resource, idle in list(self._idle_sessions.items()):
+                if idle is session:
+                    del self._idle_sessions[resource]
+        session.close()
+
+    def releaseIdle(self, resource:str):
+        """Close the identification session of resource, for drivers that don't use a pyvisa session"""
+        with self._lock:
+            session = self._idle_sessions.pop(resource, None)
+        if session is not None:
+            session.close()
+
+    def identify(self, resource:str)->str:
+        """
+        The *IDN? response of the instrument at resource, queried only once
+
+        If the instrument has to be queried, the session is kept for the driver, see openSession.
+        """
+        with self._lock:
+            self._loadIdnCache()
+            if resource in self._idn_cache:
+                return self._idn_cache[resource]
+        session = self.openSession(resource)
+        try:
+            idn = session.query("*IDN?")
+        except:
+            session.close()
+            raise
+        with self._lock:
+            self._idle_sessions[resource] = session
+            self._idn_cache[resource] = idn
+            self._saveIdnCache()
+        return idn
+
+    def cachedIdn(self, resource:str)->str|None:
+        """The cached *IDN? response of resource, None if it has not been queried yet"""
+        with self._lock:
+            self._loadIdnCache()
+            return self._idn_cache.get(resource)
+
+    def rememberIdn(self, resource:str, idn:str):
+        """Cache the *IDN? response of resource, queried by a driver on its own session"""
+        with self._lock:
+            self._loadIdnCache()
+            self._idn_cache[resource] = idn
+            self._saveIdnCache()
+
+    def forget(self, resource:str|None=None):
+        """Forget the cached IDN of resource (of every resource if None), e.g. after swapping an instrument"""
+        with self._lock:
+            self._loadIdnCache()
+            if resource is None:
+                self._idn_cache.clear()
+            else:
+                self._idn_cache.pop(resource, None)
+            self._saveIdnCache()
+
+    def _loadIdnCache(self):
+        if self.idn_cache_filename is None or self._idn_cache_loaded_from == self.idn_cache_filename:
+            return
+        self._idn_cache_loaded_from = self.idn_cache_filename
+        try:
+            with open(self.idn_cache_filename) as f:
+                self._idn_cache = {**json.load(f), **self._idn_cache}
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    def _saveIdnCache(self):
+        if self.idn_cache_filename is not None:
+            with open(self.idn_cache_filename, 'w') as f:
+                json.dump(self._idn_cache, f, indent=1)
+
+
+instrument_registry = InstrumentRegistry()  # shared by all VISA instrument drivers
@@ -0,0 +1,128 @@
+from pywstk.pyRAIL import WSTK_RAILTest
+from pyspecan.pySpecAn import SpecAn
+from pysiggen.pySigGen import SigGen
+from pypsu import pyPSU
+from common import Logger
+from concurrent.futures import Future
+import atexit
+import threading
+
+
+class InstrumentSessions():
+    """
+    Instruments shared by the measurements of one script
+
+    Without it, every measurement opens its own VISA and serial sessions, resets the instruments at the start and closes
+    them at the end. If the measurements get the same InstrumentSessions object, they borrow the instruments from it:
+    an instrument is opened and reset once, at its first use, and the next measurements continue with the open session,
+    skipping the reset, so the uploaded waveforms and the CTUNE of the DUT are kept as well. At the end of a measurement
+    the instruments are only set to an idle state (generator RF off, DUT radio idle). They are closed once, by close(),
+    at the end of the with block or at exit.
+
+    Instruments are identified by their kind and address, a generator used as the main generator in one measurement and
+    as the blocker in another one is the same instrument.
+
+    Usage:
+
+        with InstrumentSessions() as sessions:
+            Sensitivity(sens_settings, chip_name, board_name, sessions=sessions).measure()
+            Blocking(blocking_settings, chip_name, board_name, sessions=sessions).measure()
+            RSSI_Sweep(rssi_settings, chip_name, board_name, sessions=sessions).measure()
+
+    :param Logger.Settings logger_settings: Logger module settings
+    """
+
+    def __init__(self, logger_settings:Logger.Settings = Logger.Settings()):
+        if logger_settings.module_name is None:
+            logger_settings.module_name = __name__
+        self.logger = Logger(logger_settings)
+        self._lock = threading.Lock()
+        self._instruments = {}  # (kind, address) -> Future of the instrument, in opening order
+        self._closed = False
+        atexit.register(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def _borrow(self, kind:str, address:str, open_instrument)->tuple[object, bool]:
+        # the key is reserved under the lock and the instrument opened outside it, so different instruments can be
+        # opened concurrently, while a concurrent borrow of the same instrument waits for the first one to open it
+        key = (kind, address)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Instrument sessions already closed")
+            future = self._instruments.get(key)
+            reused = future is not None
+            if not reused:
+                future = Future()
+                self._instruments[key] = future
+        if reused:
+            self.logger.debug("Reusing %s at %s", kind, address)
+            return future.result(), True
+        try:
+            instrument = open_instrument()
+        except BaseException as error:
+            with self._lock:
+                self._instruments.pop(key, None)  # the next borrow tries again
+            future.set_exception(error)
+            raise
+        future.set_result(instrument)
+        return instrument, False
+
+    def siggen(self, address:str, logger_settings:Logger.Settings)->tuple[object, bool]:
+        """
+        The signal generator at address
+
+        :return: the generator, and True if it was already open (and set up by an earlier measurement)
+        """
+        return self._borrow('siggen', address, lambda: SigGen(resource=address, logger_settings=logger_settings))
+
+    def specan(self, address:str, logger_settings:Logger.Settings)->tuple[object, bool]:
+        """
+        The spectrum analyzer at address
+
+        :return: the analyzer, and True if it was already open (and set up by an earlier measurement)
+        """
+        return self._borrow('specan', address, lambda: SpecAn(resource=address, logger_settings=logger_settings))
+
+    def psu(self, address:str, logger_settings:Logger.Settings)->tuple[object, bool]:
+        """
+        The power supply at address
+
+        :return: the PSU, and True if it was already open (and set up by an earlier measurement)
+        """
+        return self._borrow('psu', address, lambda: pyPSU.PSU(address, logger_settings=logger_settings))
+
+    def wstk(self, com_port:str, logger_settings:Logger.Settings, baudrate:int|None=115200)->tuple[WSTK_RAILTest, bool]:
+        """
+        The RAILTest device on com_port, reset when it is opened
+
+        :return: the device, and True if it was already open (and set up by an earlier measurement)
+        """
+        return self._borrow('wstk', com_port, lambda: WSTK_RAILTest(com_port, logger_settings=logger_settings, reset=True, baudRate=baudrate))
+
+    def close(self):
+        """Set every instrument to a safe state and close the sessions, in the reverse order of opening. Only the first call does anything."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            instruments = list(self._instruments.items())
+            self._instruments = {}
+        for (kind, address), future in reversed(instruments):
+            if future.exception() is not None:  # waits if another thread is still opening it
+                continue
+            instrument = future.result()
+            try:
+                if kind == 'siggen':
+                    instrument.toggleModulation(False)
+                    instrument.toggleRFOut(False)
+                elif kind == 'wstk':
+                    instrument._driver.reset()
+                instrument.close()  # the PSU turns its output off
+            except Exception as error:
+                self.logger.warning("Closing %s at %s failed: %s", kind, address, error)
@@ -1,9 +1,11 @@
 import pyvisa
 import warnings
+import threading
 import numpy as np
 from dataclasses import dataclass
-from time import sleep
-from common import Logger, Level
+from time import sleep, monotonic
+from common import Logger, Level, command_profiler, instrument_registry
+from pyvisa.util import from_ascii_block
 @dataclass
 class PSUSettings:
     limit_A:float = 3
@@ -14,7 +16,110 @@ class PSUSettings:
 
     def __str__(self):
         return str(self.limit_V) +'V' +'/'+ str(self.limit_A)+'A '+'\nmode: '+ str(self.mode)+' '+'\noutput 1: '+str(self.output_1)+ ' output 2: '+str(self.output_2)
-    
+
+@dataclass
+class CurrentAcquisition:
+    samples_A:np.ndarray
+    timestamps_s:np.ndarray  # relative to the first sample
+
+    @property
+    def mean_A(self)->float:
+        return float(np.mean(self.samples_A))
+    @property
+    def min_A(self)->float:
+        return float(np.min(self.samples_A))
+    @property
+    def max_A(self)->float:
+        return float(np.max(self.samples_A))
+
+    def __str__(self):
+        return f"{len(self.samples_A)} samples, mean: {self.mean_A*1e3:.3f} mA, min: {self.min_A*1e3:.3f} mA, max: {self.max_A*1e3:.3f} mA"
+
+
+class CurrentMonitor(object):
+    """
+    Background current monitor, polls MEAS:CURR? from its own thread into a preallocated ring buffer
+
+    The samples are timestamped with time.monotonic() (the middle of the query), so the foreground code only has to
+    note monotonic() at the start and end of a measurement and ask for that window afterwards. When the buffer is full
+    the oldest samples are overwritten. The VISA session is shared with the foreground through the PSU lock.
+
+    :param GenericPSU psu: supply to monitor, the currently selected output is measured
+    :param float rate_Hz: polling rate, the actual rate is limited by the query time of the supply
+    :param int buffer_size: number of samples kept
+    """
+    def __init__(self, psu:'GenericPSU', rate_Hz:float=10, buffer_size:int=10000):
+        self.psu = psu
+        self.period_s = 1/rate_Hz
+        self._samples = np.full(buffer_size, np.nan)
+        self._timestamps = np.full(buffer_size, np.nan)
+        self._index = 0
+        self._count = 0
+        self._buffer_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self)->bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="CurrentMonitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def clear(self):
+        with self._buffer_lock:
+            self._index = 0
+            self._count = 0
+
+    def _run(self):
+        next_poll = monotonic()
+        while not self._stop_event.is_set():
+            try:
+                with self.psu._visa_lock:
+                    before = monotonic()
+                    value = self.psu.instr.query_ascii_values("MEAS:CURR?", delay=0)[0]
+                    after = monotonic()
+            except Exception as error:
+                self.psu.logger.error("Current monitor stopped: " + str(error))
+                return
+            with self._buffer_lock:
+                self._samples[self._index] = value
+                self._timestamps[self._index] = (before+after)/2
+                self._index = (self._index+1) % len(self._samples)
+                self._count = min(self._count+1, len(self._samples))
+            next_poll = max(next_poll + self.period_s, monotonic())
+            self._stop_event.wait(next_poll - monotonic())
+
+    def window(self, start_s:float, stop_s:float|None=None)->CurrentAcquisition:
+        """
+        Return the samples taken between two monotonic() timestamps
+
+        :param float start_s: start of the window, as returned by time.monotonic()
+        :param float stop_s: end of the window, None for up to now
+
+        :return: the samples of the window, timestamps relative to start_s (empty if no sample fell in the window)
+        :rtype: CurrentAcquisition
+        """
+        if stop_s is None:
+            stop_s = monotonic()
+        with self._buffer_lock:
+            # oldest sample first
+            order = (np.arange(self._count) + self._index - self._count) % len(self._samples)
+            samples = self._samples[order]
+            timestamps = self._timestamps[order]
+        selected = (timestamps >= start_s) & (timestamps <= stop_s)
+        return CurrentAcquisition(samples_A=samples[selected], timestamps_s=timestamps[selected]-start_s)
+
 
 # PSU is a factory class that returns the right sub-classed instrument based on the response to the *IDN? query
 # Tries to indetify the instrument and use the appropriate sub-class
@@ -22,17 +127,14 @@ class PSUSettings:
 class PSU(object):
     def __new__(cls, resource:str, default_timeout_ms:int=1000, auto_detect:bool=True, logger_settings :Logger.Settings = Logger.Settings()):
         if auto_detect:
-            # open a VISA session, query instrument and try to identify it
-            _rm = pyvisa.ResourceManager()
-            _instr = _rm.open_resource(resource_name=resource)
-            idn_query_response = _instr.query("*IDN?")
+            # query instrument and try to identify it, the session is kept for the driver and the response is cached
+            idn_query_response = instrument_registry.identify(resource)
             if logger_settings.module_name is None:
                 logger_settings.module_name = __name__
-            # Instrument session won't be used here anymore, close it
-            # Resource Manager shouldn't be closed, because it is a singleton object
-            _instr.close()
             # instantiate the right sub-class if the instrument is properly identified
-            if "Agilent" in idn_query_response:
+            if ("Agilent" in idn_query_response or "Keysight" in idn_query_response) and ",N67" in idn_query_response:
+                return KeysightN67xxPSU(resource_name=resource, default_timeout_ms=default_timeout_ms,logger_settings=logger_settings)
+            elif "Agilent" in idn_query_response:
                 return GenericPSU(resource_name=resource, default_timeout_ms=default_timeout_ms,logger_settings=logger_settings)
             else:
                 warnings.warn("No specific power supply type identified, using generic instrument.")
@@ -46,8 +148,7 @@ class PSU(object):
 class GenericPSU(object):
     def __init__(self, resource_name:str, default_timeout_ms:int=1000,logger_settings :Logger.Settings = Logger.Settings()):
         try:
-            self._rm = pyvisa.ResourceManager()
-            self.instr = self._rm.open_resource(resource_name=resource_name)
+            self.instr = instrument_registry.openSession(resource_name)
             self.instr.timeout = default_timeout_ms
             self.instr.opc_timeout = 3000
             self.instr.visa_timeout = 3000
@@ -55,28 +156,51 @@ class GenericPSU(object):
             self.instr.query_delay=0.2
             self.default_timeout_ms = default_timeout_ms
             self.settings = PSUSettings()
+            self._output = 1
+            self._visa_lock = threading.RLock()  # shared with the current monitor thread
+            self.monitor = None
+            self._voltage_list = None
+            self._voltage_list_index = -1
+            self._settle_tolerance_V = 0.05
+            self._settle_timeout_s = 1.0
             self.logger = Logger(logger_settings)
             
         except:
             self.instr = None
             raise
-    def __del__(self):
+    def close(self):
+        """Turn the output off and close the VISA session, only the first call does anything"""
+        if getattr(self, 'instr', None) is None:
+            return
         try:
+            self.stopCurrentMonitor()
             self.toggleOutput(False)
-            self.instr.close()
-            self._rm.close()
+            instrument_registry.closeSession(self.instr)
         except pyvisa.errors.InvalidSession as error:
-            self.logger.warn("Session already closed at destructor, possibly by other instrument")
+            self.logger.warn("Session already closed, possibly by other instrument")
+        self.instr = None
+    def __del__(self):
+        self.close()
     def command(self, command_str, query_opc:bool=True, write_delay_ms:float=0.5):
-        self.instr.write(command_str)
-        self.logger.debug("SCPI Write: " + command_str)
-        sleep(write_delay_ms) # this delay is necessary to give time for an older instrument to process the write
-        if query_opc:
-            opc = self.instr.query_ascii_values("*OPC?")[0]
-            if opc == 0:
-                raise Exception("OPC violation")
+        with self._visa_lock, command_profiler.command("pyPSU", command_str) as record:
+            self.instr.write(command_str)
+            self.logger.debug("SCPI Write: %s", command_str)
+            record.add('bytes_out', len(command_str))
+            record.split('write_s')
+            sleep(write_delay_ms/1000) # this delay is necessary to give time for an older instrument to process the write
+            if query_opc:
+                record.split('write_delay_s')
+                opc = self.instr.query_ascii_values("*OPC?")[0]
+                record.split('opc_s')
+                if opc == 0:
+                    raise Exception("OPC violation")
     def query_float(self, command_str, timeout_ms:int=0):
-        r = self.instr.query_ascii_values(command_str)
+        with self._visa_lock, command_profiler.command("pyPSU", command_str) as record:
+            response = self.instr.query(command_str)
+            record.split('query_s')
+            record.add('bytes_in', len(response))
+            r = from_ascii_block(response)
+            record.split('parse_s')
         if len(r)==1:
             return float(r[0])
         else:
@@ -96,9 +220,108 @@ class GenericPSU(object):
     def measCurrent(self):
         meas_current = self.query_float("MEAS:CURR?")
         return meas_current
+    def measVoltage(self):
+        with self._visa_lock:
+            return self.instr.query_ascii_values("MEAS:VOLT?", delay=0)[0]
+    def waitVoltageSettled(self, voltage_V:float, tolerance_V:float=0.05, timeout_s:float=1.0)->float:
+        """
+        Read back the measured output voltage until it is within tolerance_V of voltage_V
+
+        :return: the last measured voltage, a warning is logged if it did not settle within timeout_s
+        :rtype: float
+        """
+        start = monotonic()
+        measured = self.measVoltage()
+        while abs(measured - voltage_V) > tolerance_V:
+            if monotonic() - start > timeout_s:
+                self.logger.warn(f"Output did not settle to {voltage_V} V in {timeout_s} s, measured {measured} V")
+                break
+            measured = self.measVoltage()
+        self.logger.debug("Output settled to %s V in %.1f ms", measured, (monotonic()-start)*1e3)
+        return measured
+    def setVoltageList(self, voltages_V:list, tolerance_V:float=0.05, settle_timeout_s:float=1.0):
+        """
+        Load a list of voltages, stepped through with stepVoltageList
+
+        Supplies with a list mode download the list and advance it with a bus trigger. Others get one VOLT write per step,
+        without the write delay and OPC query of command(). In both cases each step is confirmed by reading back the
+        measured voltage, instead of waiting a fixed time.
+
+        :param list voltages_V: output voltages, in order
+        :param float tolerance_V: a step is settled when the measured voltage is this close to the target
+        :param float settle_timeout_s: give up waiting for a step to settle after this time (a warning is logged)
+        """
+        self._voltage_list = [float(v) for v in voltages_V]
+        self._voltage_list_index = -1
+        self._settle_tolerance_V = tolerance_V
+        self._settle_timeout_s = settle_timeout_s
+    def stepVoltageList(self)->float:
+        """
+        Go to the next voltage of the list (back to the first one after the last), and wait until the output settled
+
+        :return: the measured output voltage
+        :rtype: float
+        """
+        if self._voltage_list is None:
+            raise RuntimeError("No voltage list loaded, call setVoltageList first")
+        self._voltage_list_index = (self._voltage_list_index + 1) % len(self._voltage_list)
+        voltage = self._voltage_list[self._voltage_list_index]
+        self._stepVoltage(voltage)
+        self.settings.limit_V = voltage
+        return self.waitVoltageSettled(voltage, tolerance_V=self._settle_tolerance_V, timeout_s=self._settle_timeout_s)
+    def _stepVoltage(self, voltage_V:float):
+        self.command("VOLT " + str(voltage_V), query_opc=False, write_delay_ms=0)
+    def stopVoltageList(self):
+        self._voltage_list = None
+        self._voltage_list_index = -1
+    def acquireCurrent(self, window_s:float=0.1, max_samples:int=1000)->CurrentAcquisition:
+        """
+        Sample the output current for window_s, with back to back MEAS:CURR? queries (no OPC, no query delay)
+
+        Supplies with an internal measurement buffer override this to fetch the whole window in one query.
+
+        :param float window_s: length of the acquisition in seconds, at least one sample is taken
+        :param int max_samples: stop after this many samples even if the window is not over
+
+        :return: the samples with their timestamps, and their statistics
+        :rtype: CurrentAcquisition
+        """
+        samples = []
+        timestamps = []
+        start = monotonic()
+        with self._visa_lock:
+            while not samples or (monotonic()-start < window_s and len(samples) < max_samples):
+                samples.append(self.instr.query_ascii_values("MEAS:CURR?", delay=0)[0])
+                timestamps.append(monotonic()-start)
+        acquisition = CurrentAcquisition(samples_A=np.array(samples), timestamps_s=np.array(timestamps)-timestamps[0])
+        self.logger.debug("Current acquisition: %s", acquisition)
+        return acquisition
+    def startCurrentMonitor(self, rate_Hz:float=10, buffer_size:int=10000)->CurrentMonitor:
+        """
+        Start polling the output current in a background thread, see CurrentMonitor
+
+        The setters and queries of this class can be used while the monitor runs, the VISA session is locked per command.
+
+        :param float rate_Hz: polling rate
+        :param int buffer_size: number of samples kept in the ring buffer
+        """
+        self.stopCurrentMonitor()
+        self.monitor = CurrentMonitor(self, rate_Hz=rate_Hz, buffer_size=buffer_size)
+        self.monitor.start()
+        return self.monitor
+    def stopCurrentMonitor(self):
+        if getattr(self, 'monitor', None) is not None:
+            self.monitor.stop()
+            self.monitor = None
+    def getCurrentWindow(self, start_s:float, stop_s:float|None=None)->CurrentAcquisition:
+        """Current samples of the background monitor between two time.monotonic() timestamps, see CurrentMonitor.window"""
+        if self.monitor is None:
+            raise RuntimeError("Current monitor is not running, call startCurrentMonitor first")
+        return self.monitor.window(start_s, stop_s)
     def selectOutput(self, output:int=1):
         if output == 1 or output == 2:
             self.command("INST:SEL OUT" + str(output))
+            self._output = output
             if output == 1:
                 self.settings.output_1 = True
             if output == 2:
@@ -113,15 +336,55 @@ class GenericPSU(object):
     def getSettings(self,settings:PSUSettings):
         pass
     def geterror(self):
-        error = self.instr.query("SYST:ERR?") 
+        with self._visa_lock:
+            error = self.instr.query("SYST:ERR?") 
         sleep(0.5)
         self.logger.error(error)
 
-            
-
-
 
- 
+# Keysight (Agilent) N67xx modular power systems, e.g. N6705
+# The outputs have a digitizer, so acquireCurrent fetches the whole window as one array
+class KeysightN67xxPSU(GenericPSU):
+    MIN_SAMPLE_INTERVAL_S = 20.48e-6
 
+    # The voltage list runs in the supply, one step per bus trigger, repeating until stopped
+    def setVoltageList(self, voltages_V:list, tolerance_V:float=0.05, settle_timeout_s:float=1.0):
+        super().setVoltageList(voltages_V, tolerance_V=tolerance_V, settle_timeout_s=settle_timeout_s)
+        channel = "(@" + str(self._output) + ")"
+        self.command("ABOR:TRAN " + channel)
+        self.command("LIST:VOLT " + ",".join(str(v) for v in self._voltage_list) + "," + channel)
+        self.command("LIST:DWEL " + ",".join("0" for v in self._voltage_list) + "," + channel)
+        self.command("LIST:STEP ONCE," + channel)
+        self.command("LIST:COUN INF," + channel)
+        self.command("VOLT:MODE LIST," + channel)
+        self.command("TRIG:TRAN:SOUR BUS," + channel)
+        self.command("INIT:TRAN " + channel)
+    def _stepVoltage(self, voltage_V:float):
+        self.command("*TRG", query_opc=False, write_delay_ms=0)
+    def stopVoltageList(self):
+        if self._voltage_list is not None:
+            channel = "(@" + str(self._output) + ")"
+            self.command("ABOR:TRAN " + channel)
+            self.command("VOLT:MODE FIX," + channel)
+            # the fixed voltage setting is unchanged by the list, keep the output where the list left it
+            if self._voltage_list_index >= 0:
+                self.command("VOLT " + str(self._voltage_list[self._voltage_list_index]) + "," + channel)
+        super().stopVoltageList()
 
 
+    def acquireCurrent(self, window_s:float=0.1, max_samples:int=1000)->CurrentAcquisition:
+        interval_s = max(window_s/max_samples, self.MIN_SAMPLE_INTERVAL_S)
+        npoints = max(1, min(max_samples, int(window_s/interval_s)))
+        channel = "(@" + str(self._output) + ")"
+        self.command("SENS:SWE:TINT " + str(interval_s) + "," + channel, write_delay_ms=0)
+        self.command("SENS:SWE:POIN " + str(npoints) + "," + channel, write_delay_ms=0)
+        with self._visa_lock:
+            timeout = self.instr.timeout
+            self.instr.timeout = max(timeout, window_s*2000 + 1000)  # the query returns after the acquisition
+            try:
+                samples = np.array(self.instr.query_ascii_values("MEAS:ARR:CURR? " + channel, delay=0))
+            finally:
+                self.instr.timeout = timeout
+        acquisition = CurrentAcquisition(samples_A=samples, timestamps_s=np.arange(len(samples))*interval_s)
+        self.logger.debug("Current acquisition: %s", acquisition)
+        return acquisition
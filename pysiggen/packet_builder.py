@@ -0,0 +1,148 @@
+"""
+Packet builder for PER measurements
+
+Builds the over-the-air bit stream of a test packet (preamble, sync word, PHR, payload, CRC, whitening) from the
+PHY parameters, so the signal generators can be loaded without a logic analyzer capture of a real transmission.
+The defaults reproduce the standard RAIL packet shipped in packets/std_rail_packet.csv.
+
+Packets are built once per configuration and cached, the configurations are immutable for this reason.
+"""
+
+import csv
+from dataclasses import dataclass
+from functools import lru_cache
+import numpy as np
+
+
+@dataclass(frozen=True)
+class CrcConfig:
+    """
+    Generic CRC definition, in the usual (width, poly, init, refin, refout, xorout) form
+
+    The CRC is appended to the frame big-endian, and goes through the same bit ordering as the rest of the frame.
+    """
+    width:int = 16
+    poly:int = 0x8005
+    init:int = 0x0000
+    refin:bool = True
+    refout:bool = True
+    xorout:int = 0x0000
+
+    def compute(self, data:bytes)->int:
+        top_bit = 1 << (self.width-1)
+        mask = (1 << self.width)-1
+        crc = self.init
+        for byte in data:
+            if self.refin:
+                byte = _reverse_bits(byte, 8)
+            crc ^= byte << (self.width-8)
+            for _ in range(8):
+                if crc & top_bit:
+                    crc = ((crc << 1) ^ self.poly) & mask
+                else:
+                    crc = (crc << 1) & mask
+        if self.refout:
+            crc = _reverse_bits(crc, self.width)
+        return crc ^ self.xorout
+
+
+CRC16_ARC = CrcConfig()  # the CRC of the standard RAIL packet
+CRC16_CCITT = CrcConfig(width=16, poly=0x1021, init=0xFFFF, refin=False, refout=False, xorout=0x0000)
+
+RAIL_DEFAULT_PAYLOAD = bytes.fromhex('0f0e11223344550f778899aabbccddee')
+
+
+@dataclass(frozen=True)
+class PacketConfig:
+    """
+    Over-the-air packet definition
+
+    :param int preamble_bits: length of the preamble in bits
+    :param int preamble_pattern: the preamble is this 2 bit pattern repeated (0b01 gives 0101...)
+    :param int sync_word: sync word, in transmission order (first bit on air is the MSB)
+    :param int sync_word_bits: length of the sync word in bits
+    :param bytes phr: PHY header, sent before the payload and covered by the CRC and the whitening
+    :param bytes payload: payload bytes
+    :param CrcConfig crc: CRC appended after the payload, None for no CRC
+    :param bool lsb_first: send the bytes of PHR, payload and CRC least significant bit first
+    :param bool whitening: XOR PHR, payload and CRC with the PN9 sequence
+    :param int whitening_seed: initial state of the PN9 whitening LFSR
+    """
+    preamble_bits:int = 40
+    preamble_pattern:int = 0b01
+    sync_word:int = 0xF68D
+    sync_word_bits:int = 16
+    phr:bytes = b''
+    payload:bytes = RAIL_DEFAULT_PAYLOAD
+    crc:CrcConfig|None = CRC16_ARC
+    lsb_first:bool = True
+    whitening:bool = False
+    whitening_seed:int = 0x1FF
+
+
+def _reverse_bits(value:int, width:int)->int:
+    result = 0
+    for _ in range(width):
+        result = (result << 1) | (value & 1)
+        value >>= 1
+    return result
+
+
+def _int_to_bits(value:int, nbits:int)->np.ndarray:
+    return np.array([(value >> (nbits-1-k)) & 1 for k in range(nbits)], dtype=np.uint8)
+
+
+def _pn9_sequence(nbits:int, seed:int)->np.ndarray:
+    # x^9 + x^5 + 1 LFSR, as used for 802.15.4g / EFR32 whitening
+    state = seed & 0x1FF
+    out = np.empty(nbits, dtype=np.uint8)
+    for k in range(nbits):
+        out[k] = state & 1
+        feedback = (state ^ (state >> 5)) & 1
+        state = (state >> 1) | (feedback << 8)
+    return out
+
+
+@lru_cache(maxsize=32)
+def build_packet_bits(config:PacketConfig)->np.ndarray:
+    """
+    Build the packet as an array of bits (one uint8 per bit), in transmission order
+
+    The returned array is cached and must not be modified.
+    """
+    frame = config.phr + config.payload
+    if config.crc is not None:
+        frame += config.crc.compute(frame).to_bytes((config.crc.width+7)//8, 'big')
+    frame_bits = np.unpackbits(np.frombuffer(frame, dtype=np.uint8), bitorder='little' if config.lsb_first else 'big')
+    if config.whitening:
+        frame_bits = frame_bits ^ _pn9_sequence(len(frame_bits), config.whitening_seed)
+
+    preamble = np.resize(_int_to_bits(config.preamble_pattern, 2), config.preamble_bits)
+    sync = _int_to_bits(config.sync_word, config.sync_word_bits)
+    bits = np.concatenate((preamble, sync, frame_bits)).astype(np.uint8)
+    bits.setflags(write=False)
+    return bits
+
+
+@lru_cache(maxsize=32)
+def build_packet_hex(config:PacketConfig)->str:
+    """Build the packet and return it as a hex string (zero padded to whole bytes), the format the generators are loaded with."""
+    return np.packbits(build_packet_bits(config)).tobytes().hex().upper()
+
+
+@lru_cache(maxsize=32)
+def read_saleae_csv_hex(data_csv_filename:str)->str:
+    """
+    Read a packet from a Saleae Logic SPI analyzer .csv export ('mosi' column) and return it as a hex string
+
+    Kept for packets captured from real transmissions. Raises FileNotFoundError if the file does not exist.
+    """
+    with open(data_csv_filename, newline='') as f:
+        return ''.join(row['mosi'][2:] for row in csv.DictReader(f))
+
+
+def packet_hex(packet:'PacketConfig|str')->str:
+    """Return the hex string of a packet given either as a PacketConfig or as a Saleae .csv export filename."""
+    if isinstance(packet, PacketConfig):
+        return build_packet_hex(packet)
+    return read_saleae_csv_hex(packet)
@@ -1,11 +1,14 @@
 import pyvisa
 import warnings
+import hashlib
+import json
+import threading
 import numpy as np
 from dataclasses import dataclass
 from time import sleep
-from common import Logger, Level
-import pandas as pd
-from RsInstrument import *
+from common import Logger, Level, command_profiler, instrument_registry
+from pyvisa.util import from_ascii_block
+from .packet_builder import PacketConfig, packet_hex
 
 @dataclass
 class ModulationConfig:
@@ -32,27 +35,46 @@ class SigGenSettings:
     pattern_repeat = "CONT"
     trigger_type = "BUS"
     per_packet_filename = "pysiggen/packets/std_rail_packet.csv"
+    per_packet = None # PacketConfig of a built packet, used instead of per_packet_filename if set
     per_packet_siggen_name = "TEMP"
 
     def __str__(self):
         return str(self.frequency_Hz/1e6) + ' MHz' + '\n' + str(self.amplitude_dBm) +' dBm' + '\nmodulation: ' + str(self.modulation) + ' ' +  '\nMOD on: '+ str(self.mod_on) + '\nRF On: ' + str(self.rf_on) + '\nStream: ' + str(self.stream_type) + '\nFilter: ' + str(self.filter_type) + '\nFilter_BbT: ' + str(self.filter_BbT) + '\nCustom On: ' + str(self.custom_on)
     
 
+# Content hashes of the files uploaded to each generator, keyed by the generator's identity and the file name
+# Lets setBinaryData skip uploads the generator already holds, see GenericSigGen.upload_cache_filename
+_upload_cache:dict[str,dict[str,str]] = {}
+_upload_cache_loaded:set[str] = set()
+_upload_cache_lock = threading.RLock()  # generators can be used from parallel measurement threads
+
+def _load_upload_cache(filename:str):
+    with _upload_cache_lock:
+        if filename in _upload_cache_loaded:
+            return
+        _upload_cache_loaded.add(filename)
+        try:
+            with open(filename) as f:
+                for instrument, files in json.load(f).items():
+                    _upload_cache.setdefault(instrument, {}).update(files)
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+def _save_upload_cache(filename:str):
+    with _upload_cache_lock:
+        with open(filename, 'w') as f:
+            json.dump(_upload_cache, f, indent=1)
+
 # SigGen is a factory class that returns the right sub-classed instrument based on the response to the *IDN? query
 # Tries to identify the instrument and use the appropriate sub-class
 # If the device cannot be identified use the generic instrument
 class SigGen(object):
     def __new__(cls, resource:str, default_timeout_ms:int=1000, auto_detect:bool=True,logger_settings :Logger.Settings = Logger.Settings()):
         if auto_detect:
-            # open a VISA session, query instrument and try to identify it
-            _rm = pyvisa.ResourceManager()
-            _instr = _rm.open_resource(resource_name=resource)
-            idn_query_response = _instr.query("*IDN?")
+            # query instrument and try to identify it, the session is kept for the driver and the response is cached
+            idn_query_response = instrument_registry.identify(resource)
             if logger_settings.module_name is None:
                 logger_settings.module_name = __name__
-            # VISA session won't be used here anymore, close it
-            # Resource Manager shouldn't be closed, because it is a singleton object
-            _instr.close()
             # instantiate the right sub-class if the instrument is properly identified
             if "Hewlett" in idn_query_response:
                 return HPSigGen(resource_name=resource, default_timeout_ms=default_timeout_ms,logger_settings=logger_settings)
@@ -71,10 +93,17 @@ class SigGen(object):
 # Contains some default implementation of the various functions that might not work for all generators
 #
 class GenericSigGen(object):
+    upload_cache_filename:str|None = None  # set to a .json path to remember the uploaded files across runs, not only within one
+    _identity:str|None = None
+    supports_list_mode:bool = False  # True if the generator steps through a list by itself (dwell timed or triggered)
+    _list_points:list = []
+    _list_index:int = -1
+    _list_trigger_type:str = "BUS"
+
     def __init__(self, resource_name:str, default_timeout_ms:int=1000,logger_settings :Logger.Settings = Logger.Settings()):
         try:
-            self._rm = pyvisa.ResourceManager()
-            self.instr = self._rm.open_resource(resource_name=resource_name)
+            self.instr = instrument_registry.openSession(resource_name)
+            self.resource_name = resource_name
             self.instr.timeout = default_timeout_ms
             self.instr.opc_timeout = 3000
             self.instr.visa_timeout = 3000
@@ -85,34 +114,53 @@ class GenericSigGen(object):
         except:
             self.instr = None
             raise
-    def __del__(self):
+    def close(self):
+        """Close the VISA session, only the first call does anything"""
+        if getattr(self, 'instr', None) is None:
+            return
         try:
-            self.instr.close()
-            self._rm.close()
+            instrument_registry.closeSession(self.instr)
         except pyvisa.errors.InvalidSession as error:
-            self.logger.warn("Session already closed at destructor, possibly by other instrument")
+            self.logger.warn("Session already closed, possibly by other instrument")
+        self.instr = None
+    def __del__(self):
+        self.close()
     def command(self, command_str, query_opc:bool=True, write_delay_ms:float=0,binary_format=False,hex_string=''):
-        if binary_format:            
-            self.instr.write_binary_values(command_str, bytes.fromhex(hex_string), datatype='b', is_big_endian=True)
-            self.logger.debug("SCPI Binary Write: "+str(command_str) + str(hex_string))
-        else:
-            self.instr.write(command_str)
-            self.logger.debug("SCPI Write: "+str(command_str))
-        #self.logger.debug("Scpi Errors: "+ str(self.getError()))
-        sleep(write_delay_ms/1000) # this delay is necessary to give time for an older instrument to process the write
-        if query_opc:
-            opc = self.instr.query_ascii_values("*OPC?")[0]
-            if opc == 0:
-                raise Exception("OPC violation")
+        with command_profiler.command("pySigGen", command_str) as record:
+            if binary_format:            
+                self.instr.write_binary_values(command_str, bytes.fromhex(hex_string), datatype='b', is_big_endian=True)
+                self.logger.debug("SCPI Binary Write: %s%s", command_str, hex_string)
+                record.add('bytes_out', len(command_str) + len(hex_string)//2)
+            else:
+                self.instr.write(command_str)
+                self.logger.debug("SCPI Write: %s", command_str)
+                record.add('bytes_out', len(command_str))
+            record.split('write_s')
+            #self.logger.debug("Scpi Errors: "+ str(self.getError()))
+            sleep(write_delay_ms/1000) # this delay is necessary to give time for an older instrument to process the write
+            if query_opc:
+                record.split('write_delay_s')
+                opc = self.instr.query_ascii_values("*OPC?")[0]
+                record.split('opc_s')
+                if opc == 0:
+                    raise Exception("OPC violation")
     def query_float(self, command_str, timeout_ms:int=0):
-        r = self.instr.query_ascii_values(command_str)
+        with command_profiler.command("pySigGen", command_str) as record:
+            response = self.instr.query(command_str)
+            record.split('query_s')
+            record.add('bytes_in', len(response))
+            r = from_ascii_block(response)
+            record.split('parse_s')
         #print(r)
         if len(r)==1:
             return float(r[0])
         else:
             return [float(x) for x in r]
     def query(self,command_str):
-        return self.instr.query(command_str)
+        with command_profiler.command("pySigGen", command_str) as record:
+            response = self.instr.query(command_str)
+            record.add('bytes_in', len(response))
+        return response
     def reset(self):
         self.command("*RST",write_delay_ms=2000)
     def setFrequency(self, frequency_Hz:int):
@@ -170,8 +218,101 @@ class GenericSigGen(object):
     def sendTrigger(self,num:int,delay:float=0):
         self.logger.error("This function is not implemented")
 
-    def setBinaryData(self,data_csv_filename:str,bitfile_name:str):
+    def sendBurst(self,num:int,delay:float=0)->float:
+        """
+        Send num packets with a single command, repeated by the generator itself
+
+        Generators without burst support fall back to sending the triggers one by one.
+
+        :param int num: number of packets to send
+        :param float delay: time between the start of two packets, in seconds
+
+        :return: the time until the last packet of the burst is sent, in seconds
+        :rtype: float
+        """
+        self.sendTrigger(num,delay)
+        return 0.0
+
+    def setBinaryData(self,packet:PacketConfig|str,bitfile_name:str):
         self.logger.error("This function is not implemented")
+
+    def setList(self, points:list[tuple[float,float,float]], trigger_type:str="BUS"):
+        """
+        Download a list of (frequency_Hz, amplitude_dBm, dwell_s) points, to be stepped through with startList/stepList/setListIndex
+
+        Generators without list mode step through the points with setFrequency/setAmplitude, only changing what differs.
+
+        :param list points: (frequency_Hz, amplitude_dBm, dwell_s) tuples, dwell is ignored when stepped from the bus
+        :param str trigger_type: BUS (stepped by stepList/setListIndex) | EXT (stepped by external trigger) | IMM (dwell timed)
+        """
+        self._list_points = [tuple(p) for p in points]
+        self._list_index = -1
+    def startList(self):
+        """Switch to list mode, the output goes to the first point"""
+        self._list_index = -1
+        self.setListIndex(0)
+    def stepList(self):
+        self.setListIndex(self._list_index+1)
+    def setListIndex(self, index:int):
+        frequency_Hz, amplitude_dBm, _ = self._list_points[index]
+        previous = self._list_points[self._list_index] if self._list_index>=0 else (None, None, None)
+        if frequency_Hz != previous[0]:
+            self.setFrequency(frequency_Hz)
+        if amplitude_dBm != previous[1]:
+            self.setAmplitude(amplitude_dBm)
+        self._list_index = index
+    def stopList(self):
+        """Leave list mode, back to fixed frequency and amplitude"""
+        self._list_index = -1
+    def getIdentity(self)->str:
+        """Manufacturer, model and serial number from *IDN?, queried once per resource"""
+        if self._identity is None:
+            idn = instrument_registry.cachedIdn(self.resource_name)
+            if idn is None:  # queried on the driver's own session, the registry only remembers the answer
+                idn = self.query("*IDN?")
+                instrument_registry.rememberIdn(self.resource_name, idn)
+            self._identity = ','.join(x.strip() for x in idn.split(',')[:3])
+        return self._identity
+    def _catalogContains(self, name:str, kind:str='data')->bool:
+        # generators that can't list their files are trusted to keep what was uploaded
+        return True
+    def _uploadIfChanged(self, name:str, content:str, upload, kind:str='data')->bool:
+        """
+        Call upload() unless the generator is known to hold content under name already
+
+        :param str name: file name on the generator
+        :param str content: the data to be uploaded, its hash is remembered per generator
+        :param upload: function doing the actual upload
+        :param str kind: 'data' or 'control' file, for the catalog check
+
+        :return: True if uploaded, False if skipped
+        :rtype: bool
+        """
+        if self.upload_cache_filename:
+            _load_upload_cache(self.upload_cache_filename)
+        identity = self.getIdentity()
+        digest = hashlib.sha1(content.encode()).hexdigest()
+        with _upload_cache_lock:
+            files = _upload_cache.setdefault(identity, {})
+            known = files.get(name) == digest
+        if known and self._catalogContains(name, kind):
+            self.logger.debug("%s is already on the generator, upload skipped", name)
+            return False
+        with _upload_cache_lock:
+            files.pop(name, None)  # an interrupted upload leaves unknown content behind
+        upload()
+        with _upload_cache_lock:
+            files[name] = digest
+        if self.upload_cache_filename:
+            _save_upload_cache(self.upload_cache_filename)
+        return True
+    def forgetUploads(self):
+        """Forget what was uploaded to this generator, e.g. after its memory was cleared manually"""
+        identity = self.getIdentity()
+        with _upload_cache_lock:
+            _upload_cache.pop(identity, None)
+        if self.upload_cache_filename:
+            _save_upload_cache(self.upload_cache_filename)
     
     def getSettings(self):
         settings = SigGenSettings()
@@ -190,7 +331,7 @@ class GenericSigGen(object):
         self.setModulation_type(settings.modulation.type)
         self.setDeviation(settings.modulation.deviation_Hz)
         self.setSymbolrate(settings.modulation.symbolrate_sps)
-        self.setBinaryData(settings.per_packet_filename,settings.per_packet_siggen_name)
+        self.setBinaryData(settings.per_packet or settings.per_packet_filename,settings.per_packet_siggen_name)
         self.toggleModulation(settings.mod_on)
         self.toggleRFOut(settings.rf_on)
         self.setStreamType(settings.stream_type)
@@ -207,10 +348,20 @@ class GenericSigGen(object):
         return str(error)
 
 class HPSigGen(GenericSigGen):
+    supports_list_mode = True
+    _stream_type = ""
+    _packet_hex = None
+    _bitfile_name = ""
+    _data_speed = 0
+    _burst_config = None
+    _burst_duration_s = 0.0
+    _burst_stream_active = False
+    _list_armed = False
+
     def __init__(self, resource_name:str, default_timeout_ms:int=1000,logger_settings :Logger.Settings = Logger.Settings()):
         try:
-            self._rm = pyvisa.ResourceManager()
-            self.instr = self._rm.open_resource(resource_name=resource_name)
+            self.instr = instrument_registry.openSession(resource_name)
+            self.resource_name = resource_name
             self.instr.timeout = default_timeout_ms
             self.instr.opc_timeout = 3000
             self.instr.visa_timeout = 3000
@@ -221,34 +372,53 @@ class HPSigGen(GenericSigGen):
         except:
             self.instr = None
             raise
-    def __del__(self):
+    def close(self):
+        """Close the VISA session, only the first call does anything"""
+        if getattr(self, 'instr', None) is None:
+            return
         try:
-            self.instr.close()
-            self._rm.close()
+            instrument_registry.closeSession(self.instr)
         except pyvisa.errors.InvalidSession as error:
-            self.logger.warn("Session already closed at destructor, possibly by other instrument")
+            self.logger.warn("Session already closed, possibly by other instrument")
+        self.instr = None
+    def __del__(self):
+        self.close()
     def command(self, command_str, query_opc:bool=True, write_delay_ms:float=0,binary_format=False,hex_string=''):
-        if binary_format:            
-            self.instr.write_binary_values(command_str, bytes.fromhex(hex_string), datatype='b', is_big_endian=True)
-            self.logger.debug("SCPI Binary Write: "+str(command_str) + str(hex_string))
-        else:
-            self.instr.write(command_str)
-            self.logger.debug("SCPI Write: "+str(command_str))
-        #self.logger.debug("Scpi Errors: "+ str(self.getError()))
-        sleep(write_delay_ms/1000) # this delay is necessary to give time for an older instrument to process the write
-        if query_opc:
-            opc = self.instr.query_ascii_values("*OPC?")[0]
-            if opc == 0:
-                raise Exception("OPC violation")
+        with command_profiler.command("pySigGen", command_str) as record:
+            if binary_format:            
+                self.instr.write_binary_values(command_str, bytes.fromhex(hex_string), datatype='b', is_big_endian=True)
+                self.logger.debug("SCPI Binary Write: %s%s", command_str, hex_string)
+                record.add('bytes_out', len(command_str) + len(hex_string)//2)
+            else:
+                self.instr.write(command_str)
+                self.logger.debug("SCPI Write: %s", command_str)
+                record.add('bytes_out', len(command_str))
+            record.split('write_s')
+            #self.logger.debug("Scpi Errors: "+ str(self.getError()))
+            sleep(write_delay_ms/1000) # this delay is necessary to give time for an older instrument to process the write
+            if query_opc:
+                record.split('write_delay_s')
+                opc = self.instr.query_ascii_values("*OPC?")[0]
+                record.split('opc_s')
+                if opc == 0:
+                    raise Exception("OPC violation")
     def query_float(self, command_str, timeout_ms:int=0):
-        r = self.instr.query_ascii_values(command_str)
+        with command_profiler.command("pySigGen", command_str) as record:
+            response = self.instr.query(command_str)
+            record.split('query_s')
+            record.add('bytes_in', len(response))
+            r = from_ascii_block(response)
+            record.split('parse_s')
         #print(r)
         if len(r)==1:
             return float(r[0])
         else:
             return [float(x) for x in r]
     def query(self,command_str):
-        return self.instr.query(command_str)
+        with command_profiler.command("pySigGen", command_str) as record:
+            response = self.instr.query(command_str)
+            record.add('bytes_in', len(response))
+        return response
     def setFrequency(self, frequency_Hz:int):
         self.command("FREQ " + str(frequency_Hz)+ " Hz")
     def getFrequency(self):
@@ -312,9 +482,47 @@ class HPSigGen(GenericSigGen):
         self.command("DISPlay:REMote " + "ON")
     def setStreamType(self, stream_type:str):
         self.command("RADio:CUSTom:DATA " + str(stream_type))
+        self._stream_type = str(stream_type)
+        self._burst_stream_active = False
         errors = self.getError()
         if errors.find("Illegal")>0:
            self.logger.error("If file stream was added, you probably forgot the \"\"")
+    def setList(self, points:list[tuple[float,float,float]], trigger_type:str="BUS"): # BUS|EXT|IMM, with BUS every *TRG moves to the next point
+        super().setList(points, trigger_type)
+        self._list_trigger_type = trigger_type
+        self.command(":LIST:TYPE LIST")
+        self.command(":LIST:FREQuency " + ",".join(str(int(p[0])) for p in self._list_points))
+        self.command(":LIST:POWer " + ",".join(str(p[1]) for p in self._list_points))
+        self.command(":LIST:DWELl " + ",".join(str(p[2]) for p in self._list_points))
+        self.command(":LIST:TRIGger:SOURce " + trigger_type)
+    def startList(self):
+        self.command(":FREQuency:MODE LIST")
+        self.command(":POWer:MODE LIST")
+        self.command(":INITiate:CONTinuous OFF")
+        self.command(":INITiate") # arm the sweep, it waits on the first point
+        self._list_armed = True
+        self._list_index = 0
+    def setListIndex(self, index:int): # *TRG only steps to the next point, any other jump would take several commands
+        if self._list_armed and index in (self._list_index, self._list_index+1):
+            if index != self._list_index:
+                self.command("*TRG")
+                self._list_index = index
+            return
+        if self._list_armed: # the rest of the list is stepped with setFrequency/setAmplitude
+            self._leaveListMode()
+        super().setListIndex(index)
+    def _leaveListMode(self):
+        self.command(":FREQuency:MODE CW")
+        self.command(":POWer:MODE FIXed")
+        self._list_armed = False
+        self._list_index = -1
+    def stopList(self):
+        self._leaveListMode()
+    def _catalogContains(self, name:str, kind:str='data')->bool:
+        try:
+            return ('"'+name+',') in self.query("MEMory:CATalog:BIT?")
+        except pyvisa.errors.VisaIOError:
+            return False
     def getStreamType(self):
         stream_type = self.query_float("RADio:CUSTom:DATA?")
         return stream_type  
@@ -326,20 +534,47 @@ class HPSigGen(GenericSigGen):
         self.command("RADio:CUSTom:REPeat " + sing_cont)
 
     def sendTrigger(self,num:int,delay:float=0):
+        if self._burst_stream_active: # switch back to the single packet bitfile
+            self.command("RADio:CUSTom:DATA " + self._stream_type)
+            self._burst_stream_active = False
         for i in range(num):
             self.command("*TRG")
             sleep(delay)
+    def configureBurst(self,num:int,period_s:float)->float:
+        """
+        Upload a bitfile containing num copies of the packet, each padded to period_s
+
+        :return: the length of the burst in seconds
+        :rtype: float
+        """
+        if self._packet_hex is None:
+            raise ValueError("configureBurst: no packet data, call setBinaryData first")
+        packet_bits = len(self._packet_hex)*4
+        period_bits = max(packet_bits, int(np.ceil(period_s*self._data_speed)))
+        period_bits = int(np.ceil(period_bits/8))*8 # we have to add 8 bits at a time
+        period_hex = self._packet_hex + '00'*((period_bits-packet_bits)//8)
+        burst_bitfile_name = self._bitfile_name+"B"
+        command = "MEMory:DATA:BIT " + "\"" + burst_bitfile_name+ "\","+ str(period_bits*num)+","
+        self._uploadIfChanged(burst_bitfile_name, period_hex*num, lambda: self.command(command,binary_format=True,hex_string=period_hex*num))
+        self._burst_config = (num,period_s)
+        self._burst_duration_s = period_bits*num/self._data_speed
+        self.logger.debug("Burst of %s packets uploaded, %s s long", num, self._burst_duration_s)
+        return self._burst_duration_s
+    def sendBurst(self,num:int,delay:float=0)->float:
+        if self._burst_config != (num,delay):
+            self.configureBurst(num,delay)
+        if not self._burst_stream_active:
+            self.command("RADio:CUSTom:DATA " + "\"" + self._bitfile_name+"B@BIT\"")
+            self._burst_stream_active = True
+        self.command("*TRG")
+        return self._burst_duration_s
     #only tested in hp E4432b, documented in : http://www.doe.carleton.ca/~nagui/labequip/synth/manuals/e4400324.pdf
-    def setBinaryData(self,data_csv_filename:str,bitfile_name:str, data_speed:int):
+    def setBinaryData(self,packet:PacketConfig|str,bitfile_name:str, data_speed:int): # packet: PacketConfig or Saleae .csv export
         try:
-            bin_df = pd.read_csv(data_csv_filename)
+            hex_data = packet_hex(packet)
         except FileNotFoundError:
             self.logger.warn("Packet file not found! If using PN stream, ignore")
             return
-        # define a lambda function to convert each hex value to a string
-        to_hex_string = lambda x: x[2:]
-        # apply the lambda function to each value in the 'mosi' column and concatenate them together
-        hex_data = ''.join(bin_df['mosi'].apply(to_hex_string))
         length_in_bits = int(len(hex_data)*4)
 
         # During testing, we dected errors when the sent packet was too short in time
@@ -349,12 +584,16 @@ class HPSigGen(GenericSigGen):
         while (length_in_bits < required_bitnum):
             hex_data += '00'
             length_in_bits += 8
-        self.logger.debug(f"Padded the packet to be {length_in_bits} bits long")
+        self.logger.debug("Padded the packet to be %s bits long", length_in_bits)
+        self._packet_hex = hex_data
+        self._bitfile_name = bitfile_name
+        self._data_speed = data_speed
+        self._burst_config = None
 
         self.setStreamType("PN9") 
         #format: MEM:DATA:BIT "filename",bit_count, binary data
         command = "MEMory:DATA:BIT " + "\"" + bitfile_name+ "\","+ str(length_in_bits)+","
-        self.command(command,binary_format=True,hex_string=hex_data) #@BIT\"
+        self._uploadIfChanged(bitfile_name, hex_data, lambda: self.command(command,binary_format=True,hex_string=hex_data)) #@BIT\"
     
     def getSettings(self):
         settings = SigGenSettings()
@@ -372,7 +611,7 @@ class HPSigGen(GenericSigGen):
         self.setAmplitude(settings.amplitude_dBm)
         self.setModulation_type(settings.modulation.type)
         self.setSymbolrate(settings.modulation.symbolrate_sps)
-        self.setBinaryData(settings.per_packet_filename,settings.per_packet_siggen_name,settings.modulation.symbolrate_sps * settings.modulation.bits_per_symbol)
+        self.setBinaryData(settings.per_packet or settings.per_packet_filename,settings.per_packet_siggen_name,settings.modulation.symbolrate_sps * settings.modulation.bits_per_symbol)
         self.toggleModulation(settings.mod_on)
         self.toggleRFOut(settings.rf_on)
         self.setDeviation(settings.modulation.deviation_Hz)
@@ -390,6 +629,14 @@ class HPSigGen(GenericSigGen):
         return str(error)
 
 class RS_SigGen(GenericSigGen): # written to R & S SBV100A
+    supports_list_mode = True
+    _selected_dlist = ""
+    _packet_hex = None
+    _symbolrate_sps = 0
+    _bits_per_symbol = 1
+    _burst_config = None
+    _burst_duration_s = 0.0
+
     def reset(self):
         self.command("*CLS")
         self.command("*RST",write_delay_ms=2000)
@@ -424,6 +671,8 @@ class RS_SigGen(GenericSigGen): # written to R & S SBV100A
         return type
     def setSymbolrate(self, symbolrate_sps:int):
         self.command("BB:DM:SRATE " + str(symbolrate_sps))
+        self._symbolrate_sps = symbolrate_sps
+        self._burst_config = None
     def getSymbolrate(self):
         symbolrate_sps = self.query_float("BB:DM:SRATE?")
         return symbolrate_sps
@@ -432,20 +681,17 @@ class RS_SigGen(GenericSigGen): # written to R & S SBV100A
     def getDeviation(self):
         deviation_Hz = self.query_float("BB:DM:FSK:DEViation?")
         return deviation_Hz
-    def setBinaryData(self,data_csv_filename:str,bitfile_name:str):
+    def setBinaryData(self,packet:PacketConfig|str,bitfile_name:str): # packet: PacketConfig or Saleae .csv export
         try:
-            bin_df = pd.read_csv(data_csv_filename)
+            hex_data = packet_hex(packet)
         except FileNotFoundError:
             self.logger.warn("Packet file not found! If using PN stream, ignore")
             return
-        # define a lambda function to convert each hex value to a string
-        to_hex_string = lambda x: x[2:]
-        # apply the lambda function to each value in the 'mosi' column and concatenate them together
-        hex_data = ''.join(bin_df['mosi'].apply(to_hex_string))
         length_in_bits = int(len(hex_data)*4)
         #format: MEM:DATA:BIT "filename",bit_count, binary data
-        command = ":BB:DM:DLISt:DATA "
-        self.command(command,binary_format=True,hex_string=hex_data) #@BIT\"
+        self._writeDataList(hex_data, bitfile_name)
+        self._packet_hex = hex_data
+        self._burst_config = None
         
         #print(self.query_float("BB:DM:CLIST:POIN?"))
 
@@ -460,6 +706,7 @@ class RS_SigGen(GenericSigGen): # written to R & S SBV100A
             stream_type = stream_type.replace("@BIT",'')
             stream_type = stream_type.replace("\"",'')
             self.command("BB:DM:DLIST:SEL '"+stream_type+"'")
+            self._selected_dlist = stream_type
             self.command("BB:DM:CLIST:SEL 'amf_clist'") #control list is a must in this gen
             #self.setBinaryData()
         errors = self.getError()
@@ -480,9 +727,85 @@ class RS_SigGen(GenericSigGen): # written to R & S SBV100A
         else:
             self.command("BB:DM:TRIGger:SOURce INT")
     def sendTrigger(self,num:int,delay:float=0):
+        if self._burst_config is not None: # restore the single packet lists
+            self._burst_config = None
+            self._writeDataList(self._packet_hex)
+            self._writePacketControlList(len(self._packet_hex)*4//self._bits_per_symbol,0)
         for i in range(num):
             self.command("BB:DM:TRIG:EXEC")
             sleep(delay)
+    def setList(self, points:list[tuple[float,float,float]], trigger_type:str="BUS"): # BUS: points selected by index, EXT|IMM: run with the dwell time
+        super().setList(points, trigger_type)
+        self._list_trigger_type = trigger_type
+        dwells = set(p[2] for p in self._list_points)
+        if len(dwells) > 1:
+            self.logger.warn("This generator uses one dwell time for the whole list, using the longest one")
+        self.command("SOUR:LIST:SEL 'amf_list'")
+        self.command("SOUR:LIST:FREQ " + ",".join(str(int(p[0])) for p in self._list_points))
+        self.command("SOUR:LIST:POW " + ",".join(str(p[1]) for p in self._list_points))
+        if max(dwells):
+            self.command("SOUR:LIST:DWEL " + str(max(dwells)))
+        if trigger_type == "BUS":
+            self.command("SOUR:LIST:MODE STEP")
+        else:
+            self.command("SOUR:LIST:MODE AUTO")
+            self.command("SOUR:LIST:TRIG:SOUR " + ("EXT" if trigger_type == "EXT" else "AUTO"))
+        self.command("SOUR:LIST:LEAR", write_delay_ms=100) # precalculate the hardware settings of the points
+    def startList(self):
+        self.setFrequencyMode("LIST")
+        self._list_index = -1
+        self.setListIndex(0)
+    def setListIndex(self, index:int):
+        if self._list_trigger_type == "BUS" and index != self._list_index:
+            self.command("SOUR:LIST:IND " + str(index))
+        self._list_index = index
+    def stopList(self):
+        self.setFrequencyMode("CW")
+        self._list_index = -1
+    def _catalogContains(self, name:str, kind:str='data')->bool:
+        catalog_command = "BB:DM:DLISt:CATalog?" if kind=='data' else "BB:DM:CLISt:CATalog?"
+        try:
+            catalog = [item.strip().strip('"').upper() for item in self.query(catalog_command).split(',')]
+            return name.upper() in catalog
+        except pyvisa.errors.VisaIOError:
+            return False
+    def _writeDataList(self,hex_data:str,name:str=""):
+        # writes the selected data list
+        name = self._selected_dlist or name
+        self._uploadIfChanged(name, hex_data, lambda: self.command(":BB:DM:DLISt:DATA ",binary_format=True,hex_string=hex_data))
+    def _writePacketControlList(self,packet_symbols:int,gap_symbols:int,num:int=1):
+        # only the burst line has to be high during the packet, whose values is 16
+        control_list = ",".join(["16"]*packet_symbols + ["0"]*gap_symbols)
+        self._uploadIfChanged('amf_clist', control_list, lambda: self.command("BB:DM:CLIST:DATA "+ control_list), kind='control')
+        self.command("BB:DM:TRIG:SLEN " + str((packet_symbols+gap_symbols)*num))
+    def configureBurst(self,num:int,period_s:float)->float:
+        """
+        Upload the packet followed by an idle gap, so that one trigger plays num packets period_s apart
+
+        The data and control lists are repeated by the generator until the sequence length runs out.
+
+        :return: the length of the burst in seconds
+        :rtype: float
+        """
+        if self._packet_hex is None or not self._symbolrate_sps:
+            raise ValueError("configureBurst: call setSymbolrate and setBinaryData first")
+        packet_bits = len(self._packet_hex)*4
+        period_bits = max(packet_bits, int(np.ceil(period_s*self._symbolrate_sps))*self._bits_per_symbol)
+        step_bits = int(np.lcm(8,self._bits_per_symbol)) # whole bytes and whole symbols
+        period_bits = int(np.ceil(period_bits/step_bits))*step_bits
+        self._writeDataList(self._packet_hex + '00'*((period_bits-packet_bits)//8))
+        packet_symbols = packet_bits//self._bits_per_symbol
+        period_symbols = period_bits//self._bits_per_symbol
+        self._writePacketControlList(packet_symbols,period_symbols-packet_symbols,num)
+        self._burst_config = (num,period_s)
+        self._burst_duration_s = period_symbols*num/self._symbolrate_sps
+        self.logger.debug("Burst of %s packets configured, %s s long", num, self._burst_duration_s)
+        return self._burst_duration_s
+    def sendBurst(self,num:int,delay:float=0)->float:
+        if self._burst_config != (num,delay):
+            self.configureBurst(num,delay)
+        self.command("BB:DM:TRIG:EXEC")
+        return self._burst_duration_s
     def setFilter(self,filter_type:str): # RCOSine | COSine | GAUSs | LGAuss | CONE  etc.... check manual
         self.command("BB:DM:FILTer:TYPE "+ filter_type)
     def getFilter(self):
@@ -493,26 +816,18 @@ class RS_SigGen(GenericSigGen): # written to R & S SBV100A
     def getFilterBbT(self):
         filter_BbT = self.query_float("DM:FILT:PAR?")
         return filter_BbT
-    def setPacketLength(self,data_csv_filename:str,bits_per_symbol:int=1): # Rohde specific function, sets packet lenght dependent siggen parameters
+    def setPacketLength(self,packet:PacketConfig|str,bits_per_symbol:int=1): # Rohde specific function, sets packet lenght dependent siggen parameters
         try:
-            bin_df = pd.read_csv(data_csv_filename)
+            hex_data = packet_hex(packet)
         except FileNotFoundError:
             self.logger.warn("Packet file not found! If using PN stream, ignore")
             return
-        # define a lambda function to convert each hex value to a string
-        to_hex_string = lambda x: x[2:]
-        # apply the lambda function to each value in the 'mosi' column and concatenate them together
-        hex_data = ''.join(bin_df['mosi'].apply(to_hex_string))
         length_in_bits = int(len(hex_data)*4)
 
-        data_list = "16" # only the burst line has to be high, whose values is 16
-
         symbols_packet_length = int(length_in_bits/bits_per_symbol) #in symbols
-
-        for i in range(symbols_packet_length-1):
-            data_list+=",16" # send 'packet_length' number of '16's
-        self.command("BB:DM:CLIST:DATA "+ data_list)
-        self.command("BB:DM:TRIG:SLEN " + str(symbols_packet_length))
+        self._bits_per_symbol = bits_per_symbol
+        self._burst_config = None
+        self._writePacketControlList(symbols_packet_length,0)
     def toggleCustom(self,on_off:bool):
         pass
     def setStream(self, settings:SigGenSettings):
@@ -523,8 +838,8 @@ class RS_SigGen(GenericSigGen): # written to R & S SBV100A
         self.setDeviation(settings.modulation.deviation_Hz)
         self.setSymbolrate(settings.modulation.symbolrate_sps)
         self.setStreamType(settings.stream_type)
-        self.setBinaryData(settings.per_packet_filename,settings.per_packet_siggen_name)
-        self.setPacketLength(settings.per_packet_filename,settings.modulation.bits_per_symbol)
+        self.setBinaryData(settings.per_packet or settings.per_packet_filename,settings.per_packet_siggen_name)
+        self.setPacketLength(settings.per_packet or settings.per_packet_filename,settings.modulation.bits_per_symbol)
         self.toggleModulation(settings.mod_on)
         self.toggleRFOut(settings.rf_on)
         self.setPatternRepeat(settings.pattern_repeat)
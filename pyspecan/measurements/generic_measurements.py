@@ -3,6 +3,7 @@ from dataclasses import dataclass
 from ..pySpecAn import GenericSpecAn,Anritsu_SignalAnalyzer,  Marker, PowerMarker, TriggerSettings
 import numpy
 from time import sleep
+from common import tracer
 
 
 class Generic:
@@ -80,6 +81,7 @@ class SpectrumSweep:
         Generic.apply_setting(sa, settings)
 
     @classmethod
+    @tracer.traced("SpectrumSweep", category="acquisition")
     def do_sweep(cls, sa: GenericSpecAn, settings: Settings=None, hold_time_s:float=None):
         if settings:
             cls.apply_settings(sa,settings)
@@ -109,6 +111,7 @@ class ZeroSpanSweep:
         Generic.apply_setting(sa, settings)
 
     @classmethod
+    @tracer.traced("ZeroSpanSweep", category="acquisition")
     def do_sweep(cls, sa: GenericSpecAn, settings: Settings=None, hold_time_s:float=None):
         if settings:
             cls.apply_settings(sa,settings)
@@ -150,6 +153,7 @@ class MeasurementSuite:
             return res
         return inner
 
+    @tracer.traced("measure_peak", category="parse")
     @clear_before_execution
     @screenshot_after_execution
     def measure_peak(self) -> Marker:
@@ -157,6 +161,7 @@ class MeasurementSuite:
         max_marker = self.sa.getMaxMarker()
         return max_marker
 
+    @tracer.traced("measure_peak_list", category="parse")
     @clear_before_execution
     @screenshot_after_execution
     def measure_peak_list(self, threshold_dbm:float|None=None, resolution_db:float|None=None) -> list[Marker]:
@@ -164,11 +169,13 @@ class MeasurementSuite:
         max_marker = self.sa.getPeakList(threshold_dbm=threshold_dbm, resolution_db=resolution_db)
         return max_marker
 
+    @tracer.traced("measure_integrated_power_peaks", category="parse")
     @clear_before_execution
     @screenshot_after_execution
     def measure_integrated_power_peaks(self, bw_hz:float, limit_dbm:float|None=None) -> list[PowerMarker]:
         return self.sa.getPowerMarkerPeakList(bw_hz=bw_hz,limit_dbm=limit_dbm)
 
+    @tracer.traced("measure_obw", category="parse")
     @clear_before_execution
     @screenshot_after_execution
     def measure_obw(self, method:str="NPERcent", threshold:float=99) -> float:
@@ -176,6 +183,7 @@ class MeasurementSuite:
         obw_hz = self.sa.fetchOBW()
         return obw_hz
 
+    @tracer.traced("measure_acp", category="parse")
     @clear_before_execution
     @screenshot_after_execution
     def measure_acp(self, carrier_bw_hz:int, acp_bw_hz:int, offset_hz:int|list, max_channel_diff=1, ref_power_method:str="BSIDes") -> float:
@@ -184,6 +192,7 @@ class MeasurementSuite:
         acp_raw = self.sa.fetchACP()
         return acp_raw
 
+    @tracer.traced("measure_burst_average_power", category="parse")
     @clear_before_execution
     @screenshot_after_execution
     def measure_burst_average_power(self, start_time_s=0, stop_time_s=None):
@@ -191,6 +200,7 @@ class MeasurementSuite:
         burst_average_power_dbm = self.sa.fetchBurstAveragePower()
         return burst_average_power_dbm
 
+    @tracer.traced("measure_channel_power", category="parse")
     @clear_before_execution
     @screenshot_after_execution
     def measure_channel_power(self, channel_center_freq_hz, channel_width_hz, filter:str="RECT"):
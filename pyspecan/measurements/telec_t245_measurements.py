@@ -5,6 +5,7 @@ from ..pySpecAn import Anritsu_SignalAnalyzer, TriggerSettings, LimitLinePoint
 from datetime import datetime
 import warnings
 import numpy
+from common import tracer
 
 @dataclass
 class TelecT245MeasurementSuite:
@@ -41,6 +42,7 @@ class TelecT245MeasurementSuite:
         file_name = f'{self.screenshot_base_name}_{test_name}_{datetime.now().strftime("%Y%m%d%H%M%S")[2:]}'
         return Anritsu_SignalAnalyzer.ScreenshotSettings(append_timestamp=False, filename_base=file_name)
 
+    @tracer.traced(category="measurement")
     def measure_frequency_tolerance(self, sweep_overrides: dict={}):
         expected_obw_hz = self.carrier_bw_n * self.unit_channel_bw_hz
         sweep_settings = SpectrumSweep.Settings(
@@ -64,6 +66,7 @@ class TelecT245MeasurementSuite:
         freq_error_ppm = (max_marker.position-self.frequency_hz)/self.frequency_hz*1e6
         return freq_error_ppm, max_marker
 
+    @tracer.traced(category="measurement")
     def measure_obw(self, sweep_overrides: dict={}):
         expected_obw_hz = self.carrier_bw_n * self.unit_channel_bw_hz
         sweep_settings = SpectrumSweep.Settings(
@@ -85,6 +88,7 @@ class TelecT245MeasurementSuite:
 
         return obw_hz
 
+    @tracer.traced(category="measurement")
     def measure_acp(self, sweep_overrides: dict={}):
         carrier_bw_hz = self.carrier_bw_n * self.unit_channel_bw_hz
         sweep_settings = SpectrumSweep.Settings(
@@ -108,6 +112,7 @@ class TelecT245MeasurementSuite:
                                                                                  offset_hz=int((carrier_bw_hz+self.unit_channel_bw_hz)/2))
         return acp_raw
 
+    @tracer.traced(category="measurement")
     def measure_antenna_power(self, avg_time_s:float = 100e-3, sweep_overrides: dict={}):
 
         sweep_settings = ZeroSpanSweep.Settings(
@@ -129,6 +134,7 @@ class TelecT245MeasurementSuite:
         self._average_power_dbm=ant_power_dbm  # Save average power for in-band TX spurious emission relxation
         return ant_power_dbm
 
+    @tracer.traced(category="measurement")
     def measure_tx_oob_emissions(self, measure_rms=True, sweep_overrides: dict={}):
         sweep_settings = SpectrumSweep.Settings(
             mode="SINGLE",
@@ -172,6 +178,7 @@ class TelecT245MeasurementSuite:
                             'max_marker': max_marker})
         return results
 
+    @tracer.traced(category="measurement")
     def measure_rx_secondary_emissions(self, measure_rms=True, sweep_overrides: dict={}):
         sweep_settings = SpectrumSweep.Settings(
             mode="SINGLE",
@@ -253,6 +260,7 @@ class TelecT245MeasurementSuite:
             zoom_freqs_hz = numpy.append(zoom_freqs_hz, zoom_freq)
         return list(zoom_freqs_hz), markers_hz
 
+    @tracer.traced(category="measurement")
     def measure_tx_in_band_emissions_telec(self, sweep_overrides: dict={}):
         sweep_settings = SpectrumSweep.Settings(
             mode="SINGLE",
@@ -334,6 +342,7 @@ class TelecT245MeasurementSuite:
 
         return max_spur_level_dbm, raw_results
 
+    @tracer.traced(category="measurement")
     def measure_tx_in_band_emissions_rms(self, sweep_overrides: dict={}):
         sweep_settings = SpectrumSweep.Settings(
             mode="SINGLE",
@@ -1,12 +1,12 @@
 import pyvisa
 import warnings
 import numpy as np
-from RsInstrument import *
 from dataclasses import dataclass
 from time import sleep, time_ns
 from datetime import datetime
 
-from common import Logger, Level
+from common import Logger, Level, command_profiler, instrument_registry
+from pyvisa.util import from_ascii_block
 @dataclass
 class Marker:
     position:float
@@ -68,13 +68,8 @@ class OperationStatus:
 class SpecAn(object):
     def __new__(cls, resource:str, default_timeout_ms:int=1000, auto_detect:bool=True, logger_settings :Logger.Settings = Logger.Settings() ):
         if auto_detect:
-            # open a VISA session, query instrument and try to identify it
-            _rm = pyvisa.ResourceManager()
-            _instr = _rm.open_resource(resource_name=resource)
-            idn_query_response = _instr.query("*IDN?")
-            # VISA session won't be used here anymore, close it
-            # Resource Manager shouldn't be closed, because it is a singleton object
-            _instr.close()
+            # query instrument and try to identify it, the session is kept for the driver and the response is cached
+            idn_query_response = instrument_registry.identify(resource)
 
             if logger_settings.module_name is None:
                 logger_settings.module_name = __name__
@@ -96,8 +91,7 @@ class GenericSpecAn(object):
 
     def __init__(self, resource_name:str, default_timeout_ms:int=1000,logger_settings: Logger.Settings = Logger.Settings()):
         try:
-            self._rm = pyvisa.ResourceManager()
-            self.instr = self._rm.open_resource(resource_name=resource_name)
+            self.instr = instrument_registry.openSession(resource_name)
             self.instr.timeout = default_timeout_ms
             self.instr.read_termination = '\n'
             # self.instr.opc_timeout = 3000
@@ -105,46 +99,64 @@ class GenericSpecAn(object):
             # self.instr.instrument_status_checking = True
             self.default_timeout_ms = default_timeout_ms
             self.logger = Logger(logger_settings)
-        except ResourceError:
+        except pyvisa.errors.VisaIOError:
             self.instr = None
             raise
-    def __del__(self):
+    def close(self):
+        """Close the VISA session, only the first call does anything"""
+        if getattr(self, 'instr', None) is None:
+            return
         try:
-            self.instr.close()
-            self._rm.close()
+            instrument_registry.closeSession(self.instr)
         except BaseException as error:
-            self.logger.warning("Error occued at pySpecAn destructor: ",error)
+            self.logger.warning("Error occued at closing pySpecAn: %s", error)
+        self.instr = None
+    def __del__(self):
+        self.close()
     def command(self, command_str, query_opc:bool=True, timeout_ms:int=0):
-        self.instr.write(command_str)
-        opc = None
-        start = time_ns()
-        timeout = False
-
-        self.logger.debug("SCPI Write: " + command_str)
-        
-        while not timeout:
-            timeout = (time_ns()-start)/1e6 > timeout_ms
-            try:
-                
-                if query_opc:
-                    opc = self.instr.query_ascii_values("*OPC?")[0]
-                    if opc == 0:
-                        raise Exception("OPC violation")
+        with command_profiler.command("pySpecAn", command_str) as record:
+            self.instr.write(command_str)
+            record.add('bytes_out', len(command_str))
+            record.split('write_s')
+            opc = None
+            start = time_ns()
+            timeout = False
+
+            self.logger.debug("SCPI Write: %s", command_str)
+            
+            while not timeout:
+                timeout = (time_ns()-start)/1e6 > timeout_ms
+                try:
+                    
+                    if query_opc:
+                        opc = self.instr.query_ascii_values("*OPC?")[0]
+                        if opc == 0:
+                            raise Exception("OPC violation")
+                        else:
+                            break
+                except pyvisa.errors.VisaIOError as err:
+                    if err.abbreviation.upper()=='VI_ERROR_TMO':
+                        pass
                     else:
-                        break
-            except pyvisa.errors.VisaIOError as err:
-                if err.abbreviation.upper()=='VI_ERROR_TMO':
-                    pass
-                else:
-                    raise err
+                        raise err
+            if query_opc:
+                record.split('opc_s')
+    def _query_values(self, command_str)->list:
+        with command_profiler.command("pySpecAn", command_str) as record:
+            response = self.instr.query(command_str)
+            record.split('query_s')
+            record.add('bytes_in', len(response))
+            r = from_ascii_block(response)
+            record.split('parse_s')
+        return r
     def query_float(self, command_str, timeout_ms:int=0):
-        r = self.instr.query_ascii_values(command_str)
+        r = self._query_values(command_str)
         if len(r)==1:
             return float(r[0])
         else:
             return [float(x) for x in r]
     def query_int(self, command_str, timeout_ms:int=0):
-        r = self.instr.query_ascii_values(command_str)
+        r = self._query_values(command_str)
         if len(r)==1:
             return int(r[0])
         else:
@@ -536,7 +548,9 @@ class Anritsu_SignalAnalyzer(GenericSpecAn):
 # This class was developed based on RS FPL1007 and RS FSV
 class RS_SpectrumAnalyzer(GenericSpecAn):
     def __init__(self, resource_name:str, default_timeout_ms:int=1000,logger_settings: Logger.Settings = Logger.Settings()):
+        from RsInstrument import RsInstrument, ResourceError  # only imported when an R&S analyzer is used
         try:
+            instrument_registry.releaseIdle(resource_name)  # RsInstrument opens its own session
             self.instr = RsInstrument(resource_name=resource_name, id_query=True, reset=True)
             self.instr.opc_timeout = 3000
             self.instr.visa_timeout = 3000
@@ -549,19 +563,28 @@ class RS_SpectrumAnalyzer(GenericSpecAn):
         except ResourceError:
             self.instr = None
             raise
-    def __del__(self):
+    def close(self):
+        """Close the RsInstrument session, only the first call does anything"""
+        if getattr(self, 'instr', None) is None:
+            return
         try:
-            self.instr.close()
-            self._rm.close()
+            instrument_registry.closeSession(self.instr)
         except:
             pass
+        self.instr = None
+    def __del__(self):
+        self.close()
     def command(self, command_str, query_opc:bool=True, timeout_ms:int=0):
-        self.instr.write_str(command_str)
-        self.logger.debug("SCPI Write: " + command_str)
-        if timeout_ms==0:
-            self.instr.query_opc(self.default_timeout_ms)
-        else:
-            self.instr.query_opc(timeout_ms)
+        with command_profiler.command("pySpecAn", command_str) as record:
+            self.instr.write_str(command_str)
+            self.logger.debug("SCPI Write: %s", command_str)
+            record.add('bytes_out', len(command_str))
+            record.split('write_s')
+            if timeout_ms==0:
+                self.instr.query_opc(self.default_timeout_ms)
+            else:
+                self.instr.query_opc(timeout_ms)
+            record.split('opc_s')
     def reset(self):
         self.command("*RST",timeout_ms=10000)
         self.command("*CLS")
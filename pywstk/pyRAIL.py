@@ -1,64 +1,100 @@
-from dataclasses import dataclass, fields
-from pyparsing import nestedExpr
+from dataclasses import dataclass
 from .pywstk_driver import WSTK_RAILTest_Driver, RAILError
-from multiprocessing import Queue
+from queue import Queue
 import time
 from common import Logger, Level
 
 
 
-@dataclass
 class RAILTest_status:
-    UserTxCount:int=0
-    AckTxCount:int=0
-    UserTxAborted:int=0
-    AckTxAborted:int=0
-    UserTxBlocked:int=0
-    AckTxBlocked:int=0
-    UserTxUnderflow:int=0
-    AckTxUnderflow:int=0
-    RxCount:int=0
-    RxCrcErrDrop:int=0
-    SyncDetect:int=0
-    NoRxBuffer:int=0
-    TxRemainErrs:int=0
-    RfSensed:int=0
-    ackTimeout:int=0
-    ackTxFpSet:int=0
-    ackTxFpFail:int=0
-    ackTxFpAddrFail:int=0
-    RfState:str=''
-    RAIL_state_active:int=0
-    RAIL_state_rx:int=0
-    RAIL_state_tx:int=0
-    Channel:int=0
-    AppMode:str=''
-    TimingLost:int=0
-    TimingDetect:int=0
-    FrameErrors:int=0
-    RxFifoFull:int=0
-    RxOverflow:int=0
-    AddrFilt:int=0
-    Aborted:int=0
-    RxBeams:int=0
-    DataRequests:int=0
-    Calibrations:int=0
-    TxChannelBusy:int=0
-    TxClear:int=0
-    TxCca:int=0
-    TxRetry:int=0
-    UserTxStarted:int=0
-    PaProtect:int=0
-    SubPhy0:int=0
-    SubPhy1:int=0
-    SubPhy2:int=0
-    SubPhy3:int=0
-    rxRawSourceBytes:str=''
-    def __post_init__(self):
-        for field in fields(self):
-            value = getattr(self, field.name)
-            if not isinstance(value, field.type):
-                setattr(self, field.name, field.type(value))
+    """
+    Status reported by the RAILTest 'status' command
+
+    The parsed response is kept as it is and a field is only converted to its type on first access, since most
+    callers (stop(), PER polling) look at a few fields only. Fields missing from the response read as their default,
+    fields unknown to this class (e.g. from newer RAILTest firmware) read as strings.
+    """
+    _fields = {  # name: (type, default)
+        'UserTxCount':(int,0),
+        'AckTxCount':(int,0),
+        'UserTxAborted':(int,0),
+        'AckTxAborted':(int,0),
+        'UserTxBlocked':(int,0),
+        'AckTxBlocked':(int,0),
+        'UserTxUnderflow':(int,0),
+        'AckTxUnderflow':(int,0),
+        'RxCount':(int,0),
+        'RxCrcErrDrop':(int,0),
+        'SyncDetect':(int,0),
+        'NoRxBuffer':(int,0),
+        'TxRemainErrs':(int,0),
+        'RfSensed':(int,0),
+        'ackTimeout':(int,0),
+        'ackTxFpSet':(int,0),
+        'ackTxFpFail':(int,0),
+        'ackTxFpAddrFail':(int,0),
+        'RfState':(str,''),
+        'RAIL_state_active':(int,0),
+        'RAIL_state_rx':(int,0),
+        'RAIL_state_tx':(int,0),
+        'Channel':(int,0),
+        'AppMode':(str,''),
+        'TimingLost':(int,0),
+        'TimingDetect':(int,0),
+        'FrameErrors':(int,0),
+        'RxFifoFull':(int,0),
+        'RxOverflow':(int,0),
+        'AddrFilt':(int,0),
+        'Aborted':(int,0),
+        'RxBeams':(int,0),
+        'DataRequests':(int,0),
+        'Calibrations':(int,0),
+        'TxChannelBusy':(int,0),
+        'TxClear':(int,0),
+        'TxCca':(int,0),
+        'TxRetry':(int,0),
+        'UserTxStarted':(int,0),
+        'PaProtect':(int,0),
+        'SubPhy0':(int,0),
+        'SubPhy1':(int,0),
+        'SubPhy2':(int,0),
+        'SubPhy3':(int,0),
+        'rxRawSourceBytes':(str,''),
+    }
+    __slots__ = ('raw', '_decoded')
+
+    def __init__(self, **raw_fields):
+        self.raw:dict = raw_fields  # the parsed status response, values as received
+        self._decoded:dict = {}
+
+    def __getattr__(self, name:str):  # called only if name is not a slot, i.e. for the status fields
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self._decoded[name]
+        except KeyError:
+            pass
+        field_type, default = self._fields.get(name, (str, None))
+        if name in self.raw:
+            value = field_type(self.raw[name])
+        elif name in self._fields:
+            value = default
+        else:
+            raise AttributeError("RAILTest_status has no field '"+name+"'")
+        self._decoded[name] = value
+        return value
+
+    def __eq__(self, other):
+        if not isinstance(other, RAILTest_status):
+            return NotImplemented
+        return self.asdict() == other.asdict()
+
+    def __repr__(self):
+        return 'RAILTest_status(' + ', '.join(k+'='+repr(v) for k,v in self.asdict().items()) + ')'
+
+    def asdict(self)->dict:
+        names = list(self._fields) + [k for k in self.raw if k not in self._fields]
+        return {name: getattr(self, name) for name in names}
 
 
 @dataclass
@@ -99,9 +135,9 @@ class PA_Config:
 
 
 class WSTK_RAILTest:
-    def __init__(self, COMport:str, reset:bool=False,logger_settings:Logger.Settings = Logger.Settings()):
+    def __init__(self, COMport:str, reset:bool=False,logger_settings:Logger.Settings = Logger.Settings(), baudRate:int|None=115200):
         self._driver = None  # initialize _driver attribute so if something goes wrong later, it still extists
-        self._driver = WSTK_RAILTest_Driver(COMport=COMport,logger_settings = logger_settings.copy())  # initialize driver
+        self._driver = WSTK_RAILTest_Driver(COMport=COMport,baudRate=baudRate,logger_settings = logger_settings.copy())  # initialize driver, baudRate=None probes the highest working rate
         if reset:
             self._driver.reset()
         self._driver.rx(on_off=False)  # turn RX off, just in case. won't mess up anything even it is already off
@@ -110,6 +146,11 @@ class WSTK_RAILTest:
         self.PACKETLENGHT_NBYTES:int = 16
         self.txbuffer_npackets:int = 0
         self.receiveQ:Queue = None
+        self.rx_packet_rssi:list[float] = []  # per packet RSSI of the last PER measurement
+        self.rx_packet_lqi:list[float] = []  # per packet LQI of the last PER measurement
+        self._ber_session:tuple|None = None  # (frequency_Hz, nbytes, driver reset_count) of the open BER session
+        self._ber_nbytes:int = 0
+        self._ber_running:bool = False
 
         if logger_settings.module_name is None:
             logger_settings.module_name = __name__
@@ -122,11 +163,26 @@ class WSTK_RAILTest:
     # **************************************************************************************************
     # Higher level methods, wrapping/using multiple driver calls ***************************************
     def resetDevice(self)->RAILTest_info:
-        response = self._driver.reset()
+        self._ber_session = None
+        self._ber_running = False
+        response = self._driver.reset()  # keeps the quiet mode
         #return RAILTest_info(info_message=response)
+    def setQuietMode(self, on_off:bool):
+        """
+        Turn off the asynchronous rxPacket/txEnd/txError prints and use the less verbose payload upload
+
+        Reduces the traffic on the serial link, but PER measurements can't report per packet RSSI/LQI in this mode.
+        """
+        self._driver.setQuietMode(on_off=on_off)
     def getStatus(self)->RAILTest_status:
-        response = self._driver.status()
-        return RAILTest_status(**response[0].response_content)
+        return self._statusFrom(self._driver.status())
+    @staticmethod
+    def _statusFrom(responses:list)->RAILTest_status:
+        # asynchronous prints (e.g. rxPacket) still in the buffer are parsed before the status reply
+        for r in responses:
+            if r.response_type=='(status)':
+                return RAILTest_status(**r.response_content)
+        raise RAILError('status unknown type:', ''.join(r.response_type for r in responses))
     def setTransmitData(self, data:bytes):
         nbytes = len(data)  # length of input data
         if nbytes%self.PACKETLENGHT_NBYTES:
@@ -137,8 +193,7 @@ class WSTK_RAILTest:
         data_to_send = data + bytes([0 for _ in range(0, padding)] ) # padding with 0's
         self._driver.setTxLength(length=len(data_to_send))
         self.txbuffer_npackets = len(data_to_send)//self.PACKETLENGHT_NBYTES
-        for k in range(0, len(data_to_send)//self.PACKETLENGHT_NBYTES):  # download data to unit in 16-byte chunks
-            self._driver.setTxPayload(data=data_to_send[k*self.PACKETLENGHT_NBYTES:(k+1)*self.PACKETLENGHT_NBYTES], offset=k*self.PACKETLENGHT_NBYTES)
+        self._driver.setTxPayloadChunks(data=data_to_send, chunk_len=self.PACKETLENGHT_NBYTES)  # download data to unit in 16-byte chunks
 
     def transmit(self, mode:str, frequency_Hz:float, power_dBm:float, power_format:str = "DBM", pa_config:PA_Config=None, tx_delay_ms:int=None):
         self.stop()
@@ -237,6 +292,9 @@ class WSTK_RAILTest:
         """
         Measuring BER on a PN9 stream, can only be used with BER configured RAILtest
 
+        The BER receiver is reconfigured only when the frequency or nbytes changed since the previous call (or anything
+        stopped the BER session in between), otherwise only the counters are restarted.
+
         :param int nbytes: number of bytes to perform the measurement on
         :param int timeout_ms: maximum time the measurement can run, in miliseconds
         :param int frequency_Hz: frequency of the recieved  PN9 stream, in Hz
@@ -244,13 +302,36 @@ class WSTK_RAILTest:
         :return: the BER value in percentage, the percentage of completion
         :rtype: float tuple
         """
+        if self._ber_session != (frequency_Hz, nbytes, self._driver.reset_count):  # a reset drops the frequency override
+            self.startBerSession(nbytes=nbytes, frequency_Hz=frequency_Hz)
+        return self.measureBerSession(timeout_ms=timeout_ms)
+
+    def startBerSession(self,nbytes:int=100000,frequency_Hz:int=0):
+        """
+        Configure the DUT for BER measurements, to be followed by measureBerSession calls (e.g. one per power step)
+
+        The session is closed by stopBerSession, or by anything that calls stop() or changes the PHY.
+
+        :param int nbytes: number of bytes to perform the measurement on
+        :param int frequency_Hz: frequency of the recieved  PN9 stream, in Hz
+        """
         self.stop() # stopping current process just in case
         if frequency_Hz: # if not default frequency is used
             self._driver.setDebugMode(on_off=True)
             self._driver.freqOverride(frequency_Hz=frequency_Hz)
+        self._ber_nbytes = nbytes
+        self._ber_session = (frequency_Hz, nbytes, self._driver.reset_count)
 
-        self._driver.setBerConfig(nbytes) # how many bytes are used for the BER calculation
-        self._driver.berRx(on_off=True) # start receiving bytes
+    def measureBerSession(self,timeout_ms:int=1000)->float:
+        """
+        Restart the BER counters of the open session and measure
+
+        :param int timeout_ms: maximum time the measurement can run, in miliseconds
+
+        :return: the BER value in percentage, the percentage of completion
+        :rtype: float tuple
+        """
+        self._restartBer()
 
         done_percent = 0.0
         ber_percent = 0.0
@@ -272,18 +353,104 @@ class WSTK_RAILTest:
                     done_percent = float(r.response_content['PercentDone'])
                     rssi_current = float(r.response_content['RSSI'])
 
-                    self.logger.debug("BER: " + str(ber_percent) + "%, Done percent: "+ str(done_percent)+  "% RSSI:  "+ str(rssi_current))
+                    self.logger.debug("BER: %s%%, Done percent: %s%% RSSI:  %s", ber_percent, done_percent, rssi_current)
                 else:
                     raise RAILError('BER status unkown type:',r.response_type)
         return ber_percent, done_percent,rssi_current
 
+    def _restartBer(self):
+        if self._ber_session is None or self._ber_session[2] != self._driver.reset_count:
+            raise RAILError('measureBerSession:', 'no BER session (or the DUT was reset since), call startBerSession first')
+        if self._ber_running:
+            self._driver.berRx(on_off=False) # stop the previous measurement
+        self._driver.setBerConfig(self._ber_nbytes) # how many bytes are used for the BER calculation, resets the statistics
+        self._driver.berRx(on_off=True) # start receiving bytes
+        self._ber_running = True
+
+    def _readBerCounters(self)->tuple[float,float,float]:
+        # cumulative (bits tested, bit errors, RSSI) of the running BER measurement
+        responses = self._driver.berStatus()
+        for r in responses:
+            if r.response_type=='(berStatus)':
+                content = r.response_content
+                if 'BitsTested' in content:
+                    bits = float(content['BitsTested'])
+                else:
+                    bits = float(content['PercentDone'])/100*self._ber_nbytes*8
+                if 'BitErrors' in content:
+                    errors = float(content['BitErrors'])
+                else:
+                    errors = float(content['PercentBitError'])/100*bits
+                return bits, errors, float(content['RSSI'])
+        raise RAILError('BER status unkown type:', ''.join(r.response_type for r in responses))
+
+    def measureBerRamp(self,nsteps:int,dwell_s:float,nbytes:int,frequency_Hz:int=0,start_function=None,settle_s:float=0.0)->list[tuple[float,float,float]]:
+        """
+        Measuring BER of a signal that steps through nsteps levels by itself (e.g. a generator list), in one BER acquisition
+
+        The BER counters are sampled at the step boundaries and the BER of every step is calculated from the differences,
+        so the receiver is configured only once for the whole ramp.
+
+        :param int nsteps: number of steps of the ramp
+        :param float dwell_s: duration of one step, in seconds
+        :param int nbytes: number of bytes of the BER acquisition, has to cover the whole ramp
+        :param int frequency_Hz: frequency of the recieved  PN9 stream, in Hz
+        :param start_function: function starting the ramp, the first step is timed from its return. If None, the ramp is started by other means (e.g. an external trigger) and timed from the call
+        :param float settle_s: the beginning of every step that is not counted, in seconds
+
+        :return: the BER value in percentage, the percentage of completion and the RSSI for every step
+        :rtype: list of float tuples
+        """
+        self.startBerSession(nbytes=nbytes, frequency_Hz=frequency_Hz)
+        self._restartBer()
+        if start_function is not None:
+            start_function()
+        start = time.monotonic()
+
+        results = []
+        for k in range(nsteps):
+            time.sleep(max(0.0, start + k*dwell_s + settle_s - time.monotonic()))
+            bits_first, errors_first, _ = self._readBerCounters()
+            time.sleep(max(0.0, start + (k+1)*dwell_s - time.monotonic()))
+            bits_last, errors_last, rssi_current = self._readBerCounters()
+
+            bits = bits_last - bits_first
+            if bits > 0:
+                ber_percent = (errors_last - errors_first)/bits*100
+                done_percent = 100.0
+            else:
+                self.logger.warn("No bits counted in BER ramp step "+str(k)+", is nbytes large enough?")
+                ber_percent = 0.0
+                done_percent = 0.0
+            self.logger.debug("BER: %s%%, bits: %s RSSI:  %s", ber_percent, bits, rssi_current)
+            results.append((ber_percent, done_percent, rssi_current))
+        self.stopBerSession()
+        return results
+
+    def stopBerSession(self):
+        if self._ber_running:
+            self._driver.berRx(on_off=False)
+        self._ber_running = False
+        self._ber_session = None
+
+    def _collectRxPackets(self, responses:list):
+        for r in responses:
+            if r.response_type=='(rxPacket)' and r.response_content.get('crc','Pass')=='Pass':
+                self.rx_packet_rssi.append(float(r.response_content['rssi']))
+                self.rx_packet_lqi.append(float(r.response_content.get('lqi',0)))
+
     def measurePer(self,npackets:int=1000,interpacket_delay_s:float=0.0001,frequency_Hz:int=0,tx_start_function=None,timeout_ms = 500)->float:
         """
         Measuring PER
 
+        The packets are counted from the rxPacket events streamed by RAILTest, the RSSI and LQI of every received packet
+        is stored in rx_packet_rssi and rx_packet_lqi. The status is queried only once at the end to confirm the count.
+        In quiet mode (see setQuietMode) there are no events, the RxCount counter is polled instead and no RSSI is reported.
+
         :param int npackets: number of packets to perform the measurement on
-        :param int timeout_ms: maximum time the measurement can run, in miliseconds
+        :param int timeout_ms: maximum time the measurement can run, in miliseconds, counted from the end of the transmission
         :param int frequency_Hz: frequency in Hz
+        :param tx_start_function: function(npackets, interpacket_delay_s) starting the transmission, it may return the seconds until the transmission completes
 
         :return: the PER value in percentage, the percentage of completion,and the last packets rssi
         :rtype: float tuple
@@ -293,62 +460,59 @@ class WSTK_RAILTest:
             self._driver.setDebugMode(on_off=True)
             self._driver.freqOverride(frequency_Hz=frequency_Hz)
 
-        #self._driver.setBerConfig(nbytes) # how many bytes are used for the BER calculation
-        #self._driver.berRx(on_off=True) # start receiving bytes
         self._driver.rx(on_off=True)
 
         done_percent = 0.0
-        per_percent = 0.0
+        per_percent = 100.0
         rssi_current = 0.0
-        start = time.time_ns()
-        timeout = False
+        self.rx_packet_rssi = []
+        self.rx_packet_lqi = []
         self._driver.resetCounters()
-        tx_start_function(npackets,interpacket_delay_s)
-
-        try:
-            self._driver._write('')
-            expected_packets = self._driver._read()
-            self.logger.debug("PACKETS:" + expected_packets)
-            first_rssi_index = expected_packets.find('rssi')
-            if first_rssi_index>0:
-                after_rssi_index = expected_packets.find('}', first_rssi_index)
-                rssi_current = expected_packets[first_rssi_index+5:after_rssi_index]
-                done_percent = 100
-            else:
-                self.logger.error("No packets on serial!")
-        except TimeoutError:
+        start = time.time_ns()
+        tx_duration_s = tx_start_function(npackets,interpacket_delay_s)
+        if not tx_duration_s: # the trigger loop only returns when the transmission is done
+            tx_duration_s = (time.time_ns()-start)/1e9
+        deadline_ms = tx_duration_s*1000 + timeout_ms
+
+        while not self._driver.quiet and len(self.rx_packet_rssi)<npackets and (time.time_ns()-start)/1e6 < deadline_ms:
+            for line in self._driver._readLines(timeout_ms=50):
+                if '(rxPacket)' in line:
+                    self._collectRxPackets(WSTK_RAILTest_Driver.parseResponse(line))
+
+        while True: # confirm the count, events can be lost if the UART could not keep up
+            responses = self._driver.status()
+            self._collectRxPackets(responses) # events that arrived before the status reply
+            received_packets = len(self.rx_packet_rssi)
+            rx_count = self._statusFrom(responses).RxCount
+            if self._driver.quiet: # no events in quiet mode, the counter is polled until the deadline
+                if rx_count>=npackets or (time.time_ns()-start)/1e6 >= deadline_ms:
+                    received_packets = rx_count
+                    break
+                time.sleep(0.05)
+                continue
+            if rx_count != received_packets:
+                self.logger.warn(f"PER: {received_packets} rxPacket events, but RxCount is {rx_count}")
+            received_packets = rx_count
+            break
+        self._driver.rx(on_off=False)
+
+        if received_packets:
+            done_percent = 100.0
+            per_percent = 100 - received_packets/npackets*100
+        else:
             self.logger.error("No packets on serial!")
-            pass
-
-        received_packets = 0
-
-        while not (timeout or npackets==received_packets):#
-
-            self._driver.flushIO()
-            self._driver.flushIO()
-            try:
-                responses = self._driver.status()
-            except IndexError:
-                self.logger.warn("Index error occured in PER test, that I cannot figure out, skipping to next loop")
-                responses = []
-            runtime_ms = (time.time_ns()-start)/1e6
-            timeout = runtime_ms > timeout_ms
-
-            for r in responses:
-                if r.response_type=='(status)':
-                    received_packets = float(r.response_content['RxCount'])
-                    per_percent = 100 -received_packets /npackets*100
-                    self.logger.debug("PER: " + str(per_percent) + "%, Done percent: "+ str(done_percent)+  "% RSSI:  "+ str(rssi_current))
-                elif r.response_type == '(rxPacket)':
-                    rssi_current =  float(r.response_content['rssi'])
-                else:
-                    #raise RAILError('BER status unkown type:',r.response_type)
-                    self.logger.warn('different response: '+ r.response_type)
+        if self.rx_packet_rssi:
+            rssi_current = self.rx_packet_rssi[-1]
+        self.logger.debug("PER: %s%%, Done percent: %s%% RSSI:  %s", per_percent, done_percent, rssi_current)
 
         self._driver.resetCounters()
         return per_percent, done_percent,rssi_current
     def stop(self):
         self.logger.info("Stop called\n")
+        self._ber_session = None
+        self._ber_running = False
+        if self._driver.isIdle():  # nothing to stop, no need to query the status
+            return
         try:
             _status = self.getStatus() # if this hits in the middle of a command a ValueError will be thrown
         except ValueError: # but we dont care
@@ -390,6 +554,7 @@ class WSTK_RAILTest:
         :param whitening:
         :return:
         """
+        self._ber_session = None  # PHY change, BER receiver has to be reconfigured
         self._driver.setconfigindex(radio_config_id)
 
         if profile.upper() == "FAN":
@@ -408,6 +573,7 @@ class WSTK_RAILTest:
         :param scrambler: 0 for '000010111', 1 for '101111100'
         :return:
         """
+        self._ber_session = None  # PHY change, BER receiver has to be reconfigured
         self._driver.setconfigindex(radio_config_id)
         self._driver.set802154phr(phr_format=2, opt1=mcs, opt2=scrambler)
 
@@ -422,9 +588,7 @@ class WSTK_RAILTest:
         padding_len = packet_length - len(data)  # this many padding will be needed
         data_to_send = data + bytes([0 for _ in range(0, padding_len)] ) # padding with 0's
         self._driver.setTxLength(length=packet_length)
-        chunk_len = 18  # download data to unit in 18-byte chunks
-        for k in range(0, len(data_to_send)//chunk_len):
-            self._driver.setTxPayload(data=data_to_send[k*chunk_len:(k+1)*chunk_len], offset=k*chunk_len)
+        self._driver.setTxPayloadChunks(data=data_to_send, chunk_len=18)  # download data to unit in 18-byte chunks
 
     def getTxPacket(self):
         response = self._driver.printTxPacket()[0]
@@ -1,9 +1,10 @@
 import serial
+from collections import deque
 from copy import deepcopy
 from dataclasses import dataclass
 from pyparsing import nestedExpr
 import time
-from common import Logger, Level
+from common import Logger, Level, command_profiler
 
 class RAILError(Exception):
     def __init__(self, errorCode:str, errorMessage:str):
@@ -16,11 +17,20 @@ class RAILTest_response:
     response_content:dict
 
 class WSTK_RAILTest_Driver:
+    PROBE_BAUDRATES = (921600, 460800, 230400, 115200)  # tried in this order by probeBaudRate, the VCOM and the RAILTest UART config have to agree
+    LOGFILE_MAX_BYTES = 10*1024*1024  # the _driver logfile logs every response, it is rotated at this size unless the settings say otherwise
     def __init__(self, COMport:str, baudRate:int=115200, format:str="8N1", timeout_ms:int=1000,logger_settings :Logger.Settings = Logger.Settings()):  # typically 115200, 8N1
         self.port = serial.Serial()
         self._read_buffer = ''  # internal buffer to avoid some problems caused by RAILTest dumps
+        # DUT state tracked from the commands sent and the status responses seen, None means unknown
+        self.app_mode:str|None = None
+        self.rx_on:bool|None = None
+        self.tx_on:bool|None = None
+        self.reset_count:int = 0  # incremented by every reset, lets the higher layers drop the state the reset cleared
+        self.pipeline_window:int = 4  # commands sent ahead of their response when pipelining, limited by the RAILTest input buffer
         self.port.port = COMport
-        self.port.baudrate = baudRate
+        self.port.baudrate = baudRate if baudRate else WSTK_RAILTest_Driver.PROBE_BAUDRATES[-1]
+        self.quiet:bool = False  # asynchronous prints off and quiet payload upload, see setQuietMode
         bits = int(format[0])
         parity = format[1]
         stop_bits = int(format[2])
@@ -30,6 +40,8 @@ class WSTK_RAILTest_Driver:
 
         if logger_settings.logfile_name is not None:
             logger_settings.logfile_name +="_driver"
+            if not logger_settings.logfile_max_bytes:
+                logger_settings.logfile_max_bytes = WSTK_RAILTest_Driver.LOGFILE_MAX_BYTES
         self.logger = Logger(logger_settings)
         if bits==8:
             self.port.bytesize == serial.EIGHTBITS
@@ -46,6 +58,8 @@ class WSTK_RAILTest_Driver:
         self.port.timeout = timeout_ms/1000
         self.port.open()
         self.flushIO()
+        if not baudRate:
+            self.probeBaudRate()
         self.reset()
         self.setTxTransitions('idle','idle') #setting after tx transitions to idle(not rx)
     def __del__(self):
@@ -72,18 +86,111 @@ class WSTK_RAILTest_Driver:
             self._read_buffer = self._read_buffer[self._read_buffer.find(termination_char)+1:]  # clear the returned part from the buffer
 
 
-        return_buffer_log=''.join(return_buffer.splitlines()) #remowing newlines for clean logging
-        return_buffer_log = return_buffer_log.replace('\0','',-1) # removing unwanted null characters
-        self.logger.debug(return_buffer_log+ "\n")
+        if self.logger.isEnabledFor(Level.DEBUG):  # the cleanup below is only needed for the log
+            return_buffer_log=''.join(return_buffer.splitlines()) #remowing newlines for clean logging
+            return_buffer_log = return_buffer_log.replace('\0','',-1) # removing unwanted null characters
+            self.logger.debug(return_buffer_log+ "\n")
 
         if timeout and termination_char!=None:
             raise TimeoutError('pywstk_driver._read Timeout')
         return return_buffer
+    def _readLines(self, timeout_ms:int=100)->list[str]:  # returns the complete lines received so far, waits at most timeout_ms for the first one
+        start = time.time_ns()
+        while '\n' not in self._read_buffer and (time.time_ns()-start)/1e6 < timeout_ms:
+            r = self.port.read(self.port.in_waiting)
+            self._read_buffer += r.decode('latin-1')  # store in internal buffer
+            if not r:
+                time.sleep(0.001)  # nothing arrived, don't spin on the port
+        end = self._read_buffer.rfind('\n')+1
+        lines = self._read_buffer[:end].splitlines()
+        self._read_buffer = self._read_buffer[end:]  # keep the partial line for the next read
+        if self.logger.isEnabledFor(Level.DEBUG):
+            for line in lines:
+                self.logger.debug(line.replace('\0','')+ "\n")
+        return lines
     def _command(self, cmd:str, timeout_ms:int=1000, wait_time_s:float = 0.0):
-        self._write(cmd)
-        time.sleep(wait_time_s)
-        response = self._read(timeout_ms=timeout_ms)
+        with command_profiler.command("pywstk", cmd) as record:
+            self._write(cmd)
+            record.add('bytes_out', len(cmd)+1)
+            time.sleep(wait_time_s)
+            response = self._read(timeout_ms=timeout_ms)
+            record.add('bytes_in', len(response))
         return response
+    def probeBaudRate(self, baudrates:tuple|None=None)->int:
+        """
+        Find the highest baud rate RAILTest answers on and keep the port at it
+
+        :param tuple baudrates: the baud rates to try, in order, defaults to PROBE_BAUDRATES
+
+        :return: the baud rate found
+        :rtype: int
+        """
+        if baudrates is None:
+            baudrates = WSTK_RAILTest_Driver.PROBE_BAUDRATES
+        for baudrate in baudrates:
+            self.port.baudrate = baudrate
+            self.flushIO()
+            self._read_buffer = ''
+            try:
+                self.getVersion()
+            except Exception:  # garbage or nothing at the wrong baud rate
+                self.logger.debug("No valid response at %s baud", baudrate)
+                continue
+            self.logger.info("RAILTest responding at "+str(baudrate)+" baud")
+            return baudrate
+        raise RAILError('probeBaudRate', 'RAILTest not responding at any of '+str(baudrates)+' baud')
+    def setQuietMode(self, on_off:bool):  # asynchronous prints (rxPacket, txEnd, txError) off, setTxPayloadQuiet for uploads
+        self.setNotifications(on_off=not on_off)
+        self.quiet = on_off
+    def invalidateState(self):  # forget the tracked DUT state, the next stop() will query the status
+        self.app_mode = None
+        self.rx_on = None
+        self.tx_on = None
+    def isIdle(self)->bool:  # True only if the DUT is known to be idle, without querying it
+        return self.app_mode=='NONE' and self.rx_on is False and self.tx_on is False
+    def _trackStatus(self, responses:list[RAILTest_response]):
+        for r in responses:
+            if r.response_type=='(status)':
+                self.app_mode = str(r.response_content['AppMode']).upper()
+                self.rx_on = bool(int(r.response_content['RAIL_state_rx']))
+                self.tx_on = bool(int(r.response_content['RAIL_state_tx']))
+    def _pipelinedCommands(self, commands:list[tuple[str,str]], window:int=4, timeout_ms:int=1000)->list[list[RAILTest_response]]:
+        """
+        Send commands without waiting for each response, keeping at most window commands in flight
+
+        The responses are read back in order and checked against the command that produced them. If a command fails,
+        the responses of the commands already sent are still read (to keep the serial stream in sync) before raising.
+
+        :param commands: list of (command name, full command line) tuples
+        :param int window: maximum number of commands sent ahead of their response, 1 means no pipelining
+
+        :return: the parsed responses of every command, in order
+        """
+        results = []
+        pending = deque()
+        error = None
+        def collect():
+            nonlocal error
+            name, line = pending.popleft()
+            try:
+                response = self._read(timeout_ms=timeout_ms)
+                results.append(WSTK_RAILTest_Driver.handleRAILerror(response=response, expected=name))
+            except (ValueError, TimeoutError) as e:
+                self.invalidateState()
+                if error is None:
+                    error = ValueError("Pipelined command '" + line + "' failed: " + str(e))
+        for name, line in commands:
+            if error is not None:
+                break
+            self._write(line)
+            pending.append((name, line))
+            if len(pending) >= window:
+                collect()
+        while pending:
+            collect()
+        if error is not None:
+            raise error
+        return results
     def flushIO(self):
         self.port.flushInput()
         self.port.flushOutput()
@@ -121,12 +228,14 @@ class WSTK_RAILTest_Driver:
         try:
             responses = WSTK_RAILTest_Driver.parseResponse(response)
             response_found=False
+            quiet = expected.endswith('Quiet')  # quiet commands may answer with the plain command's response or not at all
+            expected_types = ("("+expected+")", "("+expected.removesuffix('Quiet')+")")
             error_found = None
             response_types = ""
             if len(responses):
                 for r in responses:
                     response_types+=r.response_type
-                    if r.response_type ==  "("+expected+")":  # look for the expected response
+                    if r.response_type in expected_types:  # look for the expected response
                         response_found=True
                     if 'error' in r.response_content.keys():  # check if any error occured during executing the RAIL command
                         error_found = r.response_content['error']
@@ -135,10 +244,10 @@ class WSTK_RAILTest_Driver:
 
                 if error_found:
                     raise ValueError(error_found)
-                if not response_found:  # raise error if RAIL response does not correspond to the right command
+                if not (response_found or quiet):  # raise error if RAIL response does not correspond to the right command
                     error_str = "Wrong response: must start with ("+expected+")"+", got "+response_types + " instead!"
                     raise ValueError(error_str)
-            else:
+            elif not quiet:
                 error_str = "No responses found: "+response
                 raise ValueError(error_str)
             return responses  # this is to avoid parsing 2 times
@@ -149,17 +258,31 @@ class WSTK_RAILTest_Driver:
         def wrapper(self, *args, **kwargs):
             # execute the input function that contains the specific driver call
             # must return the driver command's name and the response in orther to be able to check for errors
-            command, response = driver_function(self, *args, **kwargs)
-            # parse responses and check for errors, this is to avoid parsing 2 times
-            responses = WSTK_RAILTest_Driver.handleRAILerror(response=response, expected=command)
+            try:
+                command, response = driver_function(self, *args, **kwargs)
+                # parse responses and check for errors, this is to avoid parsing 2 times
+                with command_profiler.command("pywstk", command, metric='parse_s'):
+                    responses = WSTK_RAILTest_Driver.handleRAILerror(response=response, expected=command)
+            except:
+                self.invalidateState()  # the command might have been executed partially, DUT state is unknown
+                raise
+            if command=='status':
+                self._trackStatus(responses)
             # can be extended further with other functionalities, if needed
             return responses  # return the entire response for further processing in higher layers
         return wrapper  # will be decorated later
     # *************************************************************************************************
     # Driver calls: methods that perform single calls to the driver ***********************************
     # It is recommended to name the method identical to the driver method
+    def reset(self)->list[RAILTest_response]:
+        responses = self._reset()
+        if self.quiet:  # reset restores the default notifications
+            self.setNotifications(on_off=False)
+        return responses
     @driverCall
-    def reset(self)->str:
+    def _reset(self)->str:
+        self.invalidateState()
+        self.reset_count += 1
         response = self._command('reset',timeout_ms=10000, wait_time_s=0.5)
         return 'reset', response
     @driverCall
@@ -202,10 +325,14 @@ class WSTK_RAILTest_Driver:
         else:
             raise ValueError('setTxTone: unknown tx mode')
         response = self._command('setTxTone ' +str(enable)+' '+str(antenna)+' '+str(tone_mode))
+        self.app_mode = None if on_off else 'NONE'
+        self.tx_on = None
         return 'setTxTone', response
     @driverCall
     def tx(self, npackets:int)->str:
         response = self._command('tx '+str(npackets),)
+        self.app_mode = None  # 'tx 0' toggles continuous TX and packet TX ends on its own, state has to be queried
+        self.tx_on = None
         return 'tx', response
     @driverCall
     def setTxStream(self, on_off:bool, mode:str, antenna:int)->str:
@@ -224,16 +351,32 @@ class WSTK_RAILTest_Driver:
         else:
             raise ValueError('setTxStream: unknown tx stream mode')
         response = self._command('setTxStream '+str(enable)+' '+str(stream_mode)+' '+str(antenna))
+        self.app_mode = 'STREAM' if on_off else 'NONE'
+        self.tx_on = None
         return 'setTxStream', response
     @driverCall
     def setTxLength(self, length:int)->str:
         response = self._command('setTxLength '+str(length))
         return 'setTxLength', response
+    @staticmethod
+    def _setTxPayloadLine(data:bytes, offset:int=0, quiet:bool=False)->str:
+        data_bytes_str = ' '.join([str(int(x)) for x in data])
+        return ('setTxPayloadQuiet ' if quiet else 'setTxPayload ')+str(offset)+' '+data_bytes_str
     @driverCall
     def setTxPayload(self, data:bytes, offset:int=0)->str:
-        data_bytes_str = ' '.join([str(int(x)) for x in data])
-        response = self._command('setTxPayload '+str(offset)+' '+data_bytes_str)
+        response = self._command(WSTK_RAILTest_Driver._setTxPayloadLine(data, offset))
         return 'setTxPayload', response
+    def setTxPayloadChunks(self, data:bytes, chunk_len:int, offset:int=0, window:int|None=None)->list[list[RAILTest_response]]:
+        """
+        Upload data with pipelined setTxPayload commands of chunk_len bytes each (the last one may be shorter)
+
+        :param int window: commands in flight, defaults to pipeline_window
+        """
+        if window is None:
+            window = self.pipeline_window
+        name = 'setTxPayloadQuiet' if self.quiet else 'setTxPayload'
+        commands = [(name, WSTK_RAILTest_Driver._setTxPayloadLine(data[k:k+chunk_len], offset+k, self.quiet)) for k in range(0, len(data), chunk_len)]
+        return self._pipelinedCommands(commands, window=window)
     @driverCall
     def printTxPacket(self):
         response = self._command('printTxPacket')
@@ -245,6 +388,7 @@ class WSTK_RAILTest_Driver:
         else:
             receive_mode = 0
         response = self._command('rx '+str(receive_mode),)  # rx takes some time to execute
+        self.rx_on = on_off
         return 'rx', response
     @driverCall
     def getRssi(self)->str:
@@ -257,6 +401,8 @@ class WSTK_RAILTest_Driver:
         else:
             receive_mode = 0
         response = self._command('berRx '+str(receive_mode))
+        self.app_mode = 'BER' if on_off else 'NONE'
+        self.rx_on = None  # berRx 1 turns the radio to RX, the next stop() checks it
         return 'berRx', response
     @driverCall    
     def setBerConfig(self, nbytes:int)->str:
@@ -273,6 +419,14 @@ class WSTK_RAILTest_Driver:
         response = self._command('resetCounters')
         return 'resetCounters', response
     @driverCall
+    def setNotifications(self, on_off:bool)->str:
+        if on_off:
+            enable = 1
+        else:
+            enable = 0
+        response = self._command('setNotifications '+str(enable))
+        return 'setNotifications', response
+    @driverCall
     def getVersion(self)->str:
         response = self._command('getVersion')
         return 'getVersion', response
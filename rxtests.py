@@ -1,26 +1,52 @@
-from pydoc import visiblename
-from pywstk.pywstk_driver import WSTK_RAILTest_Driver
 from pywstk.pyRAIL import WSTK_RAILTest
-from pyspecan.pySpecAn import SpecAn, RS_SpectrumAnalyzer
+from pyspecan.pySpecAn import SpecAn
 from pysiggen.pySigGen import SigGen
 from pysiggen.pySigGen import SigGenSettings
+from pysiggen.packet_builder import PacketConfig, packet_hex
 import numpy as np
-from pypsu import pyPSU
-from matplotlib import pyplot as plt
 import xlsxwriter
 from time import sleep
 from datetime import datetime as dt
-from excel_plotter.Py_to_Excel_plotter import Py_to_Excel_plotter
 import pandas as pd
 from os import remove,path
 from dataclasses import dataclass
-from common import Logger, Level
+from common import Logger, Level, tracer, run_concurrently, ConcurrentError
+from instrument_sessions import InstrumentSessions
 import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pyvisa import errors as visaerrors
-import serial
-import xlsxwriter
 import os
-from excel_plotter.plotly_functions import plot_bathtub
+
+
+class MeasurementStatus():
+    """
+    Status of the last run of a measurement
+
+    Every measurement object has its own, so measurements of different boards can run in parallel threads.
+    The sweep reports failures with fail(), the status can be read from any thread.
+
+    :param bool success: False if any error rate measurement failed (nothing received at the first power level)
+    :param list failures: description of every failure of the run
+    :param int ctune: CTUNE value set by the last CTUNE search, None if it hasn't run
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.success:bool = True
+        self.failures:list[str] = []
+        self.ctune:int|None = None
+
+    def start(self):
+        """Clear the failures at the start of a sweep, the CTUNE result is kept"""
+        with self._lock:
+            self.success = True
+            self.failures = []
+
+    def fail(self, message:str):
+        with self._lock:
+            self.success = False
+            self.failures.append(message)
 
 
 class Sensitivity():
@@ -46,6 +72,8 @@ class Sensitivity():
         :param list freq_list_hz: Custom list of frequencies
         
         :param Logger.Settings logger_settings: Logger module settings for the measurement, imported from common
+        :param bool concurrent_initialization: Initialize the instruments in parallel threads at the start of measure(),
+                                               instead of one after another
 
         :param bool measure_with_CTUNE_w_SA: Enable CTUNE with spectrum analyzer (more accurate)
         :param bool measure_with_CTUNE_w_SG: Enable CTUNE with signal generator (easier setup, faster)
@@ -75,7 +103,10 @@ class Sensitivity():
         :param bool siggen_custom_on: Custom mode one, for all SG functionality this should be on
         :param str siggen_per_packet_filename: the name of the file on this PC, that contains the binary data of the test packet
                                                 Should be in the format of Saleae Logic analyzers csv export
+        :param PacketConfig siggen_per_packet: test packet built by pysiggen.packet_builder, used instead of siggen_per_packet_filename if set
         :param str siggen_per_packet_siggen_name : what the name of the @BIT file will be on the generator itself
+        :param str siggen_upload_cache_filename: .json file remembering the files uploaded to each generator across runs,
+                                                 identical files are not uploaded again (within one run this works without the file too)
         :param str siggen_pattern_repeat: continuous or single ( CONT or SING)
         :param str siggen_trigger_type: KEY|BUS|EXT- triggerkey on generator, GPIB bus, or external, almost always use BUS
         :param Logger.Settings siggen_logger_settings: Logger module settings for SG, imported from common
@@ -90,9 +121,23 @@ class Sensitivity():
 
         :param str wstk_com_port: COM port of the RAILTest device
         :param Logger.Settings wstk_logger_settings: Logger module settings for WSTK, imported from common
+        :param int wstk_baudrate: UART baud rate of the RAILTest device, None probes the highest working one
+        :param bool wstk_quiet_mode: Turn off the RAILTest packet prints (PER is then counted from the RX counter, without RSSI)
 
         :param int ber_bytes_to_test: Number of bytes to be used for one BER measurement
         :param int per_packets_to_tes: Number of packets to be used for one PER measurement
+
+        :param bool warm_start_search: Start each threshold search near the result of the previous frequency/offset,
+                                       instead of the first element of the power list
+        :param float warm_start_margin_dB: The warm started search begins this much on the passing side of the previous result
+
+        :param bool siggen_burst_mode: In PER mode let the generator sequence the whole packet burst from one trigger,
+                                       instead of triggering every packet from the host
+        :param bool siggen_list_mode: Download the power (and frequency) steps to the generator as a list and step through it,
+                                      instead of setting every point separately (RSSI sweep and blocker power sweep)
+        :param bool waterfall_ramp_mode: Waterfall BER only: the generator runs through the power list by itself, dwelling
+                                         waterfall_ramp_dwell_s on each power, while the DUT does one long BER acquisition
+        :param float waterfall_ramp_dwell_s: Time spent on each power in ramp mode, the first 20% of it is not counted
         """
         #Frequency range settings
         freq_start_hz: int = 868e6
@@ -100,6 +145,7 @@ class Sensitivity():
         freq_num_steps: int = 2
         freq_list_hz: list|None = None
         logger_settings: Logger.Settings = Logger.Settings()
+        concurrent_initialization: bool = True
 
         #Cable attenutation setting
         cable_attenuation_dB: float = 2
@@ -130,7 +176,9 @@ class Sensitivity():
         siggen_filter_BbT:float = 0.5
         siggen_custom_on:bool = True #deprecated
         siggen_per_packet_filename :str = "pysiggen/packets/std_rail_packet.csv"
+        siggen_per_packet :PacketConfig|None = None
         siggen_per_packet_siggen_name :str = "TEMP"
+        siggen_upload_cache_filename :str|None = None
         siggen_pattern_repeat:str = "SINGle"
         siggen_trigger_type:str = "BUS"
         siggen_logger_settings: Logger.Settings = Logger.Settings()
@@ -151,13 +199,27 @@ class Sensitivity():
         #WSTK settings
         wstk_com_port: str = ""
         wstk_logger_settings: Logger.Settings = Logger.Settings()
+        wstk_baudrate: int|None = 115200
+        wstk_quiet_mode: bool = False
 
         # Test data quantities
         ber_bytes_to_test:int = 10000
         per_packets_to_test:int = 100
 
+        # Threshold search settings
+        warm_start_search: bool = False
+        warm_start_margin_dB: float = 2
+
+        # PER transmission settings
+        siggen_burst_mode: bool = False
+        siggen_list_mode: bool = False
+
+        # Waterfall settings
+        waterfall_ramp_mode: bool = False
+        waterfall_ramp_dwell_s: float = 0.2
+
 
-    def __init__(self,settings:Settings,chip_name:str,board_name:str):
+    def __init__(self,settings:Settings,chip_name:str,board_name:str,sessions:InstrumentSessions|None=None):
         """
         Initialize measurement class
 
@@ -166,10 +228,13 @@ class Sensitivity():
         :param str board_name: Name of board, containg the IC, only used in reporting
         :param str logfile_name: If initialized, separate logfile will be created for this measurement
         :param bool console_logging: Enable console logging, True by default
+        :param InstrumentSessions sessions: If given, the instruments are borrowed from it, and kept open after the measurement
         """
         self.settings = settings
         self.chip_name = chip_name
         self.board_name = board_name
+        self.sessions = sessions
+        self.status = MeasurementStatus()
 
         self.siggen_packet_delay_s = 0.001
         self.ber_timeout_ms = 1000
@@ -185,7 +250,7 @@ class Sensitivity():
 
     def _set_measurement_times(self):
         if self.settings.err_rate_type == 'PER':
-            self.siggen_packet_delay_s = self.get_packet_length(self.settings.siggen_per_packet_filename) / (self.settings.siggen_modulation_symbolrate_sps * self.settings.siggen_modulation_bits_per_symbol)
+            self.siggen_packet_delay_s = self.get_packet_length(self.settings.siggen_per_packet or self.settings.siggen_per_packet_filename) / (self.settings.siggen_modulation_symbolrate_sps * self.settings.siggen_modulation_bits_per_symbol)
             self.siggen_packet_delay_s *= 1.2
             # If the result is a very small number, return this to a good default value
             if self.siggen_packet_delay_s < 0.001:
@@ -200,10 +265,16 @@ class Sensitivity():
                 self.ber_timeout_ms = 1000
             self.logger.info(f"Automaticall set BER timeout: {self.ber_timeout_ms} ms")
 
+    @tracer.traced(category="setup")
     def initialize_siggen(self):
-        self.siggen = SigGen(resource=self.settings.siggen_address,logger_settings=self.settings.siggen_logger_settings)
+        if self.sessions is not None:
+            self.siggen, reused = self.sessions.siggen(self.settings.siggen_address, self.settings.siggen_logger_settings)
+        else:
+            self.siggen, reused = SigGen(resource=self.settings.siggen_address,logger_settings=self.settings.siggen_logger_settings), False
+        self.siggen.upload_cache_filename = self.settings.siggen_upload_cache_filename
         self.siggen_settings = SigGenSettings()
-        self.siggen.reset()
+        if not reused:
+            self.siggen.reset()
 
         self.siggen_settings.amplitude_dbm = self.settings.siggen_power_start_dBm
         self.siggen_settings.modulation.type = self.settings.siggen_modulation_type
@@ -216,6 +287,7 @@ class Sensitivity():
         self.siggen_settings.stream_type = self.settings.siggen_stream_type
         self.siggen_settings.custom_on = self.settings.siggen_custom_on
         self.siggen_settings.per_packet_filename = self.settings.siggen_per_packet_filename
+        self.siggen_settings.per_packet = self.settings.siggen_per_packet
         self.siggen_settings.per_packet_siggen_name = self.settings.siggen_per_packet_siggen_name
 
         
@@ -230,9 +302,14 @@ class Sensitivity():
                                                     dtype=float
                                                     )
 
+    @tracer.traced(category="setup")
     def initialize_specan(self):
-        self.specan = SpecAn(resource=self.settings.specan_address,logger_settings=self.settings.specan_logger_settings)
-        self.specan.reset()
+        if self.sessions is not None:
+            self.specan, reused = self.sessions.specan(self.settings.specan_address, self.settings.specan_logger_settings)
+        else:
+            self.specan, reused = SpecAn(resource=self.settings.specan_address,logger_settings=self.settings.specan_logger_settings), False
+        if not reused:
+            self.specan.reset()
         self.specan.updateDisplay(on_off=True)
         self.specan.setMode('CONTINUOUS')
         self.specan.setSpan(self.settings.specan_span_hz)
@@ -247,11 +324,21 @@ class Sensitivity():
             self.specan.setDetector(self.settings.specan_detector_type)
         self.specan.setRefOffset(self.settings.specan_ref_offset)
     
+    def _open_wstk(self, com_port:str, logger_settings:Logger.Settings)->WSTK_RAILTest:
+        if self.sessions is not None:
+            wstk, reused = self.sessions.wstk(com_port, logger_settings, self.settings.wstk_baudrate)
+        else:
+            wstk, reused = WSTK_RAILTest(com_port,logger_settings=logger_settings,reset=True,baudRate=self.settings.wstk_baudrate), False
+        if not reused:  # a reused DUT keeps its state, e.g. the CTUNE set by an earlier measurement
+            wstk._driver.reset()
+        if self.settings.wstk_quiet_mode or reused:
+            wstk.setQuietMode(on_off=self.settings.wstk_quiet_mode)
+        wstk._driver.rx(on_off=False)
+        return wstk
+
+    @tracer.traced(category="setup")
     def initialize_wstk(self):
-        self.wstk = WSTK_RAILTest(self.settings.wstk_com_port,logger_settings=self.settings.wstk_logger_settings,reset=True)
-
-        self.wstk._driver.reset()
-        self.wstk._driver.rx(on_off=False)
+        self.wstk = self._open_wstk(self.settings.wstk_com_port, self.settings.wstk_logger_settings)
 
         if self.settings.freq_list_hz is None:
             self.settings.freq_list_hz = np.linspace(
@@ -261,6 +348,7 @@ class Sensitivity():
                                                     dtype=float
                                                     )
 
+    @tracer.traced(category="setup")
     def initialize_reporter(self):
         self.workbook = xlsxwriter.Workbook(self.workbook_name)
 
@@ -292,12 +380,13 @@ class Sensitivity():
 
         self.row = 1
 
-        self.backup_csv_filename = "backup_csv_sens_raw.csv"
+        self.backup_csv_filename = "backup_csv_sens_raw_" + self.board_name + ".csv"  # one per board, measurements of different boards can run in parallel
 
 
         if path.exists(self.backup_csv_filename):
             remove(self.backup_csv_filename)
 
+    @tracer.traced(category="result write")
     def Py_to_Excel_plotter(self):
         # Import raw vs power data from existing xlsx
         summary = pd.read_excel(self.workbook_name, sheet_name="Summary")
@@ -366,32 +455,120 @@ class Sensitivity():
         os.remove(self.workbook_name)
         os.rename(output_workbook_name, self.workbook_name)
 
-    def get_packet_length(self,data_csv_filename:str):
+    def get_packet_length(self,packet:PacketConfig|str):
         """Read and return the length of the PER packet in bits."""
         try:
-            bin_df = pd.read_csv(data_csv_filename)
+            hex_data = packet_hex(packet)
         except FileNotFoundError:
             self.logger.warn("Packet file not found! If using PN stream, ignore")
             return
-        # define a lambda function to convert each hex value to a string
-        to_hex_string = lambda x: x[2:]
-        # apply the lambda function to each value in the 'mosi' column and concatenate them together
-        hex_data = ''.join(bin_df['mosi'].apply(to_hex_string))
         length_in_bits = int(len(hex_data)*4)
 
         return length_in_bits
-    
+
+    def _tx_start_function(self):
+        """Return the generator function used to send the PER packets."""
+        if self.settings.siggen_burst_mode:
+            return self.siggen.sendBurst
+        return self.siggen.sendTrigger
+
+    def _measure_error_rate(self, frequency_Hz:float):
+        """Measure BER or PER (depending on the settings) at the current generator setting."""
+        with tracer.span(self.settings.err_rate_type, category="acquisition", frequency_Hz=frequency_Hz):
+            if self.settings.err_rate_type == 'BER':
+                return self.wstk.measureBer(nbytes=self.settings.ber_bytes_to_test, timeout_ms=self.ber_timeout_ms, frequency_Hz=frequency_Hz)
+            elif self.settings.err_rate_type == 'PER':
+                return self.wstk.measurePer(npackets=self.settings.per_packets_to_test,interpacket_delay_s =self.siggen_packet_delay_s,frequency_Hz=frequency_Hz,tx_start_function=self._tx_start_function())
+            else:
+                raise TypeError('Not recognized error rate string!')
+
+    def _get_warm_start_index(self, power_list:list, previous_threshold_index:int|None)->int:
+        """
+        Get the index of the power list where the next threshold search should start.
+
+        The power lists are ordered from the passing side towards the failing side, so the search starts
+        at the first power level that is within the warm start margin of the previous result.
+
+        :param list power_list: The power list to be searched
+        :param int previous_threshold_index: Index of the previous search's result, None if there was no result
+
+        :return: The index of the starting power level
+        :rtype: int
+        """
+        if not self.settings.warm_start_search or previous_threshold_index is None:
+            return 0
+        previous_threshold = power_list[previous_threshold_index]
+        for index, power in enumerate(power_list):
+            if abs(power - previous_threshold) <= self.settings.warm_start_margin_dB:
+                return index
+        return 0
+
+    @tracer.traced(category="sweep")
+    def _threshold_search(self, power_list:list, measure_point, record_threshold, start_index:int=0, full_sweep:bool=False)->int|None:
+        """
+        Search for the error rate threshold on a power list.
+
+        The search steps forward from start_index until the threshold is reached. If the starting point
+        already fails, it steps back towards the start of the list until a passing point is found.
+
+        :param list power_list: The power list to be searched
+        :param measure_point: Called with a list index, returns True if the threshold is reached,
+                              False if not and None if the measurement failed
+        :param record_threshold: Called with the list index of the found threshold
+        :param int start_index: Index of the first power level to measure
+        :param bool full_sweep: Measure every power level, record_threshold is called for every failing point
+
+        :return: The index of the threshold, None if it was not found
+        :rtype: int
+        """
+        if full_sweep:
+            for index in range(len(power_list)):
+                if measure_point(index):
+                    record_threshold(index)
+            return None
+
+        threshold_index = None
+        failed = measure_point(start_index)
+        if failed is None:
+            return None
+        if failed and start_index > 0:
+            # the warm started search began past the threshold, step back until the error rate passes
+            threshold_index = start_index
+            for index in range(start_index-1, -1, -1):
+                failed = measure_point(index)
+                if failed is None:
+                    return None
+                if not failed:
+                    break
+                threshold_index = index
+        elif failed:
+            threshold_index = start_index
+        else:
+            for index in range(start_index+1, len(power_list)):
+                failed = measure_point(index)
+                if failed is None:
+                    return None
+                if failed:
+                    threshold_index = index
+                    break
+
+        if threshold_index is not None:
+            record_threshold(threshold_index)
+        return threshold_index
+
+    @tracer.traced(category="sweep")
     def initiate(self):
         
         self.siggen.toggleModulation(True)
         self.siggen.toggleRFOut(True)
         i = 1
         j = 1
-        global ber_success
-        ber_success = True
+        self.status.start()
 
         self._set_measurement_times()
 
+        previous_threshold_index = None
+
         for freq in self.settings.freq_list_hz:
 
             self.siggen.setFrequency(freq)
@@ -402,21 +579,20 @@ class Sensitivity():
                     self.settings.err_rate_type+' [%]':0,
                     'RSSI':0,     
                 }
+            results = {}
 
-            for siggen_power in self.settings.siggen_power_list_dBm:
+            @tracer.traced("power step", category="sweep")
+            def measure_point(index:int):
+                nonlocal i
+                siggen_power = self.settings.siggen_power_list_dBm[index]
 
                 self.siggen.setAmplitude(siggen_power)
 
-                if self.settings.err_rate_type == 'BER':
-                    err_percent,done_percent,rssi = self.wstk.measureBer(nbytes=self.settings.ber_bytes_to_test, timeout_ms=self.ber_timeout_ms, frequency_Hz=freq)
-                elif self.settings.err_rate_type == 'PER':
-                    err_percent,done_percent,rssi = self.wstk.measurePer(npackets=self.settings.per_packets_to_test,interpacket_delay_s =self.siggen_packet_delay_s,frequency_Hz=freq,tx_start_function=self.siggen.sendTrigger)
-                else:
-                    raise TypeError('Not recognized error rate string!')
+                err_percent,done_percent,rssi = self._measure_error_rate(freq)
                 if i == 1 and done_percent == 0 and rssi == 0:
                     print(self.settings.err_rate_type +" measurement failed!")
-                    ber_success = False
-                    break
+                    self.status.fail(self.settings.err_rate_type +" measurement failed!")
+                    return None
 
                 sens_raw_measurement_record['Input Power [dBm]'] = siggen_power-self.settings.cable_attenuation_dB
                 sens_raw_measurement_record[self.settings.err_rate_type +' [%]'] = err_percent
@@ -429,38 +605,50 @@ class Sensitivity():
                 i += 1
 
                 record_df = pd.DataFrame(sens_raw_measurement_record,index=[0])
-                record_df.to_csv(self.backup_csv_filename, mode='a', header=not path.exists(self.backup_csv_filename),index=False)
-                self.logger.info("\n"+record_df.to_string())
+                with tracer.span("result write", category="result write"):
+                    record_df.to_csv(self.backup_csv_filename, mode='a', header=not path.exists(self.backup_csv_filename),index=False)
+                if self.logger.isEnabledFor(Level.INFO):
+                    self.logger.info("\n"+record_df.to_string())
 
-                if err_percent >= self.settings.err_rate_threshold_percent:
+                results[index] = (err_percent, rssi)
+                return err_percent >= self.settings.err_rate_threshold_percent
 
-                        self.sheet_sensdata.write(j, 0, freq/1e6)
-                        self.sheet_sensdata.write(j, 1, siggen_power-self.settings.cable_attenuation_dB)
-                        self.sheet_sensdata.write(j, 2, err_percent)
-                        self.sheet_sensdata.write(j, 3, rssi)
-                        j += 1
+            def record_threshold(index:int):
+                nonlocal j
+                err_percent, rssi = results[index]
+                self.sheet_sensdata.write(j, 0, freq/1e6)
+                self.sheet_sensdata.write(j, 1, self.settings.siggen_power_list_dBm[index]-self.settings.cable_attenuation_dB)
+                self.sheet_sensdata.write(j, 2, err_percent)
+                self.sheet_sensdata.write(j, 3, rssi)
+                j += 1
 
-                        break                       
+            start_index = self._get_warm_start_index(self.settings.siggen_power_list_dBm, previous_threshold_index)
+            previous_threshold_index = self._threshold_search(self.settings.siggen_power_list_dBm, measure_point, record_threshold, start_index)
 
-        self.wstk._driver.reset()
+        self._reset_wstk(self.wstk)
  
+    @tracer.traced(category="ctune")
     def ctune_w_sa(self):
 
         freq = self.settings.freq_list_hz[0]
-        ctune_init = 120
-        pwr_raw = 200
 
         self.initialize_specan()
         self.specan.setFrequency(freq)
         sleep(0.1)
 
+        return self._ctune_dut_w_sa(freq)
+
+    def _ctune_dut_w_sa(self, freq:float)->int:
+        # CTUNE search of self.wstk on the analyzer set up by ctune_w_sa
+        ctune_init = 120
+        pwr_raw = 200
         ctune_min = 0
         ctune_max = 255
         ctune_steps = 20
         fine_error_Hz = 5000
 
         ctune_range = np.linspace(ctune_min, ctune_max, ctune_steps, dtype=int)
-        global ctuned
+        ctuned = ctune_init  # kept if the DUT frequency can't be found close enough
         self.wstk._driver.setCtune(ctune_init)
         self.wstk.transmit(mode="CW", frequency_Hz=freq, power_dBm=pwr_raw, power_format="RAW")
         self.wstk._driver.setTxTone(on_off=True, mode="cw")
@@ -611,11 +799,13 @@ class Sensitivity():
         self.wstk._driver.reset()
         self.wstk._driver.rx(on_off=False)
         self.wstk._driver.setCtune(ctuned)
+        self.status.ctune = ctuned
         self.logger.info("Tuned CTUNE value: " + str(ctuned))
         self.logger.info("Actual DUT frequency: " + str(marker_freq) + " Hz")
         self.logger.info("Frequency error: " + str(marker_freq - freq) + " Hz")
 
         return ctuned    
+    @tracer.traced(category="ctune")
     def ctune_w_sg(self):
 
         ctune_init = 120
@@ -650,7 +840,7 @@ class Sensitivity():
                 self.wstk._driver.rx(True)
                 RSSI_actual = self.wstk.readRSSI()
                 self.logger.debug("Caught RAIL bug getRSSI value error")
-            self.logger.debug("Actual CTUNE: " +str(ctune_actual)+", actual RSSI: "+ str(RSSI_actual))
+            self.logger.debug("Actual CTUNE: %s, actual RSSI: %s", ctune_actual, RSSI_actual)
             if RSSI_actual > RSSI_max:
                 RSSI_max = RSSI_actual
                 ctuned = ctune_actual
@@ -664,11 +854,31 @@ class Sensitivity():
         self.wstk._driver.reset()
         self.wstk._driver.rx(on_off=False)
         self.wstk._driver.setCtune(ctuned)
+        self.status.ctune = ctuned
 
         self.logger.info("Tuned CTUNE value: " + str(ctuned))
         self.logger.info("Max RSSI: " + str(RSSI_max) + " dBm")
 
     
+    def _reset_wstk(self, wstk:WSTK_RAILTest):
+        # a borrowed DUT is not reset, so the next measurement keeps its CTUNE, _release_instruments sets it idle
+        if self.sessions is None:
+            wstk._driver.reset()
+
+    def _release_instruments(self):
+        # the instruments belong to self.sessions, here they are only set to idle, the sessions close them
+        for name in ('blocking_siggen', 'siggen'):
+            if hasattr(self, name):
+                getattr(self, name).toggleModulation(False)
+                getattr(self, name).toggleRFOut(False)
+                delattr(self, name)
+        if hasattr(self, 'specan'):
+            del self.specan
+        if hasattr(self, 'wstk'):
+            self.wstk.stop()
+            self.wstk._driver.rx(on_off=False)
+            del self.wstk
+
     def stop(self):
         # if workbook already exists no need to close again
         if not path.isfile(self.workbook_name):
@@ -676,34 +886,32 @@ class Sensitivity():
             if hasattr(self,'workbook'):
                 self.workbook.close()
 
+        if self.sessions is not None:
+            self._release_instruments()
+            return
+
         try:
             if hasattr(self,'siggen'):
                 self.siggen.toggleModulation(False)
                 self.siggen.toggleRFOut(False)
-                self.siggen.logger.handlers.clear()
                 # This caused weird errors when running multiple measurements from one file
                 # del self.siggen
         # if someone already closed the visa session
         except visaerrors.InvalidSession:
-            self.siggen.logger.handlers.clear() 
             self.initialize_siggen() 
             self.siggen.toggleModulation(False) 
             self.siggen.toggleRFOut(False)
-            self.siggen.logger.handlers.clear()
             # This caused weird errors when running multiple measurements from one file
             # del self.siggen
 
         try:
             if hasattr(self,'wstk'):
                 self.wstk._driver.reset()
-                self.wstk.logger.handlers.clear()
                 self.wstk.close()
                 del self.wstk
         # if someone already closed the visa session
         except visaerrors.InvalidSession:
-            self.wstk.logger.handlers.clear() 
             self.wstk._driver.reset()
-            self.wstk.logger.handlers.clear()
             self.wstk.close()
             del self.wstk  
 
@@ -724,6 +932,26 @@ class Sensitivity():
                                 )
         return final_df
 
+    def initialize_instruments(self, *groups):
+        """
+        Run the initialize_* steps, the groups in parallel threads if concurrent_initialization is set
+
+        The steps of a group run one after another, so a step depending on another one goes after it in the same group.
+        If any step fails, the other groups are still completed, then all the failures are raised in a ConcurrentError.
+
+        :param groups: lists of initialize_* methods
+        """
+        if not self.settings.concurrent_initialization:
+            for group in groups:
+                for step in group:
+                    step()
+            return
+        run_concurrently(*groups, description="Instrument initialization failed", thread_name_prefix="initialize")
+
+    def _check_input_power(self):
+        if (self.settings.siggen_power_list_dBm[0] - self.settings.cable_attenuation_dB) > 10:
+            raise ValueError("Too high input power injected!")
+
     def measure(self)->pd.DataFrame:
         """
         Initiate the measurement.
@@ -731,12 +959,12 @@ class Sensitivity():
         :return: The measured data
         :rtype: pandas.DataFrame
         """
-        self.initialize_siggen()
-        self.initialize_wstk()
-        self.initialize_reporter()
-
-        if (self.settings.siggen_power_list_dBm[0] - self.settings.cable_attenuation_dB) > 10:
-            raise ValueError("Too high input power injected!")
+        self.initialize_instruments(
+            [self.initialize_siggen],
+            [self.initialize_wstk],
+            [self.initialize_reporter],
+            )
+        self._check_input_power()
         
         if self.settings.ctune_initial is None:
 
@@ -757,9 +985,10 @@ class Sensitivity():
 
         self.Py_to_Excel_plotter()
 
-        if ber_success:
+        if self.status.success:
             df = self.get_dataframe(self.backup_csv_filename)
-            self.logger.debug(df.to_string())
+            if self.logger.isEnabledFor(Level.DEBUG):
+                self.logger.debug(df.to_string())
             self.logger.info("\nDone with measurements")
 
             return df
@@ -790,7 +1019,7 @@ class Blocking(Sensitivity):
         blocker_logger_settings: Logger.Settings = Logger.Settings()
                 
 
-    def __init__(self,settings:Settings,chip_name:str,board_name:str):
+    def __init__(self,settings:Settings,chip_name:str,board_name:str,sessions:InstrumentSessions|None=None):
         """
         Initialize measurement class
 
@@ -799,10 +1028,13 @@ class Blocking(Sensitivity):
         :param str board_name: Name of board, containg the IC, only used in reporting
         :param str logfile_name: If initialized, separate logfile will be created for this measurement
         :param bool console_logging: Enable console logging, True by default
+        :param InstrumentSessions sessions: If given, the instruments are borrowed from it, and kept open after the measurement
         """
         self.settings = settings
         self.chip_name = chip_name
         self.board_name = board_name
+        self.sessions = sessions
+        self.status = MeasurementStatus()
 
         self.siggen_packet_delay_s = 0.001
         self.ber_timeout_ms = 1000
@@ -817,10 +1049,15 @@ class Blocking(Sensitivity):
         atexit.register(self.__del__)                                           
             
     # Based on initialize_siggen
+    @tracer.traced(category="setup")
     def initialize_blocking_generator(self):
-        self.blocking_siggen = SigGen(resource=self.settings.blocking_address,logger_settings=self.settings.blocking_siggen_logger_settings)
+        if self.sessions is not None:
+            self.blocking_siggen, reused = self.sessions.siggen(self.settings.blocking_address, self.settings.blocking_siggen_logger_settings)
+        else:
+            self.blocking_siggen, reused = SigGen(resource=self.settings.blocking_address,logger_settings=self.settings.blocking_siggen_logger_settings), False
         self.blocking_siggen_settings = SigGenSettings()
-        self.blocking_siggen.reset()
+        if not reused:
+            self.blocking_siggen.reset()
 
         self.blocking_siggen_settings.amplitude_dbm = self.settings.blocker_start_power_dBm
 
@@ -842,6 +1079,7 @@ class Blocking(Sensitivity):
                                                     dtype=float
                                                     )
     
+    @tracer.traced(category="setup")
     def initialize_reporter(self):
         self.workbook = xlsxwriter.Workbook(self.workbook_name)
 
@@ -884,11 +1122,12 @@ class Blocking(Sensitivity):
 
         self.row = 1
 
-        self.backup_csv_filename = "backup_csv_blocking_raw.csv"
+        self.backup_csv_filename = "backup_csv_blocking_raw_" + self.board_name + ".csv"
 
         if path.exists(self.backup_csv_filename):
             remove(self.backup_csv_filename)
 
+    @tracer.traced(category="result write")
     def Py_to_Excel_plotter(self):
         # Import raw vs power data from existing xlsx
         summary = pd.read_excel(self.workbook_name, sheet_name="Summary")
@@ -968,17 +1207,20 @@ class Blocking(Sensitivity):
         os.remove(self.workbook_name)
         os.rename(output_workbook_name, self.workbook_name)
     
+    @tracer.traced(category="sweep")
     def initiate(self):
         
         self.siggen.toggleModulation(True)
         self.siggen.toggleRFOut(True)
-        global ber_success
-        ber_success = True
+        self.status.start()
         i = 1
         j = 1
         k = 1
 
         self._set_measurement_times()
+
+        previous_sens_index = None
+        previous_blocking_index = None
         
         for frequency in self.settings.freq_list_hz:
             
@@ -992,23 +1234,22 @@ class Blocking(Sensitivity):
                     'Blocker Freq. Offset [MHz]':0,
                     'Blocker Abs. Power [dBm]':0,     
                 }
+            sens_results = {}
             
             self.logger.info("\nStarting sensitivity measurement")
-            
-            for sigGen_power in self.settings.siggen_power_list_dBm:
+
+            @tracer.traced("power step", category="sweep")
+            def measure_sens_point(index:int):
+                nonlocal i
+                sigGen_power = self.settings.siggen_power_list_dBm[index]
                 
                 self.siggen.setAmplitude(sigGen_power)
                 
-                if self.settings.err_rate_type == 'BER':
-                    err_percent,done_percent,rssi = self.wstk.measureBer(nbytes=self.settings.ber_bytes_to_test,timeout_ms=self.ber_timeout_ms,frequency_Hz=frequency)
-                elif self.settings.err_rate_type == 'PER':
-                    err_percent,done_percent,rssi = self.wstk.measurePer(npackets=self.settings.per_packets_to_test,interpacket_delay_s =self.siggen_packet_delay_s,frequency_Hz=frequency,tx_start_function=self.siggen.sendTrigger)
-                else:
-                    raise TypeError('Not recognized error rate string!')
+                err_percent,done_percent,rssi = self._measure_error_rate(frequency)
                 if i == 1 and done_percent == 0 and rssi == 0:
                     print(self.settings.err_rate_type +" measurement failed!")
-                    ber_success = False
-                    break
+                    self.status.fail(self.settings.err_rate_type +" measurement failed!")
+                    return None
 
                 blocking_raw_measurement_record['Input Power [dBm]'] = sigGen_power-self.settings.cable_attenuation_dB
                 blocking_raw_measurement_record[self.settings.err_rate_type +' [%]'] = err_percent
@@ -1025,52 +1266,73 @@ class Blocking(Sensitivity):
                 i += 1
 
                 record_df = pd.DataFrame(blocking_raw_measurement_record,index=[0])
-                record_df.to_csv(self.backup_csv_filename, mode='a', header=not path.exists(self.backup_csv_filename),index=False)
-                self.logger.info("\n"+record_df.to_string())
-
-                if err_percent >= self.settings.err_rate_threshold_percent:
-
-                    self.sheet_sensdata.write(j, 0, frequency/1e6)
-                    self.sheet_sensdata.write(j, 1, sigGen_power - self.settings.cable_attenuation_dB)
-                    self.sheet_sensdata.write(j, 2, err_percent)
-                    self.sheet_sensdata.write(j, 3, rssi)
-                    j += 1
-
-                    break
+                with tracer.span("result write", category="result write"):
+                    record_df.to_csv(self.backup_csv_filename, mode='a', header=not path.exists(self.backup_csv_filename),index=False)
+                if self.logger.isEnabledFor(Level.INFO):
+                    self.logger.info("\n"+record_df.to_string())
 
-            self.siggen.setAmplitude(sigGen_power + self.settings.desired_power_relative_to_sens_during_blocking_test_dB)
+                sens_results[index] = (err_percent, rssi)
+                return err_percent >= self.settings.err_rate_threshold_percent
+
+            def record_sens_threshold(index:int):
+                nonlocal j
+                err_percent, rssi = sens_results[index]
+                self.sheet_sensdata.write(j, 0, frequency/1e6)
+                self.sheet_sensdata.write(j, 1, self.settings.siggen_power_list_dBm[index] - self.settings.cable_attenuation_dB)
+                self.sheet_sensdata.write(j, 2, err_percent)
+                self.sheet_sensdata.write(j, 3, rssi)
+                j += 1
+
+            start_index = self._get_warm_start_index(self.settings.siggen_power_list_dBm, previous_sens_index)
+            sens_index = self._threshold_search(self.settings.siggen_power_list_dBm, measure_sens_point, record_sens_threshold, start_index)
+            previous_sens_index = sens_index
+
+            if sens_index is not None:
+                sigGen_power = self.settings.siggen_power_list_dBm[sens_index]
+            else:
+                sigGen_power = self.settings.siggen_power_list_dBm[-1]
+            desired_power = sigGen_power + self.settings.desired_power_relative_to_sens_during_blocking_test_dB
+
+            self.siggen.setAmplitude(desired_power)
             self.blocking_siggen.toggleRFOut(rf_on=True)
 
             self.logger.info("\nStarting blocking measurement")
 
-            for blocker_offset_freq in self.settings.blocker_offset_freq_list_Hz:
+            if self.settings.siggen_list_mode: # every offset and power of this frequency in one list
+                self.blocking_siggen.setList([(frequency + offset, power, 0) for offset in self.settings.blocker_offset_freq_list_Hz for power in self.settings.blocker_power_list_dBm])
+                self.blocking_siggen.startList()
+
+            for offset_index, blocker_offset_freq in enumerate(self.settings.blocker_offset_freq_list_Hz):
                 
-                self.blocking_siggen.setFrequency(frequency + blocker_offset_freq)
+                if not self.settings.siggen_list_mode:
+                    self.blocking_siggen.setFrequency(frequency + blocker_offset_freq)
 
                 blocking_index = 1
+                blocking_results = {}
 
-                for blocker_power in self.settings.blocker_power_list_dBm:
+                @tracer.traced("power step", category="sweep")
+                def measure_blocking_point(index:int):
+                    nonlocal i, blocking_index
+                    blocker_power = self.settings.blocker_power_list_dBm[index]
 
-                    self.blocking_siggen.setAmplitude(blocker_power)
-                    if self.settings.err_rate_type == 'BER':
-                        err_percent,done_percent,rssi = self.wstk.measureBer(nbytes=self.settings.ber_bytes_to_test,timeout_ms=self.ber_timeout_ms,frequency_Hz=frequency)
-                    elif self.settings.err_rate_type == 'PER':
-                        err_percent,done_percent,rssi = self.wstk.measurePer(npackets=self.settings.per_packets_to_test,interpacket_delay_s =self.siggen_packet_delay_s,frequency_Hz=frequency,tx_start_function=self.siggen.sendTrigger)
+                    if self.settings.siggen_list_mode:
+                        self.blocking_siggen.setListIndex(offset_index*len(self.settings.blocker_power_list_dBm) + index)
                     else:
-                        raise TypeError('Not recognized error rate string!')
+                        self.blocking_siggen.setAmplitude(blocker_power)
+                    err_percent,done_percent,rssi = self._measure_error_rate(frequency)
                     if blocking_index == 1 and done_percent == 0 and rssi == 0:
                         print(self.settings.err_rate_type + " measurement failed, blocking test cancelled!")
-                        ber_success = False
-                        break
+                        self.status.fail(self.settings.err_rate_type + " measurement failed, blocking test cancelled!")
+                        return None
                    
-                    blocking_raw_measurement_record['Input Power [dBm]'] = sigGen_power + self.settings.desired_power_relative_to_sens_during_blocking_test_dB - self.settings.cable_attenuation_dB
+                    blocking_raw_measurement_record['Input Power [dBm]'] = desired_power - self.settings.cable_attenuation_dB
                     blocking_raw_measurement_record[self.settings.err_rate_type +' [%]'] = err_percent
                     blocking_raw_measurement_record['RSSI'] = rssi
                     blocking_raw_measurement_record['Blocker Freq. Offset [MHz]'] = blocker_offset_freq/1e6
                     blocking_raw_measurement_record['Blocker Abs. Power [dBm]'] = blocker_power-self.settings.blocker_cable_attenuation_dB
                     
                     self.sheet_rawdata.write(i, 0, frequency/1e6)
-                    self.sheet_rawdata.write(i, 1, sigGen_power + self.settings.desired_power_relative_to_sens_during_blocking_test_dB - self.settings.cable_attenuation_dB)
+                    self.sheet_rawdata.write(i, 1, desired_power - self.settings.cable_attenuation_dB)
                     self.sheet_rawdata.write(i, 2, err_percent)
                     self.sheet_rawdata.write(i, 3, rssi)
                     self.sheet_rawdata.write(i, 4, blocker_offset_freq/1e6)
@@ -1079,23 +1341,31 @@ class Blocking(Sensitivity):
                     blocking_index += 1
 
                     record_df = pd.DataFrame(blocking_raw_measurement_record,index=[0])
-                    record_df.to_csv(self.backup_csv_filename, mode='a', header=not path.exists(self.backup_csv_filename),index=False)
-                    self.logger.info("\n"+record_df.to_string())
-
-                    if err_percent >= self.settings.err_rate_threshold_percent:
-
-                        self.sheet_blockingdata.write(k, 0, frequency/1e6)
-                        self.sheet_blockingdata.write(k, 1, sigGen_power + self.settings.desired_power_relative_to_sens_during_blocking_test_dB - self.settings.cable_attenuation_dB)
-                        self.sheet_blockingdata.write(k, 2, blocker_offset_freq/1e6)
-                        self.sheet_blockingdata.write(k, 3, blocker_power-self.settings.blocker_cable_attenuation_dB)
-                        self.sheet_blockingdata.write(k, 4, err_percent)
-                        k += 1
-
-                        break
-
+                    with tracer.span("result write", category="result write"):
+                        record_df.to_csv(self.backup_csv_filename, mode='a', header=not path.exists(self.backup_csv_filename),index=False)
+                    if self.logger.isEnabledFor(Level.INFO):
+                        self.logger.info("\n"+record_df.to_string())
+
+                    blocking_results[index] = err_percent
+                    return err_percent >= self.settings.err_rate_threshold_percent
+
+                def record_blocking_threshold(index:int):
+                    nonlocal k
+                    self.sheet_blockingdata.write(k, 0, frequency/1e6)
+                    self.sheet_blockingdata.write(k, 1, desired_power - self.settings.cable_attenuation_dB)
+                    self.sheet_blockingdata.write(k, 2, blocker_offset_freq/1e6)
+                    self.sheet_blockingdata.write(k, 3, self.settings.blocker_power_list_dBm[index]-self.settings.blocker_cable_attenuation_dB)
+                    self.sheet_blockingdata.write(k, 4, blocking_results[index])
+                    k += 1
+
+                start_index = self._get_warm_start_index(self.settings.blocker_power_list_dBm, previous_blocking_index)
+                previous_blocking_index = self._threshold_search(self.settings.blocker_power_list_dBm, measure_blocking_point, record_blocking_threshold, start_index)
+
+            if self.settings.siggen_list_mode:
+                self.blocking_siggen.stopList()
             self.blocking_siggen.toggleRFOut(rf_on=False)
 
-        self.wstk._driver.reset()
+        self._reset_wstk(self.wstk)
 
     def stop(self):
         # if workbook already exists no need to close again
@@ -1104,61 +1374,53 @@ class Blocking(Sensitivity):
             if hasattr(self,'workbook'):
                 self.workbook.close()
 
+        if self.sessions is not None:
+            self._release_instruments()
+            return
+
         try:
             if hasattr(self,'blocking_siggen'):
                 self.blocking_siggen.toggleModulation(False)
                 self.blocking_siggen.toggleRFOut(False)
-                self.blocking_siggen.logger.handlers.clear()
                 del self.blocking_siggen
         # if someone already closed the visa session
         except visaerrors.InvalidSession:
-            self.blocking_siggen.logger.handlers.clear() 
             self.initialize_blocking_generator() 
             self.blocking_siggen.toggleModulation(False) 
             self.blocking_siggen.toggleRFOut(False)
-            self.blocking_siggen.logger.handlers.clear()
             del self.siggen
 
         try:
             if hasattr(self,'siggen'):
                 self.siggen.toggleModulation(False)
                 self.siggen.toggleRFOut(False)
-                self.siggen.logger.handlers.clear()
                 del self.siggen
         # if someone already closed the visa session
         except visaerrors.InvalidSession:
-            self.siggen.logger.handlers.clear() 
             self.initialize_siggen() 
             self.siggen.toggleModulation(False) 
             self.siggen.toggleRFOut(False)
-            self.siggen.logger.handlers.clear()
             del self.siggen
 
         try:
             if hasattr(self,'specan'):
                 self.specan.setSigGenOutput_toggle(False)
-                self.specan.logger.handlers.clear()
                 del self.specan
         # if someone already closed the visa session
         except visaerrors.InvalidSession:
-            self.specan.logger.handlers.clear() 
             #self.initialize_specan_Generator() 
             self.initialize_blocking_generator()
             self.specan.setSigGenOutput_toggle(False)
-            self.specan.logger.handlers.clear()
             del self.specan
 
         try:
             if hasattr(self,'wstk'):
                 self.wstk._driver.reset()
-                self.wstk.logger.handlers.clear()
                 self.wstk.close()
                 del self.wstk
         # if someone already closed the visa session
         except visaerrors.InvalidSession:
-            self.wstk.logger.handlers.clear() 
             self.wstk._driver.reset()
-            self.wstk.logger.handlers.clear()
             self.wstk.close()
             del self.wstk        
 
@@ -1169,14 +1431,12 @@ class Blocking(Sensitivity):
         :return: The measured data
         :rtype: pandas.DataFrame
         """
-        self.initialize_siggen()
-        self.initialize_wstk()
-        self.initialize_reporter()
-        
-        if (self.settings.siggen_power_list_dBm[0] - self.settings.cable_attenuation_dB) > 10:
-            raise ValueError("Too high input power injected!")
-
-        self.initialize_blocking_generator()
+        # the blocking generator is configured with the stream settings of the main generator
+        self.initialize_instruments(
+            [self.initialize_siggen, self._check_input_power, self.initialize_blocking_generator],
+            [self.initialize_wstk],
+            [self.initialize_reporter],
+            )
 
         # if self.settings.measure_with_CTUNE_w_SA:
         #     self.ctune_w_sa()
@@ -1190,9 +1450,10 @@ class Blocking(Sensitivity):
 
         self.Py_to_Excel_plotter()
 
-        if ber_success:
+        if self.status.success:
             df = self.get_dataframe(self.backup_csv_filename)
-            self.logger.debug(df.to_string())
+            if self.logger.isEnabledFor(Level.DEBUG):
+                self.logger.debug(df.to_string())
             self.logger.info("\nDone with measurements")
 
             return df
@@ -1216,7 +1477,7 @@ class FreqOffset_Sensitivity(Sensitivity):
         freq_offset_logger_settings: Logger.Settings = Logger.Settings()
                 
 
-    def __init__(self,settings:Settings,chip_name:str,board_name:str):
+    def __init__(self,settings:Settings,chip_name:str,board_name:str,sessions:InstrumentSessions|None=None):
         """
         Initialize measurement class
 
@@ -1225,10 +1486,13 @@ class FreqOffset_Sensitivity(Sensitivity):
         :param str board_name: Name of board, containg the IC, only used in reporting
         :param str logfile_name: If initialized, separate logfile will be created for this measurement
         :param bool console_logging: Enable console logging, True by default
+        :param InstrumentSessions sessions: If given, the instruments are borrowed from it, and kept open after the measurement
         """
         self.settings = settings
         self.chip_name = chip_name
         self.board_name = board_name
+        self.sessions = sessions
+        self.status = MeasurementStatus()
 
         self.siggen_packet_delay_s = 0.001
         self.ber_timeout_ms = 1000
@@ -1250,6 +1514,7 @@ class FreqOffset_Sensitivity(Sensitivity):
                                                     dtype=float
                                                     )
     
+    @tracer.traced(category="setup")
     def initialize_reporter(self):
         self.workbook = xlsxwriter.Workbook(self.workbook_name)
 
@@ -1283,11 +1548,12 @@ class FreqOffset_Sensitivity(Sensitivity):
 
         self.row = 1
 
-        self.backup_csv_filename = "backup_csv_freqoffset-sens_raw.csv"
+        self.backup_csv_filename = "backup_csv_freqoffset-sens_raw_" + self.board_name + ".csv"
 
         if path.exists(self.backup_csv_filename):
             remove(self.backup_csv_filename)
 
+    @tracer.traced(category="result write")
     def Py_to_Excel_plotter(self):
         # Import raw vs power data from existing xlsx
         summary = pd.read_excel(self.workbook_name, sheet_name="Summary")
@@ -1341,6 +1607,7 @@ class FreqOffset_Sensitivity(Sensitivity):
         workbook.close()
 
         if self.settings.plot_bathtub:
+            from excel_plotter.plotly_functions import plot_bathtub  # plotly is only needed for the bathtub plot
             plot_bathtub(self.backup_csv_filename,self.settings.bathtub_filename_html)
             self.logger.info("Freq. Offset Tolerance interactive 3D plot saved in "+ self.settings.bathtub_filename_html)
 
@@ -1348,16 +1615,18 @@ class FreqOffset_Sensitivity(Sensitivity):
         os.remove(self.workbook_name)
         os.rename(output_workbook_name, self.workbook_name)
     
+    @tracer.traced(category="sweep")
     def initiate(self):
         self.siggen.toggleModulation(True)
         self.siggen.toggleRFOut(True)
-        global ber_success
-        ber_success = True
+        self.status.start()
         i = 1
         k = 1
 
         self._set_measurement_times()
 
+        previous_threshold_index = None
+
         for frequency in self.settings.freq_list_hz:
 
             # self.siggen.setFrequency(frequency)
@@ -1374,17 +1643,16 @@ class FreqOffset_Sensitivity(Sensitivity):
 
                 self.siggen.setFrequency(frequency + freq_offset)
                 j = 1   #dummy counter to log sensitivity if BER measurement fails between two input-power steps
+                results = {}
 
-                for sigGen_power in self.settings.siggen_power_list_dBm:
+                @tracer.traced("power step", category="sweep")
+                def measure_point(index:int):
+                    nonlocal i, j
+                    sigGen_power = self.settings.siggen_power_list_dBm[index]
                     
                     self.siggen.setAmplitude(sigGen_power)
 
-                    if self.settings.err_rate_type == 'BER':
-                        err_percent,done_percent,rssi = self.wstk.measureBer(nbytes=self.settings.ber_bytes_to_test,timeout_ms=self.ber_timeout_ms,frequency_Hz=frequency)
-                    elif self.settings.err_rate_type == 'PER':
-                        err_percent,done_percent,rssi = self.wstk.measurePer(npackets=self.settings.per_packets_to_test,interpacket_delay_s =self.siggen_packet_delay_s,frequency_Hz=frequency,tx_start_function=self.siggen.sendTrigger)
-                    else:
-                        raise TypeError('Not recognized error rate string!')
+                    err_percent,done_percent,rssi = self._measure_error_rate(frequency)
                     
                     freqoffset_sens_raw_measurement_record['Freq. Offset [kHz]'] = freq_offset/1e3
                     freqoffset_sens_raw_measurement_record['Input Power [dBm]'] = sigGen_power-self.settings.cable_attenuation_dB
@@ -1399,40 +1667,47 @@ class FreqOffset_Sensitivity(Sensitivity):
                     i += 1
 
                     record_df = pd.DataFrame(freqoffset_sens_raw_measurement_record,index=[0])
-                    record_df.to_csv(self.backup_csv_filename, mode='a', header=not path.exists(self.backup_csv_filename),index=False)
-                    self.logger.info("\n"+record_df.to_string())
+                    with tracer.span("result write", category="result write"):
+                        record_df.to_csv(self.backup_csv_filename, mode='a', header=not path.exists(self.backup_csv_filename),index=False)
+                    if self.logger.isEnabledFor(Level.INFO):
+                        self.logger.info("\n"+record_df.to_string())
 
-                    if err_percent >= self.settings.err_rate_threshold_percent:
+                    first_point = j == 1
+                    j += 1
 
-                        self.sheet_sensdata.write(k, 0, frequency/1e6)
-                        self.sheet_sensdata.write(k, 1, freq_offset/1e3)
-                        self.sheet_sensdata.write(k, 2, sigGen_power-self.settings.cable_attenuation_dB)
-                        self.sheet_sensdata.write(k, 3, err_percent)
-                        self.sheet_sensdata.write(k, 4, rssi)
-                        k += 1
-                        if not self.settings.plot_bathtub: # for bathtub a full sweep is needed
-                            break
+                    if err_percent >= self.settings.err_rate_threshold_percent:
+                        results[index] = (sigGen_power, err_percent, rssi)
+                        return True
 
-                    if done_percent == 0 and j == 1 and rssi == 0:                     
+                    if done_percent == 0 and first_point and rssi == 0:
                         print(self.settings.err_rate_type + " measurement failed!")
-                        ber_success = False
-                        if not self.settings.plot_bathtub: # for bathtub a full sweep is needed
-                            break
-
-                    if done_percent == 0 and j > 1:
-
-                        self.sheet_sensdata.write(k, 0, frequency/1e6)
-                        self.sheet_sensdata.write(k, 1, freq_offset/1e3)
-                        self.sheet_sensdata.write(k, 2, self.settings.siggen_power_list_dBm[j-2]-self.settings.cable_attenuation_dB)
-                        self.sheet_sensdata.write(k, 3, err_percent)
-                        self.sheet_sensdata.write(k, 4, rssi)
-                        k += 1
-                        if not self.settings.plot_bathtub: # for bathtub a full sweep is needed
-                            break
-
-                    j += 1
+                        self.status.fail(self.settings.err_rate_type + " measurement failed!")
+                        return None
+
+                    if done_percent == 0 and index > 0:
+                        # the signal was lost, the previous power level is logged as sensitivity
+                        results[index] = (self.settings.siggen_power_list_dBm[index-1], err_percent, rssi)
+                        return True
+
+                    return False
+
+                def record_threshold(index:int):
+                    nonlocal k
+                    sigGen_power, err_percent, rssi = results[index]
+                    self.sheet_sensdata.write(k, 0, frequency/1e6)
+                    self.sheet_sensdata.write(k, 1, freq_offset/1e3)
+                    self.sheet_sensdata.write(k, 2, sigGen_power-self.settings.cable_attenuation_dB)
+                    self.sheet_sensdata.write(k, 3, err_percent)
+                    self.sheet_sensdata.write(k, 4, rssi)
+                    k += 1
+
+                if self.settings.plot_bathtub: # for bathtub a full sweep is needed
+                    self._threshold_search(self.settings.siggen_power_list_dBm, measure_point, record_threshold, full_sweep=True)
+                else:
+                    start_index = self._get_warm_start_index(self.settings.siggen_power_list_dBm, previous_threshold_index)
+                    previous_threshold_index = self._threshold_search(self.settings.siggen_power_list_dBm, measure_point, record_threshold, start_index)
 
-        self.wstk._driver.reset()  
+        self._reset_wstk(self.wstk)
 
 class RSSI_Sweep(Sensitivity):
     
@@ -1447,7 +1722,7 @@ class RSSI_Sweep(Sensitivity):
         siggen_logger_settings: Logger.Settings = Logger.Settings()
                 
 
-    def __init__(self,settings:Settings,chip_name:str,board_name:str):
+    def __init__(self,settings:Settings,chip_name:str,board_name:str,sessions:InstrumentSessions|None=None):
         """
         Initialize measurement class
 
@@ -1456,10 +1731,13 @@ class RSSI_Sweep(Sensitivity):
         :param str board_name: Name of board, containg the IC, only used in reporting
         :param str logfile_name: If initialized, separate logfile will be created for this measurement
         :param bool console_logging: Enable console logging, True by default
+        :param InstrumentSessions sessions: If given, the instruments are borrowed from it, and kept open after the measurement
         """
         self.settings = settings
         self.chip_name = chip_name
         self.board_name = board_name
+        self.sessions = sessions
+        self.status = MeasurementStatus()
 
         self.siggen_packet_delay_s = 0.001
         self.ber_timeout_ms = 1000
@@ -1481,6 +1759,7 @@ class RSSI_Sweep(Sensitivity):
                                                     dtype=float
                                                     )
             
+    @tracer.traced(category="setup")
     def initialize_reporter(self):
         self.workbook = xlsxwriter.Workbook(self.workbook_name)
 
@@ -1496,11 +1775,12 @@ class RSSI_Sweep(Sensitivity):
 
         self.row = 1
 
-        self.backup_csv_filename = "backup_csv_rssi-sweep_raw.csv"
+        self.backup_csv_filename = "backup_csv_rssi-sweep_raw_" + self.board_name + ".csv"
 
         if path.exists(self.backup_csv_filename):
             remove(self.backup_csv_filename)
     
+    @tracer.traced(category="result write")
     def Py_to_Excel_plotter(self):
         # Import raw vs power data from existing xlsx
         summary = pd.read_excel(self.workbook_name, sheet_name="Summary")
@@ -1553,6 +1833,7 @@ class RSSI_Sweep(Sensitivity):
         os.remove(self.workbook_name)
         os.rename(output_workbook_name, self.workbook_name)
     
+    @tracer.traced(category="sweep")
     def initiate(self):
             
         # RSSI sweep wasn't working when PER options were set, this overwrites that
@@ -1564,12 +1845,14 @@ class RSSI_Sweep(Sensitivity):
 
         self.siggen.toggleModulation(True)
         self.siggen.toggleRFOut(True)
-        global ber_success
-        ber_success = True
+        self.status.start()
         i = 1
 
         self._set_measurement_times()
 
+        if self.settings.siggen_list_mode: # the same list is used for every DUT frequency
+            self.siggen.setList([(siggen_frequency, power, 0) for siggen_frequency in self.settings.siggen_freq_list_Hz for power in self.settings.siggen_power_list_dBm])
+
         for frequency in self.settings.freq_list_hz:
 
             self.wstk.receive(on_off=True, frequency_Hz=frequency, timeout_ms=1000)
@@ -1583,13 +1866,22 @@ class RSSI_Sweep(Sensitivity):
                     'RSSI':0,   
                 }
 
+            point_index = 0
+            if self.settings.siggen_list_mode:
+                self.siggen.startList()
+
             for siggen_frequency in self.settings.siggen_freq_list_Hz:
 
-                self.siggen.setFrequency(siggen_frequency)
+                if not self.settings.siggen_list_mode:
+                    self.siggen.setFrequency(siggen_frequency)
 
                 for sigGen_power in self.settings.siggen_power_list_dBm:
                         
-                    self.siggen.setAmplitude(sigGen_power)
+                    if self.settings.siggen_list_mode:
+                        self.siggen.setListIndex(point_index)
+                        point_index += 1
+                    else:
+                        self.siggen.setAmplitude(sigGen_power)
                     sleep(0.1)
                     try:
                         rssi_value = self.wstk.readRSSI()
@@ -1609,14 +1901,18 @@ class RSSI_Sweep(Sensitivity):
                     i += 1
 
                     record_df = pd.DataFrame(rssi_sweep_raw_measurement_record,index=[0])
-                    record_df.to_csv(self.backup_csv_filename, mode='a', header=not path.exists(self.backup_csv_filename),index=False)
-                    self.logger.info("\n"+record_df.to_string())
+                    with tracer.span("result write", category="result write"):
+                        record_df.to_csv(self.backup_csv_filename, mode='a', header=not path.exists(self.backup_csv_filename),index=False)
+                    if self.logger.isEnabledFor(Level.INFO):
+                        self.logger.info("\n"+record_df.to_string())
 
-        self.wstk._driver.reset()
+        if self.settings.siggen_list_mode:
+            self.siggen.stopList()
+        self._reset_wstk(self.wstk)
 
 class Waterfall(Sensitivity):
 
-    def __init__(self,settings:Sensitivity.Settings,chip_name:str,board_name:str):
+    def __init__(self,settings:Sensitivity.Settings,chip_name:str,board_name:str,sessions:InstrumentSessions|None=None):
         """
         Initialize measurement class
 
@@ -1625,10 +1921,13 @@ class Waterfall(Sensitivity):
         :param str board_name: Name of board, containg the IC, only used in reporting
         :param str logfile_name: If initialized, separate logfile will be created for this measurement
         :param bool console_logging: Enable console logging, True by default
+        :param InstrumentSessions sessions: If given, the instruments are borrowed from it, and kept open after the measurement
         """
         self.settings = settings
         self.chip_name = chip_name
         self.board_name = board_name
+        self.sessions = sessions
+        self.status = MeasurementStatus()
 
         self.siggen_packet_delay_s = 0.001
         self.ber_timeout_ms = 1000
@@ -1642,6 +1941,7 @@ class Waterfall(Sensitivity):
         self.logger = Logger(self.settings.logger_settings)
         atexit.register(self.__del__)
 
+    @tracer.traced(category="setup")
     def initialize_reporter(self):
         self.workbook = xlsxwriter.Workbook(self.workbook_name)
 
@@ -1673,20 +1973,44 @@ class Waterfall(Sensitivity):
 
         self.row = 1
 
-        self.backup_csv_filename = "backup_csv_waterfall_raw.csv"
+        self.backup_csv_filename = "backup_csv_waterfall_raw_" + self.board_name + ".csv"
 
 
         if path.exists(self.backup_csv_filename):
             remove(self.backup_csv_filename)
 
+    def _measure_power_list(self, freq:float):
+        """Yield (power, (error rate, done percent, RSSI)) for every element of the power list at freq."""
+        ramp_mode = self.settings.waterfall_ramp_mode and self.settings.err_rate_type == 'BER'
+        if ramp_mode and not self.siggen.supports_list_mode:
+            self.logger.warning("The signal generator can't step through a list by itself, ramp mode is not used.")
+            ramp_mode = False
+
+        if not ramp_mode:
+            for siggen_power in self.settings.siggen_power_list_dBm:
+                self.siggen.setAmplitude(siggen_power)
+                yield siggen_power, self._measure_error_rate(freq)
+            return
+
+        dwell_s = self.settings.waterfall_ramp_dwell_s
+        power_list = list(self.settings.siggen_power_list_dBm)
+        self.siggen.setList([(freq, power, dwell_s) for power in power_list], trigger_type="IMM")
+        # the acquisition has to last for the whole ramp, with some margin for the start
+        bitrate = self.settings.siggen_modulation_symbolrate_sps * self.settings.siggen_modulation_bits_per_symbol
+        nbytes = int(bitrate * dwell_s * (len(power_list)+1) / 8)
+        results = self.wstk.measureBerRamp(nsteps=len(power_list), dwell_s=dwell_s, nbytes=nbytes, frequency_Hz=freq,
+                                           start_function=self.siggen.startList, settle_s=0.2*dwell_s)
+        self.siggen.stopList()
+        yield from zip(power_list, results)
+
+    @tracer.traced(category="sweep")
     def initiate(self):
         
         self.siggen.toggleModulation(True)
         self.siggen.toggleRFOut(True)
         i = 1
         j = 1
-        global ber_success
-        ber_success = True
+        self.status.start()
 
         self._set_measurement_times()
 
@@ -1703,18 +2027,11 @@ class Waterfall(Sensitivity):
             
             k = 1
 
-            for siggen_power in self.settings.siggen_power_list_dBm:
+            for siggen_power, (err_percent,done_percent,rssi) in self._measure_power_list(freq):
 
-                self.siggen.setAmplitude(siggen_power)
-                if self.settings.err_rate_type == 'BER':
-                    err_percent,done_percent,rssi = self.wstk.measureBer(nbytes=self.settings.ber_bytes_to_test,timeout_ms=self.ber_timeout_ms,frequency_Hz=freq)
-                elif self.settings.err_rate_type == 'PER':
-                    err_percent,done_percent,rssi = self.wstk.measurePer(npackets=self.settings.per_packets_to_test,interpacket_delay_s =self.siggen_packet_delay_s,frequency_Hz=freq,tx_start_function=self.siggen.sendTrigger)
-                else:
-                    raise TypeError('Not recognized error rate string!')
                 if i == 1 and done_percent == 0 and rssi == 0:
                     print(self.settings.err_rate_type + " measurement failed!")
-                    ber_success = False
+                    self.status.fail(self.settings.err_rate_type + " measurement failed!")
                     break
 
                 waterfall_raw_measurement_record['Input Power [dBm]'] = siggen_power-self.settings.cable_attenuation_dB
@@ -1728,8 +2045,10 @@ class Waterfall(Sensitivity):
                 i += 1
 
                 record_df = pd.DataFrame(waterfall_raw_measurement_record,index=[0])
-                record_df.to_csv(self.backup_csv_filename, mode='a', header=not path.exists(self.backup_csv_filename),index=False)
-                self.logger.info("\n"+record_df.to_string())
+                with tracer.span("result write", category="result write"):
+                    record_df.to_csv(self.backup_csv_filename, mode='a', header=not path.exists(self.backup_csv_filename),index=False)
+                if self.logger.isEnabledFor(Level.INFO):
+                    self.logger.info("\n"+record_df.to_string())
 
                 if k == 1 and err_percent >= self.settings.err_rate_threshold_percent:
 
@@ -1740,4 +2059,257 @@ class Waterfall(Sensitivity):
                         j += 1
                         k += 1                       
 
-        self.wstk._driver.reset()
\ No newline at end of file
+        self._reset_wstk(self.wstk)
+
+class _SharedTxStart():
+    """
+    PER transmission start shared by several DUTs receiving from one generator
+
+    Used as the tx_start_function of measurePer on every DUT: the generator is started once, when every DUT is
+    receiving, and every DUT gets the duration returned by the real start function.
+    """
+
+    def __init__(self, parties:int, tx_start_function, timeout_s:float=60):
+        self._tx_start_function = tx_start_function
+        self._args = ()
+        self._tx_duration_s = None
+        self._barrier = threading.Barrier(parties, action=self._start, timeout=timeout_s)
+
+    def _start(self):
+        self._tx_duration_s = self._tx_start_function(*self._args)
+
+    def __call__(self, npackets:int, interpacket_delay_s:float):
+        self._args = (npackets, interpacket_delay_s)
+        self._barrier.wait()
+        return self._tx_duration_s
+
+    def abort(self):
+        # a DUT failed before receiving, the others must not wait for it
+        self._barrier.abort()
+
+
+class MultiDUT_Sensitivity(Sensitivity):
+    """
+    Measuring receiver sensitivity of several DUTs, fed from one signal generator through a splitter
+
+    At every generator power step the error rate of all the DUTs is measured in parallel threads. A DUT reaching its
+    threshold is recorded and left out from the following power steps, the sweep of a frequency ends when every DUT
+    reached its threshold. The power list is swept from its start, warm_start_search is not used.
+
+    Required instruments:
+    - SiLabs EFR with RAILTest configured, one for every DUT
+    - Signal Generator, its output split to the DUTs
+    """
+
+    @dataclass
+    class Settings(Sensitivity.Settings):
+        """
+        All settings of Sensitivity, and:
+
+        :param list wstk_com_port_list: COM ports of the RAILTest devices, used instead of wstk_com_port
+        :param list dut_name_list: Names of the DUTs used in the reports, in the order of wstk_com_port_list,
+                                   the COM ports are used if not given
+        """
+        wstk_com_port_list: list|None = None
+        dut_name_list: list|None = None
+
+    def __init__(self,settings:Settings,chip_name:str,board_name:str,sessions:InstrumentSessions|None=None):
+        """
+        Initialize measurement class
+
+        :param Settings settings: Settings dataclass containing all the configuration
+        :param str chip_name : Name of IC being tested, only used in reporting
+        :param str board_name: Name of board, containg the IC, only used in reporting
+        :param InstrumentSessions sessions: If given, the instruments are borrowed from it, and kept open after the measurement
+        """
+        self.settings = settings
+        self.chip_name = chip_name
+        self.board_name = board_name
+        self.sessions = sessions
+        self.status = MeasurementStatus()
+        self.dut_status:dict[str,MeasurementStatus] = {}
+        self.wstks:dict[str,WSTK_RAILTest] = {}
+
+        self.siggen_packet_delay_s = 0.001
+        self.ber_timeout_ms = 1000
+
+        timestamp = dt.now().timestamp()
+        self.workbook_name = self.board_name + '_MultiDUT_Sensitivity_results_'+str(int(timestamp))+'.xlsx'
+
+        if self.settings.logger_settings.module_name is None:
+            self.settings.logger_settings.module_name = __name__
+
+        self.logger = Logger(self.settings.logger_settings)
+        atexit.register(self.__del__)
+
+    @tracer.traced(category="setup")
+    def initialize_wstk(self):
+        com_ports = self.settings.wstk_com_port_list or [self.settings.wstk_com_port]
+        names = self.settings.dut_name_list or list(com_ports)
+        if len(names) != len(com_ports):
+            raise ValueError("dut_name_list must have one name for every port of wstk_com_port_list")
+
+        def open_dut(name:str, com_port:str):
+            def step():
+                logger_settings = self.settings.wstk_logger_settings.copy()
+                logger_settings.module_name = (logger_settings.module_name or 'pywstk') + '.' + name
+                self.wstks[name] = self._open_wstk(com_port, logger_settings)
+                if self.settings.ctune_initial is not None:
+                    self.wstks[name]._driver.setCtune(self.settings.ctune_initial)
+            return [step]
+
+        run_concurrently(*[open_dut(name, com_port) for name, com_port in zip(names, com_ports)], description="DUT initialization failed", thread_name_prefix="dut")
+        self.wstks = {name: self.wstks[name] for name in names}  # in the order of the settings
+        self.dut_status = {name: MeasurementStatus() for name in names}
+        self.wstk = self.wstks[names[0]]  # the steps of Sensitivity using a single DUT use the first one
+
+        if self.settings.freq_list_hz is None:
+            self.settings.freq_list_hz = np.linspace(
+                                                    self.settings.freq_start_hz,
+                                                    self.settings.freq_stop_hz,
+                                                    self.settings.freq_num_steps,
+                                                    dtype=float
+                                                    )
+
+    @tracer.traced(category="setup")
+    def initialize_reporter(self):
+        super().initialize_reporter()
+        self.sheet_sum.write(2, 0, 'DUTs: ' + ', '.join(self.settings.dut_name_list or self.settings.wstk_com_port_list or [self.settings.wstk_com_port]))
+        self.sheet_rawdata.write(0, 4, 'DUT')
+        self.sheet_sensdata.write(0, 4, 'DUT')
+
+    @tracer.traced(category="ctune")
+    def ctune_w_sa(self):
+        freq = self.settings.freq_list_hz[0]
+
+        self.initialize_specan()  # once for all the DUTs
+        self.specan.setFrequency(freq)
+        sleep(0.1)
+
+        first = self.wstk
+        for name, wstk in self.wstks.items():
+            self.wstk = wstk
+            self._ctune_dut_w_sa(freq)
+            self.dut_status[name].ctune = self.status.ctune
+        self.wstk = first
+
+    def ctune_w_sg(self):
+        first = self.wstk
+        for name, wstk in self.wstks.items():
+            self.wstk = wstk
+            super().ctune_w_sg()
+            self.dut_status[name].ctune = self.status.ctune
+        self.wstk = first
+
+    def _measure_dut_error_rate(self, name:str, frequency_Hz:float, tx_start_function):
+        wstk = self.wstks[name]
+        try:
+            with tracer.span(self.settings.err_rate_type, category="acquisition", frequency_Hz=frequency_Hz, dut=name):
+                if self.settings.err_rate_type == 'BER':
+                    return wstk.measureBer(nbytes=self.settings.ber_bytes_to_test, timeout_ms=self.ber_timeout_ms, frequency_Hz=frequency_Hz)
+                elif self.settings.err_rate_type == 'PER':
+                    return wstk.measurePer(npackets=self.settings.per_packets_to_test,interpacket_delay_s =self.siggen_packet_delay_s,frequency_Hz=frequency_Hz,tx_start_function=tx_start_function)
+                else:
+                    raise TypeError('Not recognized error rate string!')
+        except:
+            if tx_start_function is not None:
+                tx_start_function.abort()
+            raise
+
+    def _measure_error_rates(self, executor:ThreadPoolExecutor, names:list, frequency_Hz:float)->dict:
+        """Measure BER or PER on the DUTs in parallel, at the current generator setting, with the generator started once for PER"""
+        tx_start_function = _SharedTxStart(len(names), self._tx_start_function()) if self.settings.err_rate_type == 'PER' else None
+        futures = {name: executor.submit(self._measure_dut_error_rate, name, frequency_Hz, tx_start_function) for name in names}
+        errors = [future.exception() for future in futures.values() if future.exception() is not None]
+        if errors:
+            raise ConcurrentError("Error rate measurement failed", errors) from errors[0]
+        return {name: future.result() for name, future in futures.items()}
+
+    @tracer.traced(category="sweep")
+    def initiate(self):
+
+        self.siggen.toggleModulation(True)
+        self.siggen.toggleRFOut(True)
+        self.status.start()
+        for status in self.dut_status.values():
+            status.start()
+        i = 1
+        measured = set()  # the failed measurement check is done on the first point of every DUT
+        sens_rows = {name: [] for name in self.wstks}
+
+        self._set_measurement_times()
+
+        with ThreadPoolExecutor(max_workers=len(self.wstks), thread_name_prefix="dut") as executor:
+            for freq in self.settings.freq_list_hz:
+
+                self.siggen.setFrequency(freq)
+                active = [name for name in self.wstks if self.dut_status[name].success]
+
+                @tracer.traced("power step", category="sweep")
+                def measure_step(siggen_power:float):
+                    nonlocal i
+                    self.siggen.setAmplitude(siggen_power)
+                    results = self._measure_error_rates(executor, active, freq)
+
+                    for name in list(active):
+                        err_percent,done_percent,rssi = results[name]
+                        if name not in measured and done_percent == 0 and rssi == 0:
+                            self.logger.error(self.settings.err_rate_type + " measurement failed on " + name + "!")
+                            self.dut_status[name].fail(self.settings.err_rate_type + " measurement failed on " + name + "!")
+                            active.remove(name)
+                            continue
+                        measured.add(name)
+
+                        self.sheet_rawdata.write(i, 0, freq/1e6)
+                        self.sheet_rawdata.write(i, 1, siggen_power-self.settings.cable_attenuation_dB)
+                        self.sheet_rawdata.write(i, 2, err_percent)
+                        self.sheet_rawdata.write(i, 3, rssi)
+                        self.sheet_rawdata.write(i, 4, name)
+                        i += 1
+
+                        record_df = pd.DataFrame({
+                                'Frequency [MHz]':freq/1e6,
+                                'Input Power [dBm]':siggen_power-self.settings.cable_attenuation_dB,
+                                self.settings.err_rate_type+' [%]':err_percent,
+                                'RSSI':rssi,
+                                'DUT':name,
+                            },index=[0])
+                        with tracer.span("result write", category="result write"):
+                            record_df.to_csv(self.backup_csv_filename, mode='a', header=not path.exists(self.backup_csv_filename),index=False)
+                        if self.logger.isEnabledFor(Level.INFO):
+                            self.logger.info("\n"+record_df.to_string())
+
+                        if err_percent >= self.settings.err_rate_threshold_percent:
+                            sens_rows[name].append((freq/1e6, siggen_power-self.settings.cable_attenuation_dB, err_percent, rssi))
+                            active.remove(name)
+
+                for siggen_power in self.settings.siggen_power_list_dBm:
+                    if not active:
+                        break
+                    measure_step(siggen_power)
+
+        # the sensitivity of every DUT is written in one block, so each DUT's curve is continuous on the chart
+        j = 1
+        for name, rows in sens_rows.items():
+            for row in rows:
+                for col, value in enumerate(row + (name,)):
+                    self.sheet_sensdata.write(j, col, value)
+                j += 1
+
+        if not any(status.success for status in self.dut_status.values()):
+            self.status.fail(self.settings.err_rate_type + " measurement failed on every DUT!")
+
+        for wstk in self.wstks.values():
+            self._reset_wstk(wstk)
+
+    def stop(self):
+        # the first DUT is self.wstk, Sensitivity.stop releases it
+        for name, wstk in list(self.wstks.items())[1:]:
+            if self.sessions is not None:
+                wstk.stop()
+                wstk._driver.rx(on_off=False)
+            else:
+                wstk._driver.reset()
+                wstk.close()
+        self.wstks = {}
+        super().stop()
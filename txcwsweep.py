@@ -1,19 +1,16 @@
-from pydoc import visiblename
-
 from pywstk.pywstk_driver import WSTK_RAILTest_Driver
 from pywstk.pyRAIL import PA_Config
-from pyspecan.pySpecAn import SpecAn, RS_SpectrumAnalyzer
+from pyspecan.pySpecAn import SpecAn
 import numpy as np
 from pypsu import pyPSU
-from matplotlib import pyplot as plt
 import xlsxwriter
-from time import sleep
+from time import sleep, monotonic
 from datetime import datetime as dt
-from excel_plotter.Py_to_Excel_plotter import Py_to_Excel_plotter
 import pandas as pd
 from os import remove,path
 from dataclasses import dataclass
-from common import Logger, Level
+from common import Logger, Level, tracer, run_concurrently
+from instrument_sessions import InstrumentSessions
 import atexit
 from pyvisa import errors as visaerrors
 
@@ -51,6 +48,15 @@ class TXCWSweep():
         :param float pavdd_max: Maximum supply voltage
         :param int pavdd_num_steps: Number of discrete voltage steps between stop and start values
         :param list pavdd_levels: Custom list of voltages
+        :param float psu_current_window_s: If not 0, the TX current is the mean of the samples taken during this window,
+                                           instead of a single reading
+        :param float psu_current_monitor_rate_Hz: If not 0, the current is polled in the background at this rate, and the TX current
+                                                  is the mean of the samples taken during the fundamental sweep
+        :param bool psu_list_mode: Step the supply through pavdd_levels with its voltage list, each step confirmed by reading back
+                                   the output voltage instead of a fixed delay
+        :param float psu_settle_tolerance_V: The output is settled when the measured voltage is this close to the setting
+        :param bool concurrent_initialization: Initialize the spectrum analyzer in parallel with the PSU and the DUT,
+                                               instead of one after another
         
         :param int min_pwr_state: Maximum power setting for EFR internal amplifier
         :param int max_pwr_state: Minimum power setting for EFR internal amplifier
@@ -74,6 +80,7 @@ class TXCWSweep():
         harm_order_up_to: int = 3
 
         logger_settings: Logger.Settings = Logger.Settings()
+        concurrent_initialization: bool = True
 
         #Supply settings
         psu_present: bool = False
@@ -82,6 +89,10 @@ class TXCWSweep():
         pavdd_max: float = 3.6
         pavdd_num_steps: int = 4
         pavdd_levels: list|None = None
+        psu_current_window_s: float = 0
+        psu_current_monitor_rate_Hz: float = 0
+        psu_list_mode: bool = False
+        psu_settle_tolerance_V: float = 0.05
         psu_logger_settings: Logger.Settings = Logger.Settings()
         
         #Power settings
@@ -105,7 +116,7 @@ class TXCWSweep():
         wstk_com_port: str = ""
         wstk_logger_settings: Logger.Settings = Logger.Settings()
 
-    def __init__(self,settings:Settings,chip_name:str,board_name:str):
+    def __init__(self,settings:Settings,chip_name:str,board_name:str,sessions:InstrumentSessions|None=None):
         """
         Initialize measurement class
 
@@ -114,10 +125,12 @@ class TXCWSweep():
         :param str board_name: Name of board, containg the IC, only used in reporting
         :param str logfile_name: If initialized, separate logfile will be created for this measurement
         :param bool console_logging: Enable console logging, True by default
+        :param InstrumentSessions sessions: If given, the instruments are borrowed from it, and kept open after the measurement
         """
         self.settings = settings
         self.chip_name = chip_name
         self.board_name = board_name
+        self.sessions = sessions
 
         timestamp = dt.now().timestamp()
         self.workbook_name = self.board_name + '_Raw_PAVDD_Freq_vs_Power-Harmonic-Current_results_'+str(int(timestamp))+'.xlsx'
@@ -129,6 +142,7 @@ class TXCWSweep():
         atexit.register(self.__del__)
 
 
+    @tracer.traced(category="setup")
     def initialize_psu(self):
         if self.settings.pavdd_levels is None:
             self.settings.pavdd_levels = np.linspace(
@@ -140,17 +154,29 @@ class TXCWSweep():
         else:
             self.settings.pavdd_max = max(self.settings.pavdd_levels)
         if self.settings.psu_present:
-            self.psu = pyPSU.PSU(self.settings.psu_address,logger_settings = self.settings.psu_logger_settings)
+            if self.sessions is not None:
+                self.psu, _ = self.sessions.psu(self.settings.psu_address, self.settings.psu_logger_settings)
+            else:
+                self.psu = pyPSU.PSU(self.settings.psu_address,logger_settings = self.settings.psu_logger_settings)
             self.psu.selectOutput(1)
             self.psu.toggleOutput(True)
             self.psu.setVoltage(self.settings.pavdd_max)
+            if self.settings.psu_list_mode:
+                self.psu.setVoltageList(self.settings.pavdd_levels, tolerance_V=self.settings.psu_settle_tolerance_V)
+            if self.settings.psu_current_monitor_rate_Hz:
+                self.psu.startCurrentMonitor(rate_Hz=self.settings.psu_current_monitor_rate_Hz)
         else:
             self.settings.pavdd_levels = [3.3]
             self.settings.pavdd_max = max(self.settings.pavdd_levels)
 
+    @tracer.traced(category="setup")
     def initialize_specan(self):
-        self.specan = SpecAn(resource=self.settings.specan_address,logger_settings=self.settings.specan_logger_settings)
-        self.specan.reset()
+        if self.sessions is not None:
+            self.specan, reused = self.sessions.specan(self.settings.specan_address, self.settings.specan_logger_settings)
+        else:
+            self.specan, reused = SpecAn(resource=self.settings.specan_address,logger_settings=self.settings.specan_logger_settings), False
+        if not reused:
+            self.specan.reset()
         self.specan.updateDisplay(on_off=True)
         self.specan.setMode('single')
         self.specan.setSpan(self.settings.specan_span_hz)
@@ -159,10 +185,16 @@ class TXCWSweep():
         self.specan.setDetector(self.settings.specan_detector_type)
         self.specan.setRefOffset(self.settings.specan_ref_offset)
 
+    @tracer.traced(category="setup")
     def initialize_wstk(self):
-        self.wstk = WSTK_RAILTest_Driver(self.settings.wstk_com_port,logger_settings=self.settings.wstk_logger_settings)
+        if self.sessions is not None:
+            wstk, reused = self.sessions.wstk(self.settings.wstk_com_port, self.settings.wstk_logger_settings)
+            self.wstk = wstk._driver
+        else:
+            self.wstk, reused = WSTK_RAILTest_Driver(self.settings.wstk_com_port,logger_settings=self.settings.wstk_logger_settings), False
 
-        self.wstk.reset()
+        if not reused:
+            self.wstk.reset()
         self.wstk.rx(on_off=False)
         self.wstk.setTxTone(on_off=True, mode="CW")
 
@@ -179,6 +211,7 @@ class TXCWSweep():
             else:
                 self.settings.pwr_levels = np.linspace(self.settings.min_pwr_state, self.settings.max_pwr_state, self.settings.pwr_num_steps, dtype=float)
 
+    @tracer.traced(category="setup")
     def initialize_reporter(self):
         self.workbook = xlsxwriter.Workbook(self.workbook_name)
         self.sheet_sum = self.workbook.add_worksheet('Summary')
@@ -214,6 +247,7 @@ class TXCWSweep():
         if path.exists(self.backup_csv_filename):
             remove(self.backup_csv_filename)
 
+    @tracer.traced(category="sweep")
     def initiate(self):
         for freq in self.settings.freq_list_hz:
 
@@ -225,9 +259,12 @@ class TXCWSweep():
             self.wstk.setTxTone(on_off=True, mode="CW")
 
             for pavdd in self.settings.pavdd_levels:
-                if self.settings.psu_present:
-                    self.psu.setVoltage(pavdd)
-                    sleep(0.1)
+                if self.settings.psu_present and self.settings.psu_list_mode:
+                    self.psu.stepVoltageList()
+                elif self.settings.psu_present:
+                    with tracer.span("supply step", category="sweep", pavdd_V=pavdd):
+                        self.psu.setVoltage(pavdd)
+                        sleep(0.1)
                 # measured power levels at fundamental and harmonics
                 meas_sum2D = np.empty((len(self.settings.pwr_levels), self.settings.harm_order_up_to))
                 measured_power_curr = np.empty(len(self.settings.pwr_levels))
@@ -252,19 +289,27 @@ class TXCWSweep():
                         self.wstk.setTxTone(on_off=False, mode="CW")
                         self.wstk.setPower(value=pl, format=self.settings.pwr_format)
                         self.wstk.setTxTone(on_off=True, mode="CW")
-                        self.specan.initiate()
+                        sweep_start = monotonic()
+                        with tracer.span("harmonic sweep", category="acquisition", frequency_Hz=n*freq, power=pl):
+                            self.specan.initiate()
 
-                        # Get the sweep time of the device and add some margin of error
-                        sweeptime = self.specan.getSweepTime() * 1.2
-                        sleep(sweeptime)
+                            # Get the sweep time of the device and add some margin of error
+                            sweeptime = self.specan.getSweepTime() * 1.2
+                            sleep(sweeptime)
 
-                        marker = self.specan.getMaxMarker()
+                            marker = self.specan.getMaxMarker()
                         measured_power[k] = marker.value
                         meas_sum2D[k,n-1] = marker.value
                         
                         if n == 1:
                             if self.settings.psu_present:
-                                i = self.psu.measCurrent() * 1000
+                                window = self.psu.getCurrentWindow(sweep_start) if self.psu.monitor is not None else None
+                                if window is not None and len(window.samples_A):
+                                    i = window.mean_A * 1000
+                                elif self.settings.psu_current_window_s:
+                                    i = self.psu.acquireCurrent(window_s=self.settings.psu_current_window_s).mean_A * 1000
+                                else:
+                                    i = self.psu.measCurrent() * 1000
                                 measured_power_curr[k] = i
                                 tx_measurement_record['TX current [mA]'] = i
                             else:
@@ -277,8 +322,10 @@ class TXCWSweep():
                         n += 1 
 
                     record_df = pd.DataFrame(tx_measurement_record,index=[0])
-                    record_df.to_csv(self.backup_csv_filename, mode='a', header=not path.exists(self.backup_csv_filename),index=False)
-                    self.logger.info("\n"+record_df.to_string())
+                    with tracer.span("result write", category="result write"):
+                        record_df.to_csv(self.backup_csv_filename, mode='a', header=not path.exists(self.backup_csv_filename),index=False)
+                    if self.logger.isEnabledFor(Level.INFO):
+                        self.logger.info("\n"+record_df.to_string())
                 voltage = np.empty(len(self.settings.pwr_levels))
                 freqs_sheet = np.empty(len(self.settings.pwr_levels))
                 for i in range(len(self.settings.pwr_levels)):
@@ -289,11 +336,31 @@ class TXCWSweep():
                 else:
                     results = np.c_[(freqs_sheet.T, self.settings.pwr_levels.T, voltage.T, measured_power_curr.T, meas_sum2D)]
                 column = 0
-                for col, data in enumerate(results.T):
-                    self.worksheet.write_column(self.row, col, data)  
+                with tracer.span("result write", category="result write"):
+                    for col, data in enumerate(results.T):
+                        self.worksheet.write_column(self.row, col, data)  
                 self.row = self.row + len(self.settings.pwr_levels) 
 
+    def _release_instruments(self):
+        # the instruments belong to self.sessions, here they are only set to idle, the sessions close them
+        if not path.isfile(self.workbook_name):
+            self.logger.info("excel workbook closed")
+            if hasattr(self,'workbook'):
+                self.workbook.close()
+        if hasattr(self, 'wstk'):
+            self.wstk.setTxTone(on_off=False, mode="CW")
+            del self.wstk
+        if hasattr(self, 'psu'):
+            self.psu.stopVoltageList()
+            self.psu.stopCurrentMonitor()  # the output is kept on, the PSU may supply the DUT
+            del self.psu
+        if hasattr(self, 'specan'):
+            del self.specan
+
     def stop(self):
+        if self.sessions is not None:
+            self._release_instruments()
+            return
         # delete wstk to release serial port
         self.wstk.__del__()
         # if workbook already exists no need to close again
@@ -305,15 +372,13 @@ class TXCWSweep():
         if self.settings.psu_present:
             try:
                 if hasattr(self,'psu'):
+                    self.psu.stopVoltageList()
                     self.psu.toggleOutput(False)
-                    self.psu.logger.handlers.clear()
                     del self.psu
             # if someone already closed the visa session
             except visaerrors.InvalidSession:
-                self.psu.logger.handlers.clear() # clear psu logger otherwise it will duplicate log
                 self.initialize_psu() #reinitialize psu session
                 self.psu.toggleOutput(False) # turn off output
-                self.psu.logger.handlers.clear()
                 del self.psu
     @staticmethod
     def get_dataframe(dataframe_filename:str,index_col:list = [0,1,2])->pd.DataFrame:
@@ -339,19 +404,28 @@ class TXCWSweep():
         :return: The measured data
         :rtype: pandas.DataFrame
         """
-        
-        self.initialize_psu()
-        self.initialize_specan()
-        self.initialize_wstk()
-        self.initialize_reporter()
+        # the PSU may supply the DUT, and the reporter lists the voltages, frequencies and power levels set up by them
+        groups = [
+            [self.initialize_psu, self.initialize_wstk, self.initialize_reporter],
+            [self.initialize_specan],
+            ]
+        if self.settings.concurrent_initialization:
+            run_concurrently(*groups, description="Instrument initialization failed", thread_name_prefix="initialize")
+        else:
+            for group in groups:
+                for step in group:
+                    step()
 
         self.initiate()
 
         self.stop()
 
         df = self.get_dataframe(self.backup_csv_filename)
-        Py_to_Excel_plotter(self.workbook_name,self.settings.harm_order_up_to)
-        self.logger.debug(df.to_string())
+        from excel_plotter.Py_to_Excel_plotter import Py_to_Excel_plotter  # only needed for the final report
+        with tracer.span("Py_to_Excel_plotter", category="result write"):
+            Py_to_Excel_plotter(self.workbook_name,self.settings.harm_order_up_to)
+        if self.logger.isEnabledFor(Level.DEBUG):
+            self.logger.debug(df.to_string())
         self.logger.info("\nDone with measurements")
 
         return df